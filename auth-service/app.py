@@ -1,15 +1,34 @@
+import logging
+import time
+
+# Taken before the service's own imports so their cost is part of the startup time
+IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from services.database import create_tables
+from services.database import SessionLocal, dispose_engine, get_engine
+from services.hashing import hashing_executor
+from services.health import database_health
+from services.metrics import MetricsMiddleware, STARTUP_DURATION
+from services.profiling import ProfilingMiddleware
+from services.session_activity import session_activity
+from services.revocation import revocations
+from services.refresh_tokens import refresh_tokens
+from utils.auth import BCRYPT_CALIBRATE, calibrate_bcrypt_rounds
 from schemas import MessageResponse
-from controllers import auth_router, user_router, health_router
+from controllers import auth_router, user_router, health_router, session_router, jwks_router, metrics_router, admin_router
+from controllers.session_controller import SERVICE_API_KEY
+
+logger = logging.getLogger(__name__)
 
 # Create FastAPI app
 app = FastAPI(
     title="Authentication Service",
     description="A secure authentication service with JWT tokens",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
@@ -21,15 +40,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create tables on startup
+# Record request latency and in-flight requests, outside everything but the profiler so every request is counted
+app.add_middleware(MetricsMiddleware)
+
+# Profile requests carrying the profiling token or picked by sampling; outermost so all middleware is profiled
+app.add_middleware(ProfilingMiddleware)
+
+# Calibrate password hashing, start probing the database, flushing session activity, following revocations and purging expired refresh tokens on startup.
+# Nothing here waits for the database: the schema is managed by `migrate.py` and readiness reports when it is reachable.
 @app.on_event("startup")
-def startup_event():
-    create_tables()
+async def startup_event():
+    started = time.perf_counter()
+    if BCRYPT_CALIBRATE:
+        await calibrate_bcrypt_rounds()
+    if not SERVICE_API_KEY:
+        logger.warning(
+            "SERVICE_API_KEY is not set; /sessions/activity is disabled, so sessions used "
+            "only through the backend will expire after inactivity"
+        )
+    database_health.start(get_engine)
+    session_activity.start(SessionLocal)
+    revocations.start(SessionLocal)
+    refresh_tokens.start(SessionLocal)
+
+    STARTUP_DURATION.labels("startup").set(time.perf_counter() - started)
+    logger.info(
+        "Auth service started in %.0f ms (imports %.0f ms)",
+        (time.perf_counter() - IMPORT_STARTED) * 1000,
+        IMPORT_DURATION * 1000,
+    )
+
+# Stop probing, flush session activity, stop the password hashing workers and close pooled connections on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    await database_health.stop()
+    await session_activity.stop()
+    await revocations.stop()
+    await refresh_tokens.stop()
+    hashing_executor.shutdown()
+    await dispose_engine()
 
 # Include routers
 app.include_router(auth_router)
 app.include_router(user_router)
 app.include_router(health_router)
+app.include_router(session_router)
+app.include_router(jwks_router)
+app.include_router(metrics_router)
+app.include_router(admin_router)
+
+IMPORT_DURATION = time.perf_counter() - IMPORT_STARTED
+STARTUP_DURATION.labels("import").set(IMPORT_DURATION)
 
 @app.get("/", response_model=MessageResponse)
 async def root():
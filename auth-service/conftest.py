@@ -0,0 +1,54 @@
+"""
+Shared fixtures for the auth-service tests
+"""
+
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import Base
+from services.database import build_engine
+from services.hashing import hashing_executor
+
+class TestDatabases:
+    """Throwaway SQLite databases with the models' schema, in one directory."""
+
+    __test__ = False
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def url(self, name: str = "users") -> str:
+        return f"sqlite:///{os.path.join(self.directory, name)}.db"
+
+    async def create(self, name: str = "users") -> AsyncEngine:
+        """Create a database and return its engine; the caller disposes of it."""
+        engine = build_engine(self.url(name))
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return engine
+
+    @asynccontextmanager
+    async def open(self, name: str = "users"):
+        """Create a database and yield its engine and a session factory."""
+        engine = await self.create(name)
+        try:
+            yield engine, async_sessionmaker(bind=engine, expire_on_commit=False)
+        finally:
+            await engine.dispose()
+
+@pytest.fixture
+def databases(tmp_path):
+    """
+    Databases for one test. The hashing pool the test may have started is
+    stopped afterwards, so its worker processes do not outlive the test.
+    """
+    try:
+        yield TestDatabases(str(tmp_path))
+    finally:
+        hashing_executor.shutdown()
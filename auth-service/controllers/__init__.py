@@ -5,10 +5,18 @@ This package contains all API route controllers organized by functionality:
 - auth_controller: Authentication endpoints (register, login, verify)
 - user_controller: User management endpoints (me, profile)
 - health_controller: Health check and system status endpoints
+- session_controller: Session activity reporting for other services
+- jwks_controller: Public signing keys for local token verification
+- metrics_controller: Prometheus metrics
+- admin_controller: Administrative operations such as bulk user import
 """
 
 from .auth_controller import router as auth_router
 from .user_controller import router as user_router
 from .health_controller import router as health_router
+from .session_controller import router as session_router
+from .jwks_controller import router as jwks_router
+from .metrics_controller import router as metrics_router
+from .admin_controller import router as admin_router
 
-__all__ = ["auth_router", "user_router", "health_router"]
+__all__ = ["auth_router", "user_router", "health_router", "session_router", "jwks_router", "metrics_router", "admin_router"]
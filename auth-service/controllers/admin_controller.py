@@ -0,0 +1,56 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from schemas import UserImportResult
+from services.database import get_db
+from services.user_import import IMPORT_FORMATS, UserImporter, parse_rows, stream_lines
+
+load_dotenv()
+
+# Admin endpoints are disabled unless a key is configured
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+def require_admin(x_admin_key: Optional[str] = Header(None)) -> None:
+    """Allow the request only with the configured admin key."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled"
+        )
+    if x_admin_key is None or not secrets.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin key"
+        )
+
+@router.post("/users/import", response_model=UserImportResult, dependencies=[Depends(require_admin)])
+async def import_users(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv or ndjson; taken from the Content-Type when omitted"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Bulk import users from a CSV or NDJSON request body.
+
+    Each row has a username, an email and either a plain `password` or a
+    bcrypt `password_hash`. The body is streamed, so large files are not held
+    in memory; rows that cannot be imported are reported by line number.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "json" in content_type else "csv"
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported import format, expected one of: {', '.join(IMPORT_FORMATS)}"
+        )
+
+    rows = parse_rows(stream_lines(request.stream()), format)
+    return await UserImporter().run(db, rows)
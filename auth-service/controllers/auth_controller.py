@@ -1,36 +1,61 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+import time
+from typing import Dict, List
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from schemas import UserCreate, UserLogin, Token, UserResponse
+from schemas import (
+    UserCreate,
+    UserLogin,
+    Token,
+    RefreshRequest,
+    TokenBatch,
+    TokenVerificationBatch,
+    TokenVerificationResult,
+    UserResponse,
+    MessageResponse,
+    RevocationFeed,
+    claims_user_response,
+    user_response,
+)
 from models.user import User
-from utils.auth import create_access_token, verify_token, validate_password_strength, ACCESS_TOKEN_EXPIRE_MINUTES
+from services.database import get_db, get_read_db
+from services.refresh_tokens import REFRESH_TOKEN_EXPIRE_MINUTES, refresh_tokens
+from services.token_versions import OUTDATED_TOKEN_DETAIL, require_current_version, token_versions
+from services.user_cache import user_cache
+from services.session_activity import session_activity, require_active_session
+from services.rate_limit import login_limiter, client_ip
+from services.revocation import revocations, require_not_revoked, REVOCATION_FEED_PAGE_SIZE
+from utils.auth import (
+    create_access_token,
+    user_claims,
+    verify_token,
+    validate_password_strength,
+    WEAK_PASSWORD_DETAIL,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    INACTIVITY_TIMEOUT_MINUTES,
+    SESSION_MAX_LIFETIME_MINUTES,
+)
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user_data: UserCreate):
+async def register_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user."""
 
     # Validate password strength
     if not validate_password_strength(user_data.password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must be at least 8 characters long and contain uppercase, lowercase, digit, and special character"
+            detail=WEAK_PASSWORD_DETAIL
         )
 
     # Create user
     try:
-        user = User.create_user(user_data.username, user_data.email, user_data.password)
-        return UserResponse(
-            id=user.id,
-            username=user.username,
-            email=user.email,
-            is_active=user.is_active,
-            created_at=user.created_at,
-            updated_at=user.updated_at
-        )
+        user = await User.create_user(db, user_data.username, user_data.email, user_data.password)
+        return user_response(user)
     except HTTPException:
         raise
     except Exception as e:
@@ -40,47 +65,121 @@ async def register_user(user_data: UserCreate):
         )
 
 @router.post("/login", response_model=Token)
-async def login_user(login_data: UserLogin):
-    """Authenticate user and return JWT token."""
+async def login_user(login_data: UserLogin, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Authenticate user and return a short-lived JWT access token with a refresh token.
+
+    Reads the primary: a lagging replica could still accept a password that
+    has been changed, and its token version would outdate nothing.
+    """
+
+    # Throttle the client before any query, and the account before any password hash
+    await login_limiter.check_client(client_ip(request))
+    user = await User.get_by_login(db, login_data.username)
+    await login_limiter.check_account(user.id if user else None, login_data.username)
 
     # Authenticate user
-    user = User.authenticate(login_data.username, login_data.password)
-    if not user:
+    if not user or not await user.check_password(db, login_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # Open a session; it stays valid while the user is active, up to the absolute session lifetime
+    session_id = session_activity.start_session(user.id)
+    token_versions.set(user.id, user.token_version)
+    refresh_token = await refresh_tokens.issue(db, user.id, session_id, user.token_version)
+
+    access_token_expires = timedelta(minutes=min(ACCESS_TOKEN_EXPIRE_MINUTES, SESSION_MAX_LIFETIME_MINUTES))
+    access_token = create_access_token(
+        data={**user_claims(user), "sid": session_id},
+        expires_delta=access_token_expires
+    )
+
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        expires_in=int(access_token_expires.total_seconds()),
+        inactivity_timeout=INACTIVITY_TIMEOUT_MINUTES * 60,
+        refresh_token=refresh_token,
+        refresh_expires_in=min(REFRESH_TOKEN_EXPIRE_MINUTES, SESSION_MAX_LIFETIME_MINUTES) * 60,
+    )
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(refresh_data: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token and the next refresh token.
+
+    Each refresh token works once. Presenting one that has already been
+    exchanged revokes the whole session, since a copy of it is in use.
+    """
+    grant = await refresh_tokens.rotate(db, refresh_data.refresh_token)
+
+    # Deactivation and password changes outdate the session along with the user's tokens.
+    # The version and the user record come from memory while cached
+    user_id = grant.user_id
+    user = None
+    version = await token_versions.get(user_id, lambda: User.get_token_version(db, user_id))
+    if version == grant.token_version:
+        user = await user_cache.get(user_id, lambda: User.get_by_id(db, user_id))
+    session_active = await session_activity.touch(db, {"sid": grant.session_id, "user_id": user_id})
+    if user is None or not user.is_active or not session_active:
+        await refresh_tokens.revoke(db, grant.session_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session is no longer valid",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Never past the end of the session the refresh token belongs to
+    access_token_expires = min(
+        timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+        grant.session_expires_at - datetime.now(timezone.utc),
+    )
     access_token = create_access_token(
-        data={"sub": user.username, "user_id": user.id},
+        data={**user_claims(user, grant.token_version), "sid": grant.session_id},
         expires_delta=access_token_expires
     )
 
     return Token(
         access_token=access_token,
         token_type="bearer",
-        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60,  # Convert to seconds
+        expires_in=int(access_token_expires.total_seconds()),
+        inactivity_timeout=INACTIVITY_TIMEOUT_MINUTES * 60,
+        refresh_token=grant.refresh_token,
+        refresh_expires_in=int(min(
+            refresh_tokens.ttl,
+            grant.session_expires_at - datetime.now(timezone.utc),
+        ).total_seconds()),
     )
 
 @router.get("/verify", response_model=UserResponse)
 async def verify_token_endpoint(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Verify JWT token and return user information."""
 
-    # Verify token
+    # Verify token and extend the session's inactivity deadline
     token_data = verify_token(credentials.credentials)
+    require_not_revoked(token_data)
+    await require_active_session(db, token_data)
 
-    # Get user from database
-    user = User.get_by_id(token_data["user_id"])
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    user_id = token_data["user_id"]
+    if token_data.get("ver") is not None:
+        # The token describes the user; it only has to be the current version,
+        # which the version map answers without the database
+        await require_current_version(token_data, lambda: User.get_token_version(db, user_id))
+        user = claims_user_response(token_data)
+    else:
+        # Tokens issued before versioned claims; get the user from the cache, falling back to the database
+        user = await user_cache.get(user_id, lambda: User.get_by_id(db, user_id))
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
 
     if not user.is_active:
         raise HTTPException(
@@ -88,11 +187,99 @@ async def verify_token_endpoint(
             detail="Inactive user"
         )
 
-    return UserResponse(
-        id=user.id,
-        username=user.username,
-        email=user.email,
-        is_active=user.is_active,
-        created_at=user.created_at,
-        updated_at=user.updated_at
+    # Serialized straight from the model, skipping the response_model round trip
+    return Response(user.model_dump_json(), media_type="application/json")
+
+@router.post("/verify/batch", response_model=TokenVerificationBatch)
+async def verify_token_batch(batch: TokenBatch, db: AsyncSession = Depends(get_read_db)):
+    """
+    Verify many JWT tokens at once and return a result per token.
+
+    Applies the same checks as /auth/verify, but sessions, token versions
+    and users are resolved for the whole batch together, so the database is
+    read at most once for each rather than once per token.
+    """
+    results: List[TokenVerificationResult] = [None] * len(batch.tokens)
+
+    # Signature, expiry and revocation are checked in memory
+    verified: Dict[int, dict] = {}
+    for index, token in enumerate(batch.tokens):
+        try:
+            token_data = verify_token(token)
+            require_not_revoked(token_data)
+        except HTTPException as e:
+            results[index] = TokenVerificationResult(valid=False, detail=e.detail)
+            continue
+        verified[index] = token_data
+
+    # Extend every session's inactivity deadline in one pass
+    now = time.time()
+    expired = set(await session_activity.record_activity(db, [
+        (token_data["sid"], token_data["user_id"], token_data.get("iat"), now)
+        for token_data in verified.values() if token_data.get("sid")
+    ]))
+
+    # Versioned tokens describe their user and only have to be current; the
+    # rest need their users, from the cache or loaded in one query each
+    versions = await token_versions.get_many(
+        {token_data["user_id"] for token_data in verified.values() if token_data.get("ver") is not None},
+        lambda user_ids: User.get_token_versions(db, user_ids),
     )
+    users = await user_cache.get_many(
+        {token_data["user_id"] for token_data in verified.values() if token_data.get("ver") is None},
+        lambda user_ids: User.get_by_ids(db, user_ids),
+    )
+
+    for index, token_data in verified.items():
+        user_id = token_data["user_id"]
+        outdated = False
+        if token_data.get("ver") is None:
+            user = users.get(user_id)
+        else:
+            user = claims_user_response(token_data) if user_id in versions else None
+            outdated = user is not None and versions[user_id] != token_data["ver"]
+
+        if token_data.get("sid") in expired:
+            results[index] = TokenVerificationResult(valid=False, detail="Session expired due to inactivity")
+        elif not user:
+            results[index] = TokenVerificationResult(valid=False, detail="User not found")
+        elif outdated:
+            results[index] = TokenVerificationResult(valid=False, detail=OUTDATED_TOKEN_DETAIL)
+        elif not user.is_active:
+            results[index] = TokenVerificationResult(valid=False, detail="Inactive user")
+        else:
+            results[index] = TokenVerificationResult(valid=True, user=user)
+
+    return TokenVerificationBatch(results=results)
+
+@router.post("/logout", response_model=MessageResponse)
+async def logout_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+):
+    """Revoke the presented JWT token and its session's refresh token."""
+
+    token_data = verify_token(credentials.credentials)
+    if token_data["jti"] is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Token cannot be revoked"
+        )
+
+    if not revocations.is_revoked(token_data):
+        await revocations.revoke_token(db, token_data)
+    if token_data.get("sid"):
+        await refresh_tokens.revoke(db, token_data["sid"])
+
+    return MessageResponse(message="Successfully logged out")
+
+@router.get("/revocations", response_model=RevocationFeed)
+async def get_revocations(
+    since: int = Query(0, ge=0, description="Cursor returned by the previous call"),
+    limit: int = Query(REVOCATION_FEED_PAGE_SIZE, ge=1, le=REVOCATION_FEED_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """Incremental feed of token revocations recorded after a cursor."""
+
+    entries, cursor, has_more = await revocations.changes_since(db, since, limit)
+    return RevocationFeed(revocations=entries, cursor=cursor, has_more=has_more)
@@ -1,57 +1,80 @@
-from fastapi import APIRouter, Depends
-from services.database import SessionLocal, get_db
-from models.user import User
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from services.database import replicas
+from services.health import database_health
+from services.shared_cache import shared_table
+from services.token_versions import token_versions
+from services.user_cache import user_cache
 
 router = APIRouter(prefix="/health", tags=["health"])
 
 @router.get("/")
 async def health_check():
-    """Health check endpoint."""
-    try:
-        # Test database connection using ORM
-        db = SessionLocal()
-        try:
-            # Simple query to test connection - count users
-            count = db.query(User).count()
-        finally:
-            db.close()
-
+    """Health check endpoint, served from the background database probe."""
+    if database_health.ready:
         return {
             "status": "healthy",
             "message": "Auth service is running",
             "database": "connected"
         }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "message": "Auth service has issues",
-            "database": "disconnected",
-            "error": str(e)
-        }
+    return {
+        "status": "unhealthy",
+        "message": "Auth service has issues",
+        "database": "disconnected",
+        "error": database_health.error
+    }
+
+@router.get("/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness():
+    """
+    Readiness probe: the latest background database check succeeded.
+    Includes connection pool occupancy so saturation shows up here.
+    """
+    content = {"status": "ready" if database_health.ready else "not ready", **database_health.status()}
+    if not database_health.ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=content)
+    return content
 
 @router.get("/db")
-async def database_health():
+async def database_health_details():
     """Database-specific health check."""
-    try:
-        db = SessionLocal()
-        try:
-            # Get database connection info through a simple query
-            from sqlalchemy import text
-            result = db.execute(text("SELECT version()"))
-            version = result.fetchone()[0]
-        finally:
-            db.close()
-
+    if database_health.ready:
         return {
             "status": "healthy",
             "database": "PostgreSQL",
-            "version": version,
-            "connection": "active"
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "database": "PostgreSQL",
-            "connection": "failed",
-            "error": str(e)
+            "version": database_health.version,
+            "connection": "active",
+            **database_health.status()
         }
+    return {
+        "status": "unhealthy",
+        "database": "PostgreSQL",
+        "connection": "failed",
+        "error": database_health.error,
+        **database_health.status()
+    }
+
+@router.get("/replicas")
+async def replica_status():
+    """Read replicas, whether each is taking reads and its pool occupancy."""
+    return {"strategy": replicas.strategy, "ejections": replicas.ejections, "replicas": replicas.status()}
+
+@router.get("/user-cache")
+async def user_cache_stats():
+    """Hit, miss and eviction counters for the user cache."""
+    return user_cache.stats()
+
+@router.get("/token-versions")
+async def token_version_stats():
+    """Size and hit/miss counters of the token version map."""
+    return token_versions.stats()
+
+@router.get("/shared-cache")
+async def shared_cache_stats():
+    """Occupancy of the cache shared by the workers, with this worker's hit and miss counters."""
+    return shared_table.stats()
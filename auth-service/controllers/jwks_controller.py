@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+
+from utils.auth import signing_keys
+
+router = APIRouter(prefix="/.well-known", tags=["keys"])
+
+# How long clients may cache the key set
+JWKS_MAX_AGE_SECONDS = 300
+
+@router.get("/jwks.json")
+async def get_jwks(response: Response):
+    """Public keys that verify tokens issued by this service."""
+    response.headers["Cache-Control"] = f"public, max-age={JWKS_MAX_AGE_SECONDS}"
+    if signing_keys is None:
+        # Symmetric tokens cannot be verified with a public key
+        return {"keys": []}
+    return signing_keys.jwks()
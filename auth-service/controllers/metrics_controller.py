@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+from services.metrics import CONTENT_TYPE, registry
+from services.profiling import request_profiler, require_profiling_token
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Service metrics in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+@router.get("/metrics/profiles", dependencies=[Depends(require_profiling_token)])
+async def profiles(limit: int = Query(20, ge=1, le=100)):
+    """
+    The slowest recently profiled requests of this worker, with their most
+    expensive functions and the profile file written for each.
+    Requires the `X-Profile` header to match `PROFILING_TOKEN`; without a
+    configured token it answers 403.
+    """
+    return request_profiler.summary(limit)
@@ -0,0 +1,46 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from schemas import SessionActivityBatch, SessionActivityResult
+from services.database import get_db
+from services.session_activity import session_activity
+
+load_dotenv()
+
+# Key other services present to report activity; the endpoint is disabled unless it is set
+SERVICE_API_KEY = os.getenv("SERVICE_API_KEY")
+
+router = APIRouter(prefix="/sessions", tags=["sessions"])
+
+def require_service(x_service_key: Optional[str] = Header(None)) -> None:
+    """Allow the request only from a service holding the configured key."""
+    if not SERVICE_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Service API is disabled"
+        )
+    if x_service_key is None or not secrets.compare_digest(x_service_key, SERVICE_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid service key"
+        )
+
+@router.post("/activity", response_model=SessionActivityResult, dependencies=[Depends(require_service)])
+async def report_session_activity(
+    batch: SessionActivityBatch,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Record session activity observed by other services and report which of
+    the given sessions have already expired through inactivity.
+    """
+    expired = await session_activity.record_activity(db, [
+        (item.session_id, item.user_id, item.issued_at, item.last_seen)
+        for item in batch.sessions
+    ])
+    return SessionActivityResult(expired=expired)
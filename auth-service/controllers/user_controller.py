@@ -1,24 +1,42 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from schemas import UserResponse
 from models.user import User
+from services.database import get_read_db
+from services.user_cache import user_cache
+from services.session_activity import require_active_session
+from services.revocation import require_not_revoked
+from services.token_versions import require_current_version
 from utils.auth import verify_token
+from utils.responses import json_response
 
 router = APIRouter(prefix="/users", tags=["users"])
 security = HTTPBearer()
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get current user information from JWT token."""
+    """
+    Get current user information from JWT token.
+    Answers 304 when If-None-Match carries the current ETag.
+    """
 
-    # Verify token
+    # Verify token and extend the session's inactivity deadline
     token_data = verify_token(credentials.credentials)
+    require_not_revoked(token_data)
+    await require_active_session(db, token_data)
 
-    # Get user from database
-    user = User.get_by_id(token_data["user_id"])
+    # Tokens outdated by a password change or deactivation are refused
+    user_id = token_data["user_id"]
+    await require_current_version(token_data, lambda: User.get_token_version(db, user_id))
+
+    # Get user from the cache, falling back to the database
+    user = await user_cache.get(user_id, lambda: User.get_by_id(db, user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -31,11 +49,4 @@ async def get_current_user(
             detail="Inactive user"
         )
 
-    return UserResponse(
-        id=user.id,
-        username=user.username,
-        email=user.email,
-        is_active=user.is_active,
-        created_at=user.created_at,
-        updated_at=user.updated_at
-    )
+    return json_response(request, user.model_dump_json().encode())
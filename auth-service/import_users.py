@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Bulk import users from a CSV or NDJSON file.
+
+Each row has a username, an email and either a plain `password` or an
+existing bcrypt `password_hash`. CSV files need a header row naming those
+columns. Rows that cannot be imported are listed with their line numbers.
+
+Usage: python import_users.py users.csv [--format csv|ndjson] [--batch-size 500]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import SessionLocal, dispose_engine
+from services.hashing import hashing_executor
+from services.user_import import IMPORT_FORMATS, USER_IMPORT_BATCH_SIZE, UserImporter, parse_rows
+
+async def read_lines(path: str):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+async def run_import(path: str, fmt: str, batch_size: int) -> dict:
+    try:
+        async with SessionLocal() as db:
+            return await UserImporter(batch_size).run(db, parse_rows(read_lines(path), fmt))
+    finally:
+        await dispose_engine()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk import users from a CSV or NDJSON file")
+    parser.add_argument("path", help="File to import")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Input format, taken from the file extension by default")
+    parser.add_argument("--batch-size", type=int, default=USER_IMPORT_BATCH_SIZE, help="Rows inserted per statement")
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    try:
+        report = asyncio.run(run_import(args.path, fmt, args.batch_size))
+    finally:
+        hashing_executor.shutdown()
+
+    for error in report["errors"]:
+        print(json.dumps(error), file=sys.stderr)
+    print(f"Imported {report['imported']} of {report['total']} users, {report['failed']} failed")
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
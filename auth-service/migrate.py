@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Apply pending schema migrations.
+
+Run once per deploy, before the service's workers start; workers no longer
+create tables themselves. Waits for the database to accept connections, so
+it can be started alongside a database that is still booting.
+
+Usage: python migrate.py [--status] [--target VERSION] [--wait SECONDS]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+from services.database import dispose_engine, get_engine
+from services.migrations import current_version, discover, migrate
+
+async def wait_for_database(timeout_seconds: float) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    delay = 0.25
+    while True:
+        try:
+            async with get_engine().connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return
+        except Exception as e:
+            if time.monotonic() + delay > deadline:
+                raise
+            print(f"Waiting for the database: {e}", file=sys.stderr)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5)
+
+async def run(args) -> None:
+    try:
+        await wait_for_database(args.wait)
+        if args.status:
+            version = await current_version(get_engine())
+            latest = max((migration.version for migration in discover()), default=None)
+            print(f"Schema version {version}, latest {latest}")
+            return
+
+        started = time.perf_counter()
+        applied = await migrate(get_engine(), args.target)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for migration in applied:
+            print(f"Applied {migration.version:04d}_{migration.name}")
+        print(f"{len(applied)} migration(s) applied in {elapsed_ms:.0f} ms")
+    finally:
+        await dispose_engine()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--status", action="store_true", help="Show the current schema version and exit")
+    parser.add_argument("--target", type=int, help="Stop after this version")
+    parser.add_argument("--wait", type=float, default=60, help="Seconds to wait for the database to accept connections")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Users, session activity and token revocations.
+
+Databases created by the old startup `create_all` already have these
+tables; they are left untouched and adopted at this version.
+"""
+
+from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import func
+
+metadata = MetaData()
+
+Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String(50), unique=True, index=True, nullable=False),
+    Column("email", String(100), unique=True, index=True, nullable=False),
+    Column("hashed_password", String(255), nullable=False),
+    Column("is_active", Boolean),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+Table(
+    "session_activity",
+    metadata,
+    Column("session_id", String(64), primary_key=True),
+    Column("user_id", Integer, index=True, nullable=False),
+    Column("last_activity", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "token_revocations",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("jti", String(64), index=True, nullable=True),
+    Column("user_id", Integer, index=True, nullable=True),
+    Column("issued_before", DateTime(timezone=True), nullable=True),
+    Column("expires_at", DateTime(timezone=True), index=True, nullable=False),
+    Column("created_at", DateTime(timezone=True), index=True, nullable=False),
+)
+
+def upgrade(connection: Connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,13 @@
+"""
+Per-user token version, bumped to invalidate every token issued to the user.
+
+Databases created from the models by `create_all` may already have the column.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+def upgrade(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns("users")}
+    if "token_version" not in columns:
+        connection.execute(text("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"))
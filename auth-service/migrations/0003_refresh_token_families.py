@@ -0,0 +1,23 @@
+"""
+Refresh token families, one row per login session.
+"""
+
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+Table(
+    "refresh_token_families",
+    metadata,
+    Column("session_id", String(64), primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("token_version", Integer, nullable=False),
+    Column("generation", Integer, nullable=False),
+    Column("key", LargeBinary(16), nullable=False),
+    Column("expires_at", DateTime(timezone=True), index=True, nullable=False),
+    Column("session_expires_at", DateTime(timezone=True), nullable=False),
+)
+
+def upgrade(connection: Connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,13 @@
+"""
+Index on session_activity.last_activity, for purging the rows of ended sessions.
+
+Databases created from the models by `create_all` may already have the index.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+def upgrade(connection: Connection) -> None:
+    indexes = {index["name"] for index in inspect(connection).get_indexes("session_activity")}
+    if "ix_session_activity_last_activity" not in indexes:
+        connection.execute(text("CREATE INDEX ix_session_activity_last_activity ON session_activity (last_activity)"))
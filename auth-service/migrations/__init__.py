@@ -0,0 +1,8 @@
+"""
+Versioned schema migrations, applied in order by `python migrate.py`.
+
+Each module is named <version>_<description>.py and defines
+`upgrade(connection)`, which receives a synchronous SQLAlchemy connection
+inside the migration transaction. Migrations describe the schema as it was
+at their version, so they never import the models.
+"""
@@ -1,3 +1,7 @@
-from .user import User, Base
+from .base import Base
+from .user import User
+from .session_activity import SessionActivity
+from .token_revocation import TokenRevocation
+from .refresh_token import RefreshTokenFamily
 
-__all__ = ["User", "Base"]
+__all__ = ["User", "Base", "SessionActivity", "TokenRevocation", "RefreshTokenFamily"]
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
+from .base import Base
+
+class RefreshTokenFamily(Base):
+    """
+    The chain of refresh tokens issued for one login session.
+
+    Tokens are derived from the family's key and a generation number, so a
+    family is one row however often it rotates: only the current generation
+    is accepted, and presenting an earlier one is detected as reuse.
+    """
+    __tablename__ = "refresh_token_families"
+
+    session_id = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    token_version = Column(Integer, nullable=False)
+    generation = Column(Integer, nullable=False, default=0)
+    key = Column(LargeBinary(16), nullable=False)
+    expires_at = Column(DateTime(timezone=True), index=True, nullable=False)
+    session_expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<RefreshTokenFamily(session_id='{self.session_id}', user_id={self.user_id}, generation={self.generation})>"
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from .base import Base
+
+class SessionActivity(Base):
+    __tablename__ = "session_activity"
+
+    session_id = Column(String(64), primary_key=True)
+    user_id = Column(Integer, index=True, nullable=False)
+    last_activity = Column(DateTime(timezone=True), index=True, nullable=False)
+
+    def __repr__(self):
+        return f"<SessionActivity(session_id='{self.session_id}', user_id={self.user_id}, last_activity={self.last_activity})>"
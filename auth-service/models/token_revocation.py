@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime
+from .base import Base
+
+class TokenRevocation(Base):
+    """
+    A revoked token (by jti) or all of a user's tokens issued before a time.
+    The autoincrement id doubles as the cursor of the revocation feed.
+    """
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    jti = Column(String(64), index=True, nullable=True)
+    user_id = Column(Integer, index=True, nullable=True)
+    issued_before = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), index=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), index=True, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<TokenRevocation(id={self.id}, jti='{self.jti}', user_id={self.user_id})>"
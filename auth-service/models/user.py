@@ -1,15 +1,28 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, case, insert, or_, select, update
 from sqlalchemy.sql import func
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
-from typing import Optional
-from utils.auth import get_password_hash, verify_password
-from services.database import SessionLocal
-
-Base = declarative_base()
-db = SessionLocal()
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from utils.auth import (
+    get_password_hash_async,
+    password_needs_rehash,
+    verify_password_async,
+    SESSION_MAX_LIFETIME_MINUTES,
+)
+from services.database import reads_from_replica, use_primary
+from services.metrics import DB_QUERY_DURATION, ERRORS, timed
+from .base import Base
+from .token_revocation import TokenRevocation
+
+logger = logging.getLogger(__name__)
+
+# Password rehashes running in the background, by user id
+_pending_rehashes: Dict[int, asyncio.Task] = {}
 
 class User(Base):
     __tablename__ = "users"
@@ -19,6 +32,8 @@ class User(Base):
     email = Column(String(100), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
+    # Bumped to invalidate every token issued to the user so far
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -26,96 +41,211 @@ class User(Base):
         return f"<User(id={self.id}, username='{self.username}', email='{self.email}')>"
 
     @classmethod
-    def get_by_username(cls, username: str) -> Optional['User']:
-        """Get user by username - manages its own database session."""
-        try:
-            return db.query(cls).filter(cls.username == username).first()
-        finally:
-            db.close()
+    @timed(DB_QUERY_DURATION.labels("get_by_username"))
+    async def get_by_username(cls, db: AsyncSession, username: str) -> Optional['User']:
+        """Get user by username using the given database session."""
+        return await db.scalar(select(cls).where(cls.username == username))
 
     @classmethod
-    def get_by_email(cls, email: str) -> Optional['User']:
-        """Get user by email - manages its own database session."""
-        try:
-            return db.query(cls).filter(cls.email == email).first()
-        finally:
-            db.close()
+    @timed(DB_QUERY_DURATION.labels("get_by_email"))
+    async def get_by_email(cls, db: AsyncSession, email: str) -> Optional['User']:
+        """Get user by email using the given database session."""
+        return await db.scalar(select(cls).where(cls.email == email))
 
     @classmethod
-    def get_by_id(cls, user_id: int) -> Optional['User']:
-        """Get user by ID - manages its own database session."""
-        try:
-            return db.query(cls).filter(cls.id == user_id).first()
-        finally:
-            db.close()
+    @timed(DB_QUERY_DURATION.labels("get_by_id"))
+    async def get_by_id(cls, db: AsyncSession, user_id: int) -> Optional['User']:
+        """Get user by ID using the given database session."""
+        user = await db.get(cls, user_id)
+        if user is None and reads_from_replica(db):
+            # The replica may not have caught up with a recent registration
+            use_primary(db)
+            user = await db.get(cls, user_id)
+        return user
 
     @classmethod
-    def create_user(cls, username: str, email: str, password: str) -> 'User':
-        """Create a new user - manages its own database session."""
-        # Check if username already exists
-        if cls.get_by_username(username):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already registered"
-            )
+    @timed(DB_QUERY_DURATION.labels("get_token_version"))
+    async def get_token_version(cls, db: AsyncSession, user_id: int) -> Optional[int]:
+        """
+        Get a user's current token version, or None if there is no such user.
+        Always read from the primary, since the version is cached as current
+        and a lagging replica would bring back one that has been bumped.
+        """
+        use_primary(db)
+        return await db.scalar(select(cls.token_version).where(cls.id == user_id))
 
-        # Check if email already exists
-        if cls.get_by_email(email):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
+    @classmethod
+    @timed(DB_QUERY_DURATION.labels("get_token_versions"))
+    async def get_token_versions(cls, db: AsyncSession, user_ids: Iterable[int]) -> Dict[int, int]:
+        """Get the token versions of every user with one of the given IDs, from the primary."""
+        use_primary(db)
+        result = await db.execute(select(cls.id, cls.token_version).where(cls.id.in_(list(user_ids))))
+        return {user_id: version for user_id, version in result}
 
-        # Hash the password
-        hashed_password = get_password_hash(password)
+    @classmethod
+    @timed(DB_QUERY_DURATION.labels("get_by_ids"))
+    async def get_by_ids(cls, db: AsyncSession, user_ids: Iterable[int]) -> List['User']:
+        """Get every user with one of the given IDs in a single query."""
+        user_ids = set(user_ids)
+        users = list(await db.scalars(select(cls).where(cls.id.in_(list(user_ids)))))
+        if len(users) < len(user_ids) and reads_from_replica(db):
+            use_primary(db)
+            missing = user_ids.difference(user.id for user in users)
+            users += await db.scalars(select(cls).where(cls.id.in_(list(missing))))
+        return users
 
-        # Create new user
-        db_user = cls(
-            username=username,
-            email=email,
-            hashed_password=hashed_password
+    @classmethod
+    @timed(DB_QUERY_DURATION.labels("get_by_login"))
+    async def get_by_login(cls, db: AsyncSession, login: str) -> Optional['User']:
+        """Get user by username or email in a single query, preferring a username match."""
+        query = (
+            select(cls)
+            .where(or_(cls.username == login, cls.email == login))
+            .order_by(case((cls.username == login, 0), else_=1))
+            .limit(1)
         )
+        user = await db.scalar(query)
+        if user is None and reads_from_replica(db):
+            use_primary(db)
+            user = await db.scalar(query)
+        return user
 
+    @classmethod
+    def _duplicate_field(cls, error: IntegrityError) -> Optional[str]:
+        """Work out which unique column an INSERT collided with."""
+        cause = getattr(error.orig, "__cause__", None)
+        constraint = getattr(cause, "constraint_name", None) or ""
+        message = str(error.orig)
+        for field in ("username", "email"):
+            if f"users_{field}" in constraint or f"users.{field}" in message or f"users_{field}" in message:
+                return field
+        return None
+
+    @classmethod
+    async def create_user(cls, db: AsyncSession, username: str, email: str, password: str) -> 'User':
+        """Create a new user with a single INSERT using the given database session."""
+        from services.user_cache import user_cache
+
+        # Hash the password
+        hashed_password = await get_password_hash_async(password)
+
+        # Insert and read back server defaults in one round trip; uniqueness is
+        # enforced by the database rather than by racy existence checks
+        started = time.perf_counter()
         try:
-            db.add(db_user)
-            db.commit()
-            db.refresh(db_user)
+            db_user = await db.scalar(
+                insert(cls)
+                .values(username=username, email=email, hashed_password=hashed_password)
+                .returning(cls)
+            )
+            await db.commit()
+            user_cache.invalidate(db_user.id)
             return db_user
-        except IntegrityError:
-            db.rollback()
+        except IntegrityError as e:
+            await db.rollback()
+            field = cls._duplicate_field(e)
+            if field == "username":
+                detail = "Username already registered"
+            elif field == "email":
+                detail = "Email already registered"
+            else:
+                detail = "User creation failed due to database constraints"
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User creation failed due to database constraints"
-        )
+                detail=detail
+            )
         finally:
-            db.close()
+            DB_QUERY_DURATION.labels("create_user").observe(time.perf_counter() - started)
 
     @classmethod
-    def authenticate(cls, username: str, password: str) -> Optional['User']:
-        """Authenticate user by username/email and password - manages its own database session."""
-        # Try to find user by username first, then by email
-        user = cls.get_by_username(username)
-        if not user:
-            user = cls.get_by_email(username)
-
-        if not user:
-            return None
+    async def authenticate(cls, db: AsyncSession, username: str, password: str) -> Optional['User']:
+        """Authenticate user by username/email and password using the given database session."""
+        user = await cls.get_by_login(db, username)
 
-        if not verify_password(password, user.hashed_password):
+        if not user or not await user.check_password(db, password):
             return None
+        return user
 
-        if not user.is_active:
-            return None
+    async def check_password(self, db: AsyncSession, password: str) -> bool:
+        """Check a login's password for this user; inactive users never pass."""
+        if not await verify_password_async(password, self.hashed_password):
+            return False
 
-        return user
+        if not self.is_active:
+            return False
+
+        if password_needs_rehash(self.hashed_password):
+            # Upgrade the hash after the response rather than making this login wait
+            self._schedule_rehash(db.bind, self.id, password, self.hashed_password)
 
+        return True
 
-    def update_activity_status(self, is_active: bool) -> 'User':
-        """Update user active status - manages its own database session."""
+    @classmethod
+    def _schedule_rehash(cls, bind: AsyncEngine, user_id: int, password: str, old_hash: str) -> None:
+        if user_id in _pending_rehashes:
+            return
+        task = asyncio.create_task(cls.rehash_password(bind, user_id, password, old_hash))
+        _pending_rehashes[user_id] = task
+        task.add_done_callback(lambda _: _pending_rehashes.pop(user_id, None))
+
+    @classmethod
+    async def rehash_password(cls, bind: AsyncEngine, user_id: int, password: str, old_hash: str) -> bool:
+        """
+        Replace an outdated password hash with one at the current cost.
+        The update only applies if the password has not changed in the meantime.
+        """
         try:
-            self.is_active = is_active
-            db.commit()
-            db.refresh(self)
-            return self
-        finally:
-            db.close()
+            new_hash = await get_password_hash_async(password)
+            async with AsyncSession(bind) as db:
+                result = await db.execute(
+                    update(cls)
+                    .where(cls.id == user_id, cls.hashed_password == old_hash)
+                    .values(hashed_password=new_hash)
+                )
+                await db.commit()
+            return result.rowcount == 1
+        except Exception:
+            # The next login retries the upgrade
+            ERRORS.labels("password_rehash").inc()
+            logger.exception("Failed to rehash password for user %s", user_id)
+            return False
+
+
+    @timed(DB_QUERY_DURATION.labels("change_password"))
+    async def change_password(self, db: AsyncSession, password: str) -> 'User':
+        """Set a new password and invalidate every token issued to the user."""
+        from services.token_versions import token_versions
+        from services.user_cache import user_cache
+
+        self.hashed_password = await get_password_hash_async(password)
+        self.token_version = User.token_version + 1
+        db.add(self)
+        await db.commit()
+        await db.refresh(self)
+        user_cache.invalidate(self.id)
+        token_versions.set(self.id, self.token_version)
+        return self
+
+    @timed(DB_QUERY_DURATION.labels("update_activity_status"))
+    async def update_activity_status(self, db: AsyncSession, is_active: bool) -> 'User':
+        """Update user active status using the given database session."""
+        from services.token_versions import token_versions
+        from services.user_cache import user_cache
+
+        self.is_active = is_active
+        # Incremented in SQL so concurrent changes cannot reuse a version
+        self.token_version = User.token_version + 1
+        db.add(self)
+        if not is_active:
+            # Revoke every token issued to the user so far
+            now = datetime.now(timezone.utc)
+            db.add(TokenRevocation(
+                user_id=self.id,
+                issued_before=now,
+                expires_at=now + timedelta(minutes=SESSION_MAX_LIFETIME_MINUTES)
+            ))
+        await db.commit()
+        await db.refresh(self)
+        user_cache.invalidate(self.id)
+        token_versions.set(self.id, self.token_version)
+        return self
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -22,15 +22,82 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+def user_response(user) -> UserResponse:
+    """Serialize a User record; every endpoint returning a user goes through here."""
+    return UserResponse.model_validate(user)
+
+def claims_user_response(token_data: dict) -> UserResponse:
+    """The user response described by a token's versioned claims."""
+    return UserResponse(
+        id=token_data["user_id"],
+        username=token_data["username"],
+        email=token_data["email"],
+        is_active=token_data["active"],
+        created_at=token_data["created_at"],
+        updated_at=token_data["updated_at"],
+    )
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
     expires_in: int
+    inactivity_timeout: Optional[int] = None
+    refresh_token: Optional[str] = Field(None, description="Single-use token for /auth/refresh")
+    refresh_expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class TokenBatch(BaseModel):
+    tokens: List[str] = Field(..., max_length=100, description="Tokens to verify, at most 100 per call")
+
+class TokenVerificationResult(BaseModel):
+    valid: bool
+    user: Optional[UserResponse] = None
+    detail: Optional[str] = Field(None, description="Why the token was rejected")
+
+class TokenVerificationBatch(BaseModel):
+    results: List[TokenVerificationResult] = Field(..., description="One result per token, in request order")
 
 class TokenData(BaseModel):
     username: Optional[str] = None
     user_id: Optional[int] = None
 
+class SessionActivityItem(BaseModel):
+    session_id: str
+    user_id: int
+    last_seen: float = Field(..., description="Unix timestamp of the latest observed activity")
+    issued_at: Optional[float] = Field(None, description="Unix timestamp the session's token was issued")
+
+class SessionActivityBatch(BaseModel):
+    sessions: List[SessionActivityItem] = Field(..., max_length=1000)
+
+class SessionActivityResult(BaseModel):
+    expired: List[str]
+
+class RevocationEntry(BaseModel):
+    id: int
+    jti: Optional[str] = None
+    user_id: Optional[int] = None
+    issued_before: Optional[float] = Field(None, description="Tokens of user_id issued before this Unix timestamp are revoked")
+    expires_at: float
+
+class RevocationFeed(BaseModel):
+    revocations: List[RevocationEntry]
+    cursor: int
+    has_more: bool
+
+class UserImportError(BaseModel):
+    line: int
+    username: Optional[str] = None
+    detail: str
+
+class UserImportResult(BaseModel):
+    total: int
+    imported: int
+    failed: int
+    errors: List[UserImportError]
+
 class MessageResponse(BaseModel):
     message: str
     status: str = "success"
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Production server: a pre-fork launcher running the auth service in several
+worker processes.
+
+The parent binds the listening socket, allocates the shared cache, imports
+the app, loads the signing keys and calibrates the bcrypt cost once, then
+forks the workers, which accept connections on
+the inherited socket. Workers that die are replaced. SIGTERM or SIGINT stops
+the workers gracefully and then the launcher.
+
+Usage: python serve.py [--workers N] [--host HOST] [--port PORT]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Serving configuration
+AUTH_SERVICE_HOST = os.getenv("AUTH_SERVICE_HOST", "0.0.0.0")
+AUTH_SERVICE_PORT = int(os.getenv("AUTH_SERVICE_PORT", "8001"))
+AUTH_SERVICE_WORKERS = int(os.getenv("AUTH_SERVICE_WORKERS", str(os.cpu_count() or 1)))
+
+# A worker exiting sooner than this after being started is restarted with a delay
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock: socket.socket) -> None:
+    import uvicorn
+
+    # The launcher's handlers are not the worker's; uvicorn installs its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    uvicorn.Server(uvicorn.Config(app)).run(sockets=[sock])
+
+def spawn(app, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the auth service with several worker processes")
+    parser.add_argument("--workers", type=int, default=AUTH_SERVICE_WORKERS, help="Worker processes to run")
+    parser.add_argument("--host", default=AUTH_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=AUTH_SERVICE_PORT)
+    args = parser.parse_args()
+
+    sock = bind_socket(args.host, args.port)
+
+    # Allocated before the fork so every worker maps the same memory
+    from services.shared_cache import shared_table
+    shared_table.open()
+
+    # Imported once here so workers share the loaded code copy-on-write
+    from app import app
+
+    # Each worker starts its own hashing pool; split the cores between them
+    from services.hashing import hashing_executor
+    hashing_executor.share_cores(args.workers)
+
+    # Loaded once here so every worker signs with, and publishes, the same keys,
+    # including a generated ephemeral key
+    from utils.auth import BCRYPT_CALIBRATE, calibrate_bcrypt_rounds, signing_keys
+    if signing_keys is not None:
+        signing_keys.load()
+
+    # Calibrated once here, with no worker competing for the cores; workers inherit
+    # the cost, and the pool used for timing is stopped so each worker starts its own
+    if BCRYPT_CALIBRATE:
+        asyncio.run(calibrate_bcrypt_rounds())
+        hashing_executor.shutdown()
+
+    workers = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(max(1, args.workers)):
+        workers[spawn(app, sock)] = time.monotonic()
+    print(f"Auth service listening on {args.host}:{args.port} with {len(workers)} workers", flush=True)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting", file=sys.stderr, flush=True)
+        if time.monotonic() - started < RESPAWN_BACKOFF_SECONDS:
+            time.sleep(RESPAWN_BACKOFF_SECONDS)
+        if not stopping:
+            workers[spawn(app, sock)] = time.monotonic()
+
+    sock.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+
+from services.metrics import ERRORS
+
+load_dotenv()
+
+# Hashing pool configuration - without HASH_POOL_WORKERS the pool gets every core, or its
+# share of them when serve.py runs several server workers
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", str(HASH_POOL_WORKERS * 8)))
+
+class HashingExecutor:
+    """
+    Bounded process pool for CPU-bound password hashing.
+
+    bcrypt takes hundreds of milliseconds per call, so running it on the event
+    loop stalls every other request on the worker. Jobs are shipped to a pool of
+    processes instead, and once `max_queue` jobs are in flight new ones are
+    rejected with 503 rather than piling up behind a login storm.
+    """
+
+    def __init__(self, max_workers: int = HASH_POOL_WORKERS, max_queue: int = HASH_QUEUE_SIZE):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(1, max_queue)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    def share_cores(self, server_workers: int) -> None:
+        """
+        Size the pool for one of `server_workers` processes sharing the machine's
+        cores, so they do not start a full pool each. Explicit HASH_POOL_WORKERS
+        and HASH_QUEUE_SIZE settings are kept. Must be called before the pool starts.
+        """
+        if "HASH_POOL_WORKERS" not in os.environ:
+            self.max_workers = max(1, (os.cpu_count() or 1) // max(1, server_workers))
+        if "HASH_QUEUE_SIZE" not in os.environ:
+            self.max_queue = self.max_workers * 8
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs currently queued or running."""
+        return self._pending
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers do not inherit the parent's event loop or DB connections
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` in the pool, or raise 503 if the queue is full."""
+        if self._pending >= self.max_queue:
+            ERRORS.labels("hashing_capacity").inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing capacity exceeded, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+# Shared executor used by the auth utilities
+hashing_executor = HashingExecutor()
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from dotenv import load_dotenv
+
+from services.database import pool_status
+from services.metrics import ERRORS, STARTUP_DURATION
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Background database probe configuration
+DB_HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("DB_HEALTH_CHECK_INTERVAL_SECONDS", "5"))
+DB_HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("DB_HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+
+# Server version queries for the databases we run against
+VERSION_QUERIES = {
+    "postgresql": "SELECT version()",
+    "sqlite": "SELECT sqlite_version()",
+}
+
+class DatabaseHealthChecker:
+    """
+    Probes the database with `SELECT 1` on an interval and keeps the result.
+    Until the first probe succeeds it retries with a short backoff, so a
+    worker started before the database becomes ready soon after it.
+
+    Health endpoints serve the latest result instead of querying the database
+    themselves, so orchestrator probes add no database load. Each probe also
+    records how long it waited to check a connection out of the pool, which
+    is the wait a request would have seen at that moment.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float = DB_HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout_seconds: float = DB_HEALTH_CHECK_TIMEOUT_SECONDS,
+    ):
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.ready = False
+        self.error: Optional[str] = "Database not checked yet"
+        self.checked_at: Optional[float] = None
+        self.latency_ms: Optional[float] = None
+        self.checkout_wait_ms: Optional[float] = None
+        self.version: Optional[str] = None
+        self._get_engine: Optional[Callable[[], AsyncEngine]] = None
+        self._engine: Optional[AsyncEngine] = None
+        self._task: Optional[asyncio.Task] = None
+        self._started_at: Optional[float] = None
+        self.ready_after_ms: Optional[float] = None
+
+    def start(self, get_engine: Callable[[], AsyncEngine]) -> None:
+        """Start probing the database in the background; the engine is created by the first probe."""
+        self._get_engine = get_engine
+        self._started_at = time.perf_counter()
+        if self._task is None:
+            self._task = asyncio.create_task(self._check_loop())
+
+    async def stop(self) -> None:
+        """Stop the background probe."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def check(self) -> bool:
+        """Probe the database once and record the outcome."""
+        try:
+            await asyncio.wait_for(self._probe(), self.timeout_seconds)
+        except Exception as e:
+            ERRORS.labels("db_health_check").inc()
+            if self.ready:
+                logger.warning("Database health check failed: %s", e)
+            self.ready = False
+            self.error = str(e) or type(e).__name__
+        else:
+            self.ready = True
+            self.error = None
+            if self.ready_after_ms is None:
+                self.ready_after_ms = (time.perf_counter() - self._started_at) * 1000
+                STARTUP_DURATION.labels("database_ready").set(self.ready_after_ms / 1000)
+        self.checked_at = time.time()
+        return self.ready
+
+    async def _probe(self) -> None:
+        self._engine = self._get_engine()
+        started = time.perf_counter()
+        async with self._engine.connect() as conn:
+            connected = time.perf_counter()
+            self.checkout_wait_ms = (connected - started) * 1000
+            await conn.execute(text("SELECT 1"))
+            self.latency_ms = (time.perf_counter() - connected) * 1000
+            if self.version is None:
+                query = VERSION_QUERIES.get(self._engine.dialect.name)
+                if query is not None:
+                    self.version = (await conn.execute(text(query))).scalar_one()
+
+    async def _check_loop(self) -> None:
+        retry_delay = 0.25
+        while True:
+            if await self.check():
+                retry_delay = 0.25
+                await asyncio.sleep(self.interval_seconds)
+            else:
+                await asyncio.sleep(min(retry_delay, self.interval_seconds))
+                retry_delay = min(retry_delay * 2, self.interval_seconds)
+
+    def status(self) -> dict:
+        """Latest probe result with current pool occupancy."""
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "checked_at": self.checked_at,
+            "latency_ms": self.latency_ms,
+            "checkout_wait_ms": self.checkout_wait_ms,
+            "ready_after_ms": self.ready_after_ms,
+            **(pool_status(self._engine) if self._engine is not None else {}),
+        }
+
+# Shared database checker for the health endpoints
+database_health = DatabaseHealthChecker()
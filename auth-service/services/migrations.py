@@ -0,0 +1,87 @@
+import importlib
+import logging
+import pkgutil
+import re
+from datetime import datetime, timezone
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Package holding the migration scripts, named <version>_<description>.py
+MIGRATIONS_PACKAGE = "migrations"
+MIGRATION_NAME = re.compile(r"^(\d+)_(\w+)$")
+
+# Serializes concurrent runs on PostgreSQL; the key is arbitrary but fixed
+MIGRATION_LOCK_KEY = 7251004
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+def discover() -> List[Migration]:
+    """All migration scripts, in version order."""
+    package = importlib.import_module(MIGRATIONS_PACKAGE)
+    migrations = []
+    for module_info in pkgutil.iter_modules(package.__path__):
+        match = MIGRATION_NAME.match(module_info.name)
+        if match is None:
+            continue
+        module = importlib.import_module(f"{MIGRATIONS_PACKAGE}.{module_info.name}")
+        migrations.append(Migration(int(match.group(1)), match.group(2), module.upgrade))
+    migrations.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions in {MIGRATIONS_PACKAGE}: {versions}")
+    return migrations
+
+async def _applied_versions(conn: AsyncConnection) -> List[int]:
+    await conn.run_sync(lambda sync_conn: schema_migrations.create(sync_conn, checkfirst=True))
+    result = await conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version))
+    return list(result.scalars())
+
+async def current_version(engine: AsyncEngine) -> Optional[int]:
+    """Latest applied migration, or None for an unmanaged database."""
+    async with engine.begin() as conn:
+        applied = await _applied_versions(conn)
+    return applied[-1] if applied else None
+
+async def migrate(engine: AsyncEngine, target: Optional[int] = None) -> List[Migration]:
+    """
+    Apply pending migrations up to `target` (default: all) and return them.
+
+    Everything runs in one transaction, so a failed migration leaves the
+    schema as it was. On PostgreSQL an advisory lock makes a second runner
+    wait and then find nothing left to do.
+    """
+    migrations = discover()
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        applied = set(await _applied_versions(conn))
+        pending = [
+            migration for migration in migrations
+            if migration.version not in applied and (target is None or migration.version <= target)
+        ]
+        for migration in pending:
+            logger.info("Applying migration %04d_%s", migration.version, migration.name)
+            await conn.run_sync(migration.upgrade)
+            await conn.execute(insert(schema_migrations).values(
+                version=migration.version,
+                name=migration.name,
+                applied_at=datetime.now(timezone.utc),
+            ))
+    return pending
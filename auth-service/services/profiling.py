@@ -0,0 +1,205 @@
+import asyncio
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+import secrets
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import Header, HTTPException, status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Profiling is off unless a token is configured for the header, or a sampling rate is set
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "50"))
+PROFILING_TOP_FUNCTIONS = 15
+
+# Request header carrying PROFILING_TOKEN to profile that request
+PROFILING_HEADER = b"x-profile"
+
+class RequestProfiler:
+    """
+    Profiles selected requests with cProfile and keeps the slowest recent ones.
+
+    A request is profiled when it carries the profiling token in the
+    X-Profile header, or when it is picked at the sampling rate. Each
+    profile is written to `directory` as a pstats file, for `python -m
+    pstats` or snakeviz, and only the newest `max_files` are kept. A summary
+    of each, with its most expensive functions, is held in memory for the
+    summary endpoint.
+
+    cProfile sees everything the event loop runs while the request is in
+    flight, including other requests interleaved with it, and one profile
+    runs at a time per process; triggers arriving meanwhile are skipped.
+    Work done in other processes, such as password hashes, shows up only as
+    the time spent awaiting it.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = PROFILING_TOKEN,
+        sample_rate: float = PROFILING_SAMPLE_RATE,
+        directory: str = PROFILING_DIR,
+        max_files: int = PROFILING_MAX_FILES,
+    ):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_files = max_files
+        self._recent: "deque[dict]" = deque(maxlen=max_files)
+        self._active = False
+        self.profiled = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Check a presented profiling token."""
+        return bool(self.token) and token is not None and secrets.compare_digest(token, self.token)
+
+    def trigger(self, scope: Scope) -> Optional[str]:
+        """Why the request should be profiled, or None."""
+        for name, value in scope["headers"]:
+            if name == PROFILING_HEADER and self.authorized(value.decode("latin-1")):
+                return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def begin(self) -> Optional[cProfile.Profile]:
+        """Start a profile, unless one is already running."""
+        if self._active:
+            self.skipped += 1
+            return None
+        self._active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    async def finish(self, profile: cProfile.Profile, entry: dict) -> None:
+        """Stop a profile, write it out and record its summary."""
+        profile.disable()
+        self._active = False
+        self.profiled += 1
+        try:
+            entry["top"] = self._top_functions(profile)
+            entry["file"] = await asyncio.to_thread(self._save, profile, entry)
+        except Exception:
+            logger.exception("Failed to save request profile")
+            return
+        self._recent.append(entry)
+
+    @staticmethod
+    def _top_functions(profile: cProfile.Profile) -> List[dict]:
+        stats = pstats.Stats(profile)
+        rows = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({
+                "function": f"{function} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "total_ms": total * 1000,
+                "cumulative_ms": cumulative * 1000,
+            })
+        rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+        return rows[:PROFILING_TOP_FUNCTIONS]
+
+    def _save(self, profile: cProfile.Profile, entry: dict) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", entry["path"]).strip("_") or "root"
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        filename = f"{stamp}-{entry['method']}-{slug[:60]}-{entry['duration_ms']:.0f}ms.prof"
+        profile.dump_stats(os.path.join(self.directory, filename))
+
+        # Names start with the timestamp, so they sort oldest first
+        existing = sorted(name for name in os.listdir(self.directory) if name.endswith(".prof"))
+        for name in existing[:max(len(existing) - self.max_files, 0)]:
+            os.remove(os.path.join(self.directory, name))
+        return filename
+
+    def summary(self, limit: int = 20) -> dict:
+        """The slowest recently profiled requests, slowest first."""
+        slowest = sorted(self._recent, key=lambda entry: entry["duration_ms"], reverse=True)[:limit]
+        return {
+            "directory": os.path.abspath(self.directory),
+            "profiled": self.profiled,
+            "skipped": self.skipped,
+            "profiles": slowest,
+        }
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling the requests the profiler selects.
+    Added outermost, so the other middleware is part of the profile.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: Optional[RequestProfiler] = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trigger = self.profiler.trigger(scope)
+        profile = self.profiler.begin() if trigger is not None else None
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            route = scope.get("route")
+            await self.profiler.finish(profile, {
+                "method": scope["method"],
+                "path": route.path if route is not None else scope["path"],
+                "status": status_code,
+                "duration_ms": duration * 1000,
+                "trigger": trigger,
+                "profiled_at": time.time(),
+            })
+
+def require_profiling_token(x_profile: Optional[str] = Header(None)) -> None:
+    """
+    Allow the request only with the configured profiling token. Profiles
+    expose file paths, function names and route timings, so without a token
+    they are not served even while sampling is on.
+    """
+    if not request_profiler.token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Profiling token is not configured"
+        )
+    if not request_profiler.authorized(x_profile):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid profiling token"
+        )
+
+# Shared request profiler for the service
+request_profiler = RequestProfiler()
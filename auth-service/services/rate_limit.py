@@ -0,0 +1,192 @@
+import math
+import os
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from dotenv import load_dotenv
+
+from services.metrics import registry
+from services.shared_cache import SharedHashTable, shared_table
+
+load_dotenv()
+
+# Login throttling configuration; a bucket holds `capacity` attempts and
+# regains one every 60 / per_minute seconds
+LOGIN_RATE_LIMIT_ENABLED = os.getenv("LOGIN_RATE_LIMIT_ENABLED", "true").lower() == "true"
+LOGIN_RATE_LIMIT_IP_CAPACITY = int(os.getenv("LOGIN_RATE_LIMIT_IP_CAPACITY", "30"))
+LOGIN_RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("LOGIN_RATE_LIMIT_IP_PER_MINUTE", "60"))
+LOGIN_RATE_LIMIT_USERNAME_CAPACITY = int(os.getenv("LOGIN_RATE_LIMIT_USERNAME_CAPACITY", "10"))
+LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE = float(os.getenv("LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE", "5"))
+LOGIN_RATE_LIMIT_MAX_BUCKETS = int(os.getenv("LOGIN_RATE_LIMIT_MAX_BUCKETS", "100000"))
+LOGIN_RATE_LIMIT_SHARDS = int(os.getenv("LOGIN_RATE_LIMIT_SHARDS", "16"))
+# Only enable behind a proxy that overwrites X-Forwarded-For
+LOGIN_RATE_LIMIT_TRUST_FORWARDED_FOR = os.getenv("LOGIN_RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+THROTTLED = registry.counter("login_throttled_total", "Login attempts rejected by the rate limiter", ["scope"])
+
+class RateLimitStore(ABC):
+    """
+    Storage for token buckets; `take` must apply the refill and the
+    withdrawal atomically for every process sharing the store.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        """
+        Withdraw one token from the bucket for `key`.
+
+        Returns 0 when the token was granted, otherwise the number of seconds
+        until one becomes available.
+        """
+
+class MemoryRateLimitStore(RateLimitStore):
+    """
+    In-process token buckets, sharded by key.
+
+    Each shard is an LRU with its own lock, so a check touches one small
+    dict and contends only with keys in the same shard. Memory is bounded by
+    `max_buckets`: the least recently used bucket of a full shard is evicted,
+    which is what an idle bucket refills to anyway.
+    """
+
+    def __init__(self, max_buckets: int = LOGIN_RATE_LIMIT_MAX_BUCKETS, shards: int = LOGIN_RATE_LIMIT_SHARDS):
+        self.shard_count = max(1, shards)
+        self.shard_capacity = max(1, max_buckets // self.shard_count)
+        self._shards: List["OrderedDict[str, Tuple[float, float]]"] = [OrderedDict() for _ in range(self.shard_count)]
+        self._locks = [threading.Lock() for _ in range(self.shard_count)]
+        self.evictions = 0
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        index = hash(key) % self.shard_count
+        shard = self._shards[index]
+        now = time.monotonic()
+        with self._locks[index]:
+            bucket = shard.get(key)
+            if bucket is None:
+                tokens = capacity
+                if len(shard) >= self.shard_capacity:
+                    shard.popitem(last=False)
+                    self.evictions += 1
+            else:
+                tokens, updated_at = bucket
+                tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+                shard.move_to_end(key)
+
+            if tokens >= 1:
+                shard[key] = (tokens - 1, now)
+                return 0.0
+            shard[key] = (tokens, now)
+            return (1 - tokens) / refill_per_second
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+# Tokens left and when they were counted (wall clock, which every worker shares)
+BUCKET = struct.Struct("<dd")
+
+class SharedRateLimitStore(RateLimitStore):
+    """
+    Token buckets in the table shared by the workers of `serve.py`, so a
+    limit holds for the whole server rather than for each worker.
+
+    Each bucket is updated under the table's lock for its set. A bucket
+    expires once it would have refilled completely, and one pushed out of a
+    full set starts again full, as an evicted in-process bucket does. Until
+    the table is opened, in a single-process server, buckets are kept by
+    `fallback` in this process.
+    """
+
+    def __init__(self, table: SharedHashTable = shared_table, fallback: Optional[RateLimitStore] = None):
+        self.table = table
+        self.fallback = fallback if fallback is not None else MemoryRateLimitStore()
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        if not self.table.enabled:
+            return await self.fallback.take(key, capacity, refill_per_second)
+
+        def withdraw(value: Optional[bytes]) -> Tuple[bytes, float]:
+            now = time.time()
+            tokens = capacity
+            if value is not None:
+                tokens, updated_at = BUCKET.unpack(value)
+                tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_per_second)
+            if tokens >= 1:
+                return BUCKET.pack(tokens - 1, now), 0.0
+            return BUCKET.pack(tokens, now), (1 - tokens) / refill_per_second
+
+        return self.table.update(b"rate_limit:" + key.encode(), withdraw, capacity / refill_per_second)
+
+class LoginRateLimiter:
+    """
+    Throttles login attempts per client IP and per account.
+
+    The client is checked before the user is looked up, and the account
+    before the password is verified, so a burst of credential stuffing is
+    turned away without a bcrypt verification each. The account bucket is
+    the user's, whether they log in with their username or their email;
+    logins matching no user share a bucket per lowercased login.
+    """
+
+    def __init__(
+        self,
+        store: Optional[RateLimitStore] = None,
+        ip_capacity: int = LOGIN_RATE_LIMIT_IP_CAPACITY,
+        ip_per_minute: float = LOGIN_RATE_LIMIT_IP_PER_MINUTE,
+        username_capacity: int = LOGIN_RATE_LIMIT_USERNAME_CAPACITY,
+        username_per_minute: float = LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE,
+        enabled: bool = LOGIN_RATE_LIMIT_ENABLED,
+    ):
+        self.store = store if store is not None else SharedRateLimitStore()
+        self.ip_capacity = ip_capacity
+        self.ip_refill = ip_per_minute / 60
+        self.username_capacity = username_capacity
+        self.username_refill = username_per_minute / 60
+        self.enabled = enabled
+
+    async def check_client(self, client_ip: str) -> None:
+        """Spend one attempt for the client, raising 429 when its bucket is exhausted."""
+        if not self.enabled:
+            return
+
+        retry_after = await self.store.take(f"ip:{client_ip}", self.ip_capacity, self.ip_refill)
+        if retry_after:
+            THROTTLED.labels("ip").inc()
+            raise self._too_many_requests(retry_after)
+
+    async def check_account(self, user_id: Optional[int], login: str) -> None:
+        """
+        Spend one attempt for the account a login resolved to, or for the
+        login itself when it matched no user, raising 429 when exhausted.
+        """
+        if not self.enabled:
+            return
+
+        key = f"user:{user_id}" if user_id is not None else f"login:{login.strip().lower()}"
+        retry_after = await self.store.take(key, self.username_capacity, self.username_refill)
+        if retry_after:
+            THROTTLED.labels("username").inc()
+            raise self._too_many_requests(retry_after)
+
+    @staticmethod
+    def _too_many_requests(retry_after: float) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+def client_ip(request: Request, trust_forwarded_for: bool = LOGIN_RATE_LIMIT_TRUST_FORWARDED_FOR) -> str:
+    """Address of the client making the request."""
+    if trust_forwarded_for:
+        forwarded_for = request.headers.get("x-forwarded-for")
+        if forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+# Shared limiter for the login endpoint
+login_limiter = LoginRateLimiter()
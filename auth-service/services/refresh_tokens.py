@@ -0,0 +1,223 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Callable, NamedTuple, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from models.refresh_token import RefreshTokenFamily
+from services.metrics import ERRORS, registry
+from utils.auth import SECRET_KEY, SESSION_MAX_LIFETIME_MINUTES
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Refresh token configuration - a refresh token lapses after REFRESH_TOKEN_EXPIRE_MINUTES
+# unused, and never outlives its login session
+REFRESH_TOKEN_SECRET = os.getenv("REFRESH_TOKEN_SECRET", SECRET_KEY)
+REFRESH_TOKEN_EXPIRE_MINUTES = int(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES", "1440"))
+REFRESH_TOKEN_PURGE_INTERVAL_SECONDS = float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL_SECONDS", "300"))
+REFRESH_TOKEN_PURGE_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH_SIZE", "5000"))
+
+REUSED = registry.counter("refresh_token_reuse_total", "Refresh tokens presented again after being rotated")
+
+def _encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def _to_datetime(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they were written as UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+class RefreshGrant(NamedTuple):
+    """What a rotated refresh token vouches for."""
+    refresh_token: str
+    user_id: int
+    session_id: str
+    token_version: int
+    session_expires_at: datetime
+
+def _invalid(detail: str = "Invalid refresh token") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+class RefreshTokenStore:
+    """
+    Rotating refresh tokens, stored as one row per login session.
+
+    A token is `<session id>.<generation>.<mac>`, where the mac binds the
+    generation to the family's random key. Refreshing reads the family by
+    primary key to check the mac, then advances the generation with a
+    conditional UPDATE, so it costs two indexed statements and no password
+    hash, and a forged token never causes a write. A token whose mac is
+    valid but whose generation has been rotated past is a replayed copy;
+    the whole family is then deleted, logging out both the thief and the
+    user. Families past their expiry are deleted in batches in the
+    background.
+    """
+
+    def __init__(
+        self,
+        secret: str = REFRESH_TOKEN_SECRET,
+        ttl: timedelta = timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES),
+        purge_interval_seconds: float = REFRESH_TOKEN_PURGE_INTERVAL_SECONDS,
+        purge_batch_size: int = REFRESH_TOKEN_PURGE_BATCH_SIZE,
+    ):
+        self._secret = secret.encode()
+        self.ttl = ttl
+        self.purge_interval_seconds = purge_interval_seconds
+        self.purge_batch_size = purge_batch_size
+        self._session_factory: Optional[Callable[[], AsyncSession]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Start purging expired families in the background."""
+        self._session_factory = session_factory
+        if self._task is None:
+            self._task = asyncio.create_task(self._purge_loop())
+
+    async def stop(self) -> None:
+        """Stop the background purge."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _mac(self, key: bytes, session_id: str, generation: int) -> str:
+        message = f"{session_id}.{generation}".encode()
+        return _encode(hmac.new(self._secret + key, message, hashlib.sha256).digest()[:18])
+
+    def _token(self, key: bytes, session_id: str, generation: int) -> str:
+        return f"{session_id}.{generation}.{self._mac(key, session_id, generation)}"
+
+    @staticmethod
+    def _parse(refresh_token: str):
+        try:
+            session_id, generation, mac = refresh_token.rsplit(".", 2)
+            return session_id, int(generation), mac
+        except ValueError:
+            raise _invalid()
+
+    async def issue(self, db: AsyncSession, user_id: int, session_id: str, token_version: int) -> str:
+        """Start the refresh token family of a new login session and return its first token."""
+        now = datetime.now(timezone.utc)
+        session_expires_at = now + timedelta(minutes=SESSION_MAX_LIFETIME_MINUTES)
+        key = secrets.token_bytes(16)
+        await db.execute(insert(RefreshTokenFamily).values(
+            session_id=session_id,
+            user_id=user_id,
+            token_version=token_version,
+            generation=0,
+            key=key,
+            expires_at=min(now + self.ttl, session_expires_at),
+            session_expires_at=session_expires_at,
+        ))
+        await db.commit()
+        return self._token(key, session_id, 0)
+
+    async def rotate(self, db: AsyncSession, refresh_token: str) -> RefreshGrant:
+        """
+        Exchange the current refresh token of a family for the next one.
+        Raises 401 for unknown, expired or forged tokens, and for replayed
+        ones, after deleting their family.
+        """
+        session_id, generation, mac = self._parse(refresh_token)
+        now = datetime.now(timezone.utc)
+        family = RefreshTokenFamily.__table__.c
+
+        # Check the mac before writing anything, so forged tokens cost a read only
+        row = (await db.execute(
+            select(
+                family.key, family.generation, family.expires_at,
+                family.user_id, family.token_version, family.session_expires_at,
+            ).where(family.session_id == session_id)
+        )).first()
+        if row is None or not hmac.compare_digest(mac, self._mac(row.key, session_id, generation)):
+            await db.rollback()
+            raise _invalid()
+        if generation < row.generation:
+            raise await self._reuse_detected(db, session_id)
+        if generation > row.generation:
+            await db.rollback()
+            raise _invalid()
+        if _to_datetime(row.expires_at) <= now:
+            await db.rollback()
+            raise _invalid("Refresh token expired")
+
+        # Claim the next generation; a concurrent use of the same token gets there first at most once
+        sliding = now + self.ttl
+        result = await db.execute(
+            update(RefreshTokenFamily)
+            .where(family.session_id == session_id, family.generation == generation, family.expires_at > now)
+            .values(
+                generation=family.generation + 1,
+                expires_at=case((family.session_expires_at < sliding, family.session_expires_at), else_=sliding),
+            )
+        )
+        if result.rowcount != 1:
+            await db.rollback()
+            raise await self._reuse_detected(db, session_id)
+        await db.commit()
+        return RefreshGrant(
+            refresh_token=self._token(row.key, session_id, generation + 1),
+            user_id=row.user_id,
+            session_id=session_id,
+            token_version=row.token_version,
+            session_expires_at=_to_datetime(row.session_expires_at),
+        )
+
+    async def _reuse_detected(self, db: AsyncSession, session_id: str) -> HTTPException:
+        REUSED.inc()
+        logger.warning("Refresh token reuse detected for session %s, revoking its family", session_id)
+        await self.revoke(db, session_id)
+        return _invalid("Refresh token reuse detected")
+
+    async def revoke(self, db: AsyncSession, session_id: str) -> None:
+        """Delete a session's refresh token family."""
+        await db.execute(delete(RefreshTokenFamily).where(RefreshTokenFamily.session_id == session_id))
+        await db.commit()
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        """Delete expired families in batches and return how many were removed."""
+        family = RefreshTokenFamily.__table__.c
+        removed = 0
+        while True:
+            expired = (
+                select(family.session_id)
+                .where(family.expires_at < datetime.now(timezone.utc))
+                .limit(self.purge_batch_size)
+            )
+            result = await db.execute(delete(RefreshTokenFamily).where(family.session_id.in_(expired)))
+            await db.commit()
+            removed += result.rowcount
+            if result.rowcount < self.purge_batch_size:
+                return removed
+            # Let other work use the connection between batches
+            await asyncio.sleep(0)
+
+    async def _purge_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.purge_interval_seconds)
+            try:
+                async with self._session_factory() as db:
+                    await self.purge_expired(db)
+            except Exception:
+                ERRORS.labels("refresh_token_purge").inc()
+                logger.exception("Failed to purge expired refresh tokens")
+
+# Shared refresh token store for the auth service
+refresh_tokens = RefreshTokenStore()
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from models.token_revocation import TokenRevocation
+from services.metrics import ERRORS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Revocation feed configuration
+REVOCATION_POLL_INTERVAL_SECONDS = float(os.getenv("REVOCATION_POLL_INTERVAL_SECONDS", "5"))
+REVOCATION_PURGE_INTERVAL_SECONDS = float(os.getenv("REVOCATION_PURGE_INTERVAL_SECONDS", "3600"))
+REVOCATION_FEED_PAGE_SIZE = int(os.getenv("REVOCATION_FEED_PAGE_SIZE", "1000"))
+# Entries younger than this are held back from the feed, so a transaction that
+# commits a lower id after a higher one cannot be skipped by a reader's cursor
+REVOCATION_FEED_SETTLE_SECONDS = float(os.getenv("REVOCATION_FEED_SETTLE_SECONDS", "2"))
+
+def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    # SQLite hands back naive datetimes; they were written as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def revocation_entry(row: TokenRevocation) -> dict:
+    """Feed representation of a revocation."""
+    return {
+        "id": row.id,
+        "jti": row.jti,
+        "user_id": row.user_id,
+        "issued_before": _to_timestamp(row.issued_before),
+        "expires_at": _to_timestamp(row.expires_at),
+    }
+
+class RevocationStore:
+    """
+    Denylist of revoked tokens.
+
+    Rows in `token_revocations` revoke either a single token by jti or every
+    token a user was issued before a point in time. The store mirrors the
+    live rows in memory, following the table through the same cursor-based
+    feed that other services poll, so a revocation check is a dict lookup.
+    """
+
+    def __init__(self, poll_interval_seconds: float = REVOCATION_POLL_INTERVAL_SECONDS):
+        self.poll_interval_seconds = poll_interval_seconds
+        self._jtis: Dict[str, float] = {}
+        self._users: Dict[int, Tuple[float, float]] = {}
+        self._cursor = 0
+        self._session_factory: Optional[Callable[[], AsyncSession]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Start following the revocation table in the background."""
+        self._session_factory = session_factory
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        """Stop the background poll."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_revoked(self, token_data: dict) -> bool:
+        """Check a verified token against the denylist."""
+        jti = token_data.get("jti")
+        if jti is not None and jti in self._jtis:
+            return True
+        user_revocation = self._users.get(token_data.get("user_id"))
+        if user_revocation is not None:
+            issued_before, _ = user_revocation
+            return (token_data.get("iat") or 0) < issued_before
+        return False
+
+    async def revoke_token(self, db: AsyncSession, token_data: dict) -> None:
+        """Revoke a single token until it would have expired anyway."""
+        row = TokenRevocation(
+            jti=token_data["jti"],
+            user_id=token_data["user_id"],
+            expires_at=datetime.fromtimestamp(token_data["exp"], tz=timezone.utc),
+        )
+        db.add(row)
+        await db.commit()
+        # Effective here immediately, elsewhere on the next poll
+        self._apply(revocation_entry(row))
+
+    async def changes_since(self, db: AsyncSession, cursor: int, limit: int = REVOCATION_FEED_PAGE_SIZE) -> Tuple[List[dict], int, bool]:
+        """
+        Return live revocations after `cursor`, the cursor to resume from, and
+        whether more entries are waiting.
+        """
+        now = datetime.now(timezone.utc)
+        result = await db.scalars(
+            select(TokenRevocation)
+            .where(
+                TokenRevocation.id > cursor,
+                TokenRevocation.created_at <= now - timedelta(seconds=REVOCATION_FEED_SETTLE_SECONDS),
+            )
+            .order_by(TokenRevocation.id)
+            .limit(limit + 1)
+        )
+        rows = list(result)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = rows[-1].id if rows else cursor
+        entries = [revocation_entry(row) for row in rows if _to_timestamp(row.expires_at) > now.timestamp()]
+        return entries, next_cursor, has_more
+
+    async def refresh(self) -> None:
+        """Apply every revocation recorded since the last refresh."""
+        if self._session_factory is None:
+            return
+        async with self._session_factory() as db:
+            has_more = True
+            while has_more:
+                entries, self._cursor, has_more = await self.changes_since(db, self._cursor)
+                for entry in entries:
+                    self._apply(entry)
+        self._prune()
+
+    async def purge_expired(self, db: AsyncSession) -> None:
+        """Delete revocations whose tokens have expired on their own."""
+        await db.execute(delete(TokenRevocation).where(TokenRevocation.expires_at < datetime.now(timezone.utc)))
+        await db.commit()
+
+    def _apply(self, entry: dict) -> None:
+        if entry["jti"] is not None:
+            self._jtis[entry["jti"]] = entry["expires_at"]
+        elif entry["user_id"] is not None:
+            current = self._users.get(entry["user_id"])
+            if current is None or current[0] < entry["issued_before"]:
+                self._users[entry["user_id"]] = (entry["issued_before"], entry["expires_at"])
+
+    def _prune(self) -> None:
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._jtis.items() if expires_at <= now]:
+            del self._jtis[jti]
+        for user_id in [user_id for user_id, (_, expires_at) in self._users.items() if expires_at <= now]:
+            del self._users[user_id]
+
+    async def _poll_loop(self) -> None:
+        last_purge = time.monotonic()
+        while True:
+            try:
+                await self.refresh()
+                if time.monotonic() - last_purge >= REVOCATION_PURGE_INTERVAL_SECONDS:
+                    async with self._session_factory() as db:
+                        await self.purge_expired(db)
+                    last_purge = time.monotonic()
+            except Exception:
+                ERRORS.labels("revocation_poll").inc()
+                logger.exception("Failed to refresh token revocations")
+            await asyncio.sleep(self.poll_interval_seconds)
+
+def require_not_revoked(token_data: dict) -> None:
+    """Reject a token that has been revoked by logout or deactivation."""
+    if revocations.is_revoked(token_data):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+# Shared revocation store for the auth service
+revocations = RevocationStore()
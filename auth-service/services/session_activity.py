@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from models.session_activity import SessionActivity
+from services.metrics import ERRORS
+from utils.auth import INACTIVITY_TIMEOUT_MINUTES, SESSION_MAX_LIFETIME_MINUTES
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Activity tracking configuration
+SESSION_ACTIVITY_GRANULARITY_SECONDS = float(os.getenv("SESSION_ACTIVITY_GRANULARITY_SECONDS", "60"))
+SESSION_ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.getenv("SESSION_ACTIVITY_FLUSH_INTERVAL_SECONDS", "15"))
+SESSION_ACTIVITY_FLUSH_BATCH_SIZE = 500
+SESSION_ACTIVITY_PURGE_INTERVAL_SECONDS = float(os.getenv("SESSION_ACTIVITY_PURGE_INTERVAL_SECONDS", "3600"))
+SESSION_ACTIVITY_PURGE_BATCH_SIZE = 5000
+
+def _to_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+def _to_timestamp(value: datetime) -> float:
+    # SQLite hands back naive datetimes; they were written as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class SessionActivityStore:
+    """
+    Tracks the last activity of every session to enforce an inactivity timeout.
+
+    Last-seen timestamps live in memory and are written to Postgres by a
+    background task in batched upserts, so authenticated requests never wait
+    on a database write. Activity inside the granularity window of the last
+    recorded timestamp is not recorded again. A session is accepted straight
+    from memory; only a session that looks expired, or that this process has
+    not seen yet, is read back from the database in case another worker has
+    newer activity for it. Rows of sessions past their maximum lifetime are
+    deleted in batches in the background.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = INACTIVITY_TIMEOUT_MINUTES * 60,
+        granularity_seconds: float = SESSION_ACTIVITY_GRANULARITY_SECONDS,
+        flush_interval_seconds: float = SESSION_ACTIVITY_FLUSH_INTERVAL_SECONDS,
+        purge_interval_seconds: float = SESSION_ACTIVITY_PURGE_INTERVAL_SECONDS,
+        purge_batch_size: int = SESSION_ACTIVITY_PURGE_BATCH_SIZE,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.granularity_seconds = granularity_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self.purge_batch_size = purge_batch_size
+        self._last_seen: Dict[str, Tuple[int, float]] = {}
+        self._dirty: Dict[str, Tuple[int, float]] = {}
+        self._session_factory: Optional[Callable[[], AsyncSession]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Start the background flush task."""
+        self._session_factory = session_factory
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out any pending activity."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def start_session(self, user_id: int) -> str:
+        """Open a new session for a user and return its id."""
+        session_id = secrets.token_urlsafe(24)
+        self._record(session_id, user_id, time.time())
+        return session_id
+
+    async def touch(self, db: AsyncSession, token_data: dict) -> bool:
+        """
+        Check that the token's session is still active and record activity now.
+        Returns False if the session has been idle longer than the timeout.
+        Tokens issued without a session id are not subject to the check.
+        """
+        session_id = token_data.get("sid")
+        if not session_id:
+            return True
+
+        expired = await self.record_activity(db, [
+            (session_id, token_data["user_id"], token_data.get("iat"), time.time())
+        ])
+        return not expired
+
+    async def record_activity(
+        self,
+        db: AsyncSession,
+        activity: Iterable[Tuple[str, int, Optional[float], float]],
+    ) -> List[str]:
+        """
+        Apply (session_id, user_id, issued_at, seen_at) observations and
+        return the ids of sessions that had already expired.
+        """
+        now = time.time()
+        activity = list(activity)
+
+        # Sessions that are unknown here or look expired are confirmed against
+        # the database in one query before being rejected
+        to_load = [
+            session_id for session_id, _, _, seen_at in activity
+            if session_id not in self._last_seen
+            or min(seen_at, now) - self._last_seen[session_id][1] > self.timeout_seconds
+        ]
+        stored = await self._load(db, to_load) if to_load else {}
+
+        expired = []
+        for session_id, user_id, issued_at, seen_at in activity:
+            seen_at = min(seen_at, now)
+            previous = max(
+                self._last_seen.get(session_id, (user_id, 0.0))[1],
+                stored.get(session_id, 0.0),
+            )
+            if not previous:
+                # Not flushed by any worker yet; the session began when the token was issued
+                previous = issued_at or 0.0
+
+            if seen_at - previous > self.timeout_seconds:
+                expired.append(session_id)
+            elif seen_at - previous >= self.granularity_seconds:
+                self._record(session_id, user_id, seen_at)
+            elif previous > self._last_seen.get(session_id, (user_id, 0.0))[1]:
+                self._last_seen[session_id] = (user_id, previous)
+
+        return expired
+
+    def _record(self, session_id: str, user_id: int, seen_at: float) -> None:
+        self._last_seen[session_id] = (user_id, seen_at)
+        self._dirty[session_id] = (user_id, seen_at)
+
+    async def _load(self, db: AsyncSession, session_ids: List[str]) -> Dict[str, float]:
+        result = await db.execute(
+            select(SessionActivity.session_id, SessionActivity.last_activity)
+            .where(SessionActivity.session_id.in_(session_ids))
+        )
+        return {session_id: _to_timestamp(last_activity) for session_id, last_activity in result}
+
+    async def _flush_loop(self) -> None:
+        last_purge = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+            if time.monotonic() - last_purge >= self.purge_interval_seconds:
+                try:
+                    async with self._session_factory() as db:
+                        await self.purge_expired(db)
+                except Exception:
+                    ERRORS.labels("session_purge").inc()
+                    logger.exception("Failed to purge expired session activity")
+                last_purge = time.monotonic()
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        """
+        Delete the rows of sessions past their maximum lifetime in batches and
+        return how many were removed. Their last activity is older than the
+        lifetime, so they started before it too.
+        """
+        cutoff = _to_datetime(time.time() - max(SESSION_MAX_LIFETIME_MINUTES * 60, self.timeout_seconds))
+        removed = 0
+        while True:
+            expired = (
+                select(SessionActivity.session_id)
+                .where(SessionActivity.last_activity < cutoff)
+                .limit(self.purge_batch_size)
+            )
+            result = await db.execute(delete(SessionActivity).where(SessionActivity.session_id.in_(expired)))
+            await db.commit()
+            removed += result.rowcount
+            if result.rowcount < self.purge_batch_size:
+                return removed
+            # Let other work use the connection between batches
+            await asyncio.sleep(0)
+
+    async def flush(self) -> None:
+        """Upsert pending activity in batches and forget expired sessions."""
+        if self._dirty and self._session_factory is not None:
+            pending, self._dirty = self._dirty, {}
+            try:
+                async with self._session_factory() as db:
+                    rows = [
+                        {"session_id": session_id, "user_id": user_id, "last_activity": _to_datetime(seen_at)}
+                        for session_id, (user_id, seen_at) in pending.items()
+                    ]
+                    for start in range(0, len(rows), SESSION_ACTIVITY_FLUSH_BATCH_SIZE):
+                        await db.execute(self._upsert(db, rows[start:start + SESSION_ACTIVITY_FLUSH_BATCH_SIZE]))
+                    await db.commit()
+            except Exception:
+                ERRORS.labels("session_flush").inc()
+                logger.exception("Failed to flush session activity, will retry")
+                # Keep anything recorded since the swap, it is newer
+                for session_id, entry in pending.items():
+                    self._dirty.setdefault(session_id, entry)
+
+        cutoff = time.time() - self.timeout_seconds
+        stale = [
+            session_id for session_id, (_, seen_at) in self._last_seen.items()
+            if seen_at < cutoff and session_id not in self._dirty
+        ]
+        for session_id in stale:
+            del self._last_seen[session_id]
+
+    @staticmethod
+    def _upsert(db: AsyncSession, rows: List[dict]):
+        if db.bind.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        statement = insert(SessionActivity).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=[SessionActivity.session_id],
+            set_={"last_activity": statement.excluded.last_activity},
+            # Another worker may already have written newer activity
+            where=SessionActivity.last_activity < statement.excluded.last_activity,
+        )
+
+async def require_active_session(db: AsyncSession, token_data: dict) -> None:
+    """Reject a token whose session has expired through inactivity."""
+    if not await session_activity.touch(db, token_data):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expired due to inactivity",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+# Shared activity store for the auth service
+session_activity = SessionActivityStore()
@@ -0,0 +1,242 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from typing import Callable, Optional, Tuple, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Shared cache configuration; the table takes SHARED_CACHE_SLOTS * SHARED_CACHE_SLOT_SIZE bytes
+SHARED_CACHE_SLOTS = int(os.getenv("SHARED_CACHE_SLOTS", "65536"))
+SHARED_CACHE_SLOT_SIZE = int(os.getenv("SHARED_CACHE_SLOT_SIZE", "512"))
+
+# Slots per set: a key can live in any slot of the set its hash selects
+SET_WAYS = 8
+
+# seq, crc32 of the value, expiry (wall clock), key digest, value length
+SLOT_HEADER = struct.Struct("<IId16sH")
+SEQ = struct.Struct("<I")
+
+# Reads that keep racing a writer give up and count as a miss
+READ_ATTEMPTS = 3
+
+T = TypeVar("T")
+
+class SharedHashTable:
+    """
+    Fixed-size hash table in shared memory, for caches that every worker
+    process should see.
+
+    The table is an anonymous shared mmap created by the launcher before it
+    forks its workers, so a value stored by one worker is read by the others
+    without a cache service. Keys are hashed to a set of `SET_WAYS` slots;
+    a full set overwrites its entry closest to expiring. Values larger than a
+    slot are not cached.
+
+    Readers take no lock. Each slot carries a sequence number that a writer
+    makes odd while it writes and even when it is done; a read that sees it
+    change, or a value that fails its checksum, is retried. Writers to the
+    same set are serialized with a byte-range lock on a scratch file, which
+    the kernel releases if a worker dies holding it.
+
+    Until `open` is called the table stores nothing and every read misses,
+    which is how a single-process server runs.
+    """
+
+    def __init__(self):
+        self.slot_count = 0
+        self.slot_size = 0
+        self.set_count = 0
+        self._memory: Optional[mmap.mmap] = None
+        self._lock_file = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.oversized = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._memory is not None
+
+    def open(self, slots: int = SHARED_CACHE_SLOTS, slot_size: int = SHARED_CACHE_SLOT_SIZE) -> None:
+        """Allocate the table. Must be called before worker processes are forked."""
+        if slot_size <= SLOT_HEADER.size:
+            raise ValueError(f"Shared cache slots must be larger than {SLOT_HEADER.size} bytes")
+        self.set_count = max(1, slots // SET_WAYS)
+        self.slot_count = self.set_count * SET_WAYS
+        self.slot_size = slot_size
+        self._memory = mmap.mmap(-1, self.slot_count * slot_size)
+        self._lock_file = tempfile.TemporaryFile()
+
+    def close(self) -> None:
+        if self._memory is not None:
+            self._memory.close()
+            self._lock_file.close()
+            self._memory = None
+            self._lock_file = None
+
+    @staticmethod
+    def digest(key: bytes) -> bytes:
+        return hashlib.blake2b(key, digest_size=16).digest()
+
+    def _set_index(self, digest: bytes) -> int:
+        return int.from_bytes(digest[:8], "little") % self.set_count
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """Return the live value stored for a key, or None."""
+        if self._memory is None:
+            return None
+
+        digest = self.digest(key)
+        memory = self._memory
+        base = self._set_index(digest) * SET_WAYS * self.slot_size
+        now = time.time()
+        for offset in range(base, base + SET_WAYS * self.slot_size, self.slot_size):
+            for _ in range(READ_ATTEMPTS):
+                seq, crc, expires_at, slot_digest, length = SLOT_HEADER.unpack_from(memory, offset)
+                if seq & 1:
+                    continue
+                if slot_digest != digest or expires_at <= now:
+                    break
+                start = offset + SLOT_HEADER.size
+                value = memory[start:start + length]
+                if SEQ.unpack_from(memory, offset)[0] != seq or zlib.crc32(value) != crc:
+                    continue
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key: bytes, value: bytes, ttl: float) -> bool:
+        """Store a value for `ttl` seconds. Returns False if it does not fit in a slot."""
+        if self._memory is None or ttl <= 0:
+            return False
+        if len(value) > self.slot_size - SLOT_HEADER.size:
+            self.oversized += 1
+            return False
+
+        digest = self.digest(key)
+        set_index = self._set_index(digest)
+        now = time.time()
+        with self._locked(set_index):
+            self._write(self._slot_for(set_index, digest, now), digest, value, now + ttl)
+        self.writes += 1
+        return True
+
+    def update(self, key: bytes, apply: Callable[[Optional[bytes]], Tuple[bytes, T]], ttl: float) -> T:
+        """
+        Atomically replace the value of a key across workers.
+
+        `apply` receives the live value, or None, and returns the value to
+        store for `ttl` seconds along with a result that is passed back. It
+        runs under the set's lock, so it must be quick. Without the table,
+        or for a value too large for a slot, `apply` still runs but nothing
+        is stored.
+        """
+        if self._memory is None:
+            return apply(None)[1]
+
+        digest = self.digest(key)
+        set_index = self._set_index(digest)
+        with self._locked(set_index):
+            now = time.time()
+            target = self._slot_for(set_index, digest, now)
+            _, _, expires_at, slot_digest, length = SLOT_HEADER.unpack_from(self._memory, target)
+            current = None
+            if slot_digest == digest and expires_at > now:
+                # Writers hold the lock, so the slot cannot change while it is read
+                start = target + SLOT_HEADER.size
+                current = self._memory[start:start + length]
+            value, result = apply(current)
+            if len(value) > self.slot_size - SLOT_HEADER.size:
+                self.oversized += 1
+            else:
+                self._write(target, digest, value, now + ttl)
+                self.writes += 1
+        return result
+
+    def _slot_for(self, set_index: int, digest: bytes, now: float) -> int:
+        """The key's slot, else a free or expired one, else the one expiring first."""
+        base = set_index * SET_WAYS * self.slot_size
+        target, target_expiry = base, None
+        for offset in range(base, base + SET_WAYS * self.slot_size, self.slot_size):
+            _, _, expires_at, slot_digest, _ = SLOT_HEADER.unpack_from(self._memory, offset)
+            if slot_digest == digest:
+                return offset
+            if expires_at <= now:
+                if target_expiry is None or target_expiry > 0:
+                    target, target_expiry = offset, 0.0
+                continue
+            if target_expiry is None or expires_at < target_expiry:
+                target, target_expiry = offset, expires_at
+        return target
+
+    def delete(self, key: bytes) -> None:
+        """Remove a key so no worker reads it again."""
+        if self._memory is None:
+            return
+
+        digest = self.digest(key)
+        set_index = self._set_index(digest)
+        base = set_index * SET_WAYS * self.slot_size
+        with self._locked(set_index):
+            for offset in range(base, base + SET_WAYS * self.slot_size, self.slot_size):
+                if SLOT_HEADER.unpack_from(self._memory, offset)[3] == digest:
+                    self._write(offset, bytes(16), b"", 0.0)
+
+    def _write(self, offset: int, digest: bytes, value: bytes, expires_at: float) -> None:
+        memory = self._memory
+        seq = SEQ.unpack_from(memory, offset)[0]
+        SEQ.pack_into(memory, offset, (seq + 1) & 0xFFFFFFFF)
+        start = offset + SLOT_HEADER.size
+        memory[start:start + len(value)] = value
+        SLOT_HEADER.pack_into(memory, offset, (seq + 1) & 0xFFFFFFFF, zlib.crc32(value), expires_at, digest, len(value))
+        SEQ.pack_into(memory, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def _locked(self, set_index: int):
+        return _SetLock(self._lock_file.fileno(), set_index)
+
+    def stats(self) -> dict:
+        """Counters for monitoring; hits and misses are this worker's own."""
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "slots": self.slot_count,
+            "slot_size": self.slot_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "oversized": self.oversized,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+        if self._memory is not None:
+            now = time.time()
+            stats["live"] = sum(
+                1 for offset in range(0, self.slot_count * self.slot_size, self.slot_size)
+                if SLOT_HEADER.unpack_from(self._memory, offset)[2] > now
+            )
+        return stats
+
+class _SetLock:
+    """Exclusive lock on one set's byte of the lock file."""
+
+    __slots__ = ("fd", "set_index")
+
+    def __init__(self, fd: int, set_index: int):
+        self.fd = fd
+        self.set_index = set_index
+
+    def __enter__(self):
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, self.set_index)
+
+    def __exit__(self, *exc_info):
+        fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, self.set_index)
+
+# Table shared by the workers of `serve.py`; unopened when running a single process
+shared_table = SharedHashTable()
@@ -0,0 +1,111 @@
+import logging
+import os
+import secrets
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Asymmetric signing key configuration
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+
+# Key types accepted for each asymmetric algorithm
+KEY_TYPES = {
+    "RS256": rsa.RSAPrivateKey,
+    "ES256": ec.EllipticCurvePrivateKey,
+}
+
+class SigningKeyRing:
+    """
+    Private keys for asymmetric JWT signing, addressed by key id (kid).
+
+    Keys are read from `<kid>.pem` files in `keys_dir`. The active key signs
+    new tokens and every key in the directory is published in the JWKS, so a
+    rotation is: add the new key, switch JWT_ACTIVE_KID, and remove the old
+    file once tokens signed with it have expired. Without a directory an
+    ephemeral key is generated, which is only suitable for a single process,
+    or for the workers of one `serve.py` launcher, which loads the keys
+    before forking them.
+    """
+
+    def __init__(self, algorithm: str, keys_dir: Optional[str] = JWT_KEYS_DIR, active_kid: Optional[str] = JWT_ACTIVE_KID):
+        if algorithm not in KEY_TYPES:
+            raise ValueError(f"Unsupported asymmetric JWT algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.keys_dir = keys_dir
+        self._active_kid = active_kid
+        self._private_keys: Optional[Dict[str, jwk.Key]] = None
+        self._public_keys: Dict[str, dict] = {}
+        self._verification_keys: Dict[str, jwk.Key] = {}
+
+    def load(self) -> Dict[str, jwk.Key]:
+        """Load the keys, or generate the ephemeral one, unless already loaded."""
+        # Loaded on first use so hashing worker processes never touch key files
+        if self._private_keys is not None:
+            return self._private_keys
+
+        private_keys = {}
+        if self.keys_dir:
+            for path in sorted(Path(self.keys_dir).glob("*.pem")):
+                private_keys[path.stem] = path.read_bytes()
+        else:
+            logger.warning("JWT_KEYS_DIR is not set, signing with an ephemeral %s key", self.algorithm)
+            private_keys[f"ephemeral-{secrets.token_hex(4)}"] = self._generate_key()
+
+        if not private_keys:
+            raise ValueError(f"No signing keys found in {self.keys_dir}")
+
+        self._private_keys = {}
+        for kid, pem in private_keys.items():
+            key = serialization.load_pem_private_key(pem, password=None)
+            if not isinstance(key, KEY_TYPES[self.algorithm]):
+                raise ValueError(f"Key '{kid}' cannot be used with {self.algorithm}")
+            public_pem = key.public_key().public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+            verification_key = jwk.construct(public_pem, self.algorithm)
+            # Parsed once here rather than on every encode/decode
+            self._private_keys[kid] = jwk.construct(pem, self.algorithm)
+            self._verification_keys[kid] = verification_key
+            self._public_keys[kid] = {**verification_key.to_dict(), "kid": kid, "use": "sig"}
+
+        if self._active_kid is None:
+            self._active_kid = sorted(self._private_keys)[-1]
+        elif self._active_kid not in self._private_keys:
+            raise ValueError(f"Active signing key '{self._active_kid}' not found")
+        return self._private_keys
+
+    def _generate_key(self) -> bytes:
+        if self.algorithm == "RS256":
+            key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        else:
+            key = ec.generate_private_key(ec.SECP256R1())
+        return key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+
+    def active_key(self) -> Tuple[str, jwk.Key]:
+        """Return the (kid, private key) used to sign new tokens."""
+        private_keys = self.load()
+        return self._active_kid, private_keys[self._active_kid]
+
+    def verification_key(self, kid: Optional[str]) -> Optional[jwk.Key]:
+        """Return the parsed public key for a key id, if it is published."""
+        self.load()
+        return self._verification_keys.get(kid)
+
+    def jwks(self) -> dict:
+        """Public keys in JWKS format."""
+        self.load()
+        return {"keys": list(self._public_keys.values())}
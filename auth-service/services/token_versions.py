@@ -0,0 +1,155 @@
+import os
+import time
+from array import array
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+
+from services.shared_cache import shared_table
+
+load_dotenv()
+
+# Token version map configuration
+TOKEN_VERSION_TTL_SECONDS = int(os.getenv("TOKEN_VERSION_TTL_SECONDS", "30"))
+TOKEN_VERSION_MAX_USER_ID = int(os.getenv("TOKEN_VERSION_MAX_USER_ID", "10000000"))
+
+OUTDATED_TOKEN_DETAIL = "Token is no longer valid"
+
+class TokenVersionMap:
+    """
+    Current token version of each user, held in memory by user id.
+
+    Versions live in flat arrays indexed by user id, next to the second at
+    which each one stops being trusted, so the map costs eight bytes per user
+    however many users there are. Users with ids above `max_user_id` are not
+    kept locally. Under `serve.py` the workers' shared cache is used instead
+    of the arrays, so a version change made in one worker, such as a password
+    change, applies to every worker at once.
+
+    Version changes made through User update this process and the shared
+    cache at once; `ttl` bounds how long other hosts keep trusting the
+    version they loaded before.
+    """
+
+    def __init__(self, ttl: int = TOKEN_VERSION_TTL_SECONDS, max_user_id: int = TOKEN_VERSION_MAX_USER_ID):
+        self.ttl = ttl
+        self.max_user_id = max_user_id
+        self._versions = array("I")
+        self._expires = array("I")
+        self._origin = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    def _now(self) -> int:
+        return int(time.monotonic() - self._origin) + 1
+
+    @staticmethod
+    def _shared_key(user_id: int) -> bytes:
+        return b"token_version:%d" % user_id
+
+    def peek(self, user_id: int) -> Optional[int]:
+        """The known version of a user, or None when it has to be loaded."""
+        if shared_table.enabled:
+            # Other workers write changes here, so a local copy could be outdated
+            value = shared_table.get(self._shared_key(user_id))
+            if value is not None:
+                self.hits += 1
+                return int(value)
+        elif user_id < len(self._versions) and self._expires[user_id] > self._now():
+            self.hits += 1
+            return self._versions[user_id]
+
+        self.misses += 1
+        return None
+
+    async def get(self, user_id: int, load: Callable[[], Awaitable[Optional[int]]]) -> Optional[int]:
+        """Return a user's version, calling `load` to read it from the database on a miss."""
+        version = self.peek(user_id)
+        if version is None:
+            version = await load()
+            if version is not None:
+                self.set(user_id, version)
+        return version
+
+    async def get_many(
+        self,
+        user_ids: Iterable[int],
+        load: Callable[[List[int]], Awaitable[Dict[int, int]]],
+    ) -> Dict[int, int]:
+        """
+        Return the versions of the users found for `user_ids`, calling `load`
+        once with every id that missed so the database is read in one query.
+        """
+        found: Dict[int, int] = {}
+        missing: List[int] = []
+        for user_id in set(user_ids):
+            version = self.peek(user_id)
+            if version is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = version
+
+        if missing:
+            for user_id, version in (await load(missing)).items():
+                self.set(user_id, version)
+                found[user_id] = version
+        return found
+
+    def set(self, user_id: int, version: int) -> None:
+        """Record a user's current version."""
+        if shared_table.enabled:
+            shared_table.set(self._shared_key(user_id), b"%d" % version, self.ttl)
+        else:
+            self._store_local(user_id, version)
+
+    def _store_local(self, user_id: int, version: int) -> None:
+        if not 0 <= user_id <= self.max_user_id:
+            return
+        if user_id >= len(self._versions):
+            # Grow geometrically so ids assigned in order cost amortized constant time
+            size = min(max(user_id + 1, 2 * len(self._versions), 1024), self.max_user_id + 1)
+            for values in (self._versions, self._expires):
+                values.frombytes(bytes(values.itemsize * (size - len(values))))
+        self._versions[user_id] = version
+        self._expires[user_id] = self._now() + self.ttl
+
+    def clear(self) -> None:
+        """Forget every version."""
+        self._versions = array("I")
+        self._expires = array("I")
+
+    def stats(self) -> dict:
+        """Counters for monitoring the map."""
+        lookups = self.hits + self.misses
+        return {
+            "capacity": len(self._versions),
+            "bytes": self._versions.itemsize * len(self._versions) + self._expires.itemsize * len(self._expires),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+async def require_current_version(token_data: dict, load: Callable[[], Awaitable[Optional[int]]]) -> None:
+    """
+    Reject a versioned token whose user no longer exists, or whose version
+    has been bumped since it was issued. Tokens without a version pass.
+    """
+    if token_data.get("ver") is None:
+        return
+
+    version = await token_versions.get(token_data["user_id"], load)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    if version != token_data["ver"]:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=OUTDATED_TOKEN_DETAIL,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+# Shared token version map for the auth service
+token_versions = TokenVersionMap()
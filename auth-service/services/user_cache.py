@@ -0,0 +1,148 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from models.user import User
+from services.shared_cache import shared_table
+from schemas import UserResponse, user_response
+
+load_dotenv()
+
+# User cache configuration
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "true").lower() == "true"
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+class UserCache:
+    """
+    Bounded read-through cache of user records keyed by user id.
+
+    Entries hold the ready-to-return UserResponse and live for at most
+    `ttl` seconds. Under `serve.py` the workers' shared cache is a second
+    tier, so a user loaded by one worker is not read from the database again
+    by the others. Writes through User invalidate the entry in this process
+    and in the shared cache; the TTL bounds how long other workers can serve
+    the old record from their own tier.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = USER_CACHE_MAX_ENTRIES,
+        ttl: float = USER_CACHE_TTL_SECONDS,
+        enabled: bool = USER_CACHE_ENABLED,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[int, Tuple[float, UserResponse]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, user_id: int, load: Callable[[], Awaitable[Optional[User]]]) -> Optional[UserResponse]:
+        """Return the cached user, calling `load` to read it from the database on a miss."""
+        if self.enabled:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            shared = self._get_shared(user_id)
+            if shared is not None:
+                return shared
+
+        user = await load()
+        if user is None:
+            return None
+
+        return self._store(user)
+
+    async def get_many(
+        self,
+        user_ids: Iterable[int],
+        load: Callable[[List[int]], Awaitable[List[User]]],
+    ) -> Dict[int, UserResponse]:
+        """
+        Return the users found for `user_ids` by id, calling `load` once with
+        every id that missed so the database is read in a single query.
+        """
+        found: Dict[int, UserResponse] = {}
+        missing: List[int] = []
+        now = time.monotonic()
+        for user_id in set(user_ids):
+            entry = self._entries.get(user_id) if self.enabled else None
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                found[user_id] = entry[1]
+                continue
+            if self.enabled:
+                self.misses += 1
+                shared = self._get_shared(user_id)
+                if shared is not None:
+                    found[user_id] = shared
+                    continue
+            missing.append(user_id)
+
+        if missing:
+            for user in await load(missing):
+                found[user.id] = self._store(user)
+        return found
+
+    @staticmethod
+    def _shared_key(user_id: int) -> bytes:
+        return b"user:%d" % user_id
+
+    def _get_shared(self, user_id: int) -> Optional[UserResponse]:
+        value = shared_table.get(self._shared_key(user_id))
+        if value is None:
+            return None
+        response = UserResponse.model_validate_json(value)
+        self._store_local(user_id, response)
+        return response
+
+    def _store(self, user: User) -> UserResponse:
+        response = user_response(user)
+        if self.enabled:
+            self._store_local(user.id, response)
+            shared_table.set(self._shared_key(user.id), response.model_dump_json().encode(), self.ttl)
+        return response
+
+    def _store_local(self, user_id: int, response: UserResponse) -> None:
+        self._entries[user_id] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user's entry after it has been created or changed."""
+        shared_table.delete(self._shared_key(user_id))
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Counters for monitoring the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# Shared user cache for the auth service
+user_cache = UserCache()
@@ -0,0 +1,227 @@
+import asyncio
+import codecs
+import csv
+import json
+import os
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from models.user import User
+from schemas import UserBase
+from services.hashing import hashing_executor
+from utils.auth import WEAK_PASSWORD_DETAIL, get_password_hash_async, pwd_context, validate_password_strength
+
+load_dotenv()
+
+# Bulk import configuration
+USER_IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", "500"))
+
+# Input formats accepted by the importer
+IMPORT_FORMATS = ("csv", "ndjson")
+
+async def stream_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a stream of UTF-8 byte chunks into lines without buffering the whole body."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def parse_rows(lines: AsyncIterable[str], fmt: str) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Parse CSV (with a header row) or NDJSON into (line number, row, error).
+    CSV fields may be quoted but cannot span lines.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+    header = None
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        if fmt == "ndjson":
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, None, "Invalid JSON"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, row, None
+        else:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_number, None, f"Expected {len(header)} fields, got {len(values)}"
+                continue
+            yield line_number, dict(zip(header, values)), None
+
+class UserImporter:
+    """
+    Bulk user import for migrations.
+
+    Rows carry a username, an email and either a plain `password` or an
+    existing bcrypt `password_hash`. Plain passwords must meet the same
+    strength rules as registration; existing hashes cannot be checked and are
+    taken as they are. Rows are processed in batches: usernames and emails
+    already taken are found with one query per batch so no time is spent
+    hashing passwords for rows that will be rejected, plain passwords are
+    hashed concurrently in the shared hashing pool, and the rest are written
+    with a single multi-row INSERT that skips conflicting rows. Every
+    rejected row is reported with its line number; the import carries on.
+    """
+
+    def __init__(self, batch_size: int = USER_IMPORT_BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+        self._hash_slots: Optional[asyncio.Semaphore] = None
+
+    async def run(self, db: AsyncSession, rows: AsyncIterable[Tuple[int, Optional[dict], Optional[str]]]) -> dict:
+        """Import parsed rows and return counts with the per-row errors."""
+        report = {"total": 0, "imported": 0, "failed": 0, "errors": []}
+        # Hash no more passwords at once than there are workers, leaving the
+        # pool's queue free for logins and registrations
+        self._hash_slots = asyncio.Semaphore(hashing_executor.max_workers)
+        seen_usernames = set()
+        seen_emails = set()
+        batch: List[Tuple[int, dict]] = []
+
+        async for line_number, row, error in rows:
+            report["total"] += 1
+            if error is None:
+                row, error = self._validate(row)
+            if error is None:
+                # Duplicates within the import itself
+                if row["username"] in seen_usernames:
+                    error = "Duplicate username in import"
+                elif row["email"] in seen_emails:
+                    error = "Duplicate email in import"
+            if error is not None:
+                self._reject(report, line_number, row, error)
+                continue
+
+            seen_usernames.add(row["username"])
+            seen_emails.add(row["email"])
+            batch.append((line_number, row))
+            if len(batch) >= self.batch_size:
+                await self._import_batch(db, batch, report)
+                batch = []
+
+        if batch:
+            await self._import_batch(db, batch, report)
+        return report
+
+    @staticmethod
+    def _validate(row: dict) -> Tuple[Optional[dict], Optional[str]]:
+        try:
+            user = UserBase(username=str(row.get("username") or "").strip(), email=str(row.get("email") or "").strip())
+        except ValidationError as e:
+            return row, "; ".join(f"{error['loc'][0]}: {error['msg']}" for error in e.errors())
+
+        password = row.get("password") or None
+        password_hash = row.get("password_hash") or None
+        if (password is None) == (password_hash is None):
+            return row, "Exactly one of password or password_hash is required"
+        if password is not None and not validate_password_strength(str(password)):
+            return row, WEAK_PASSWORD_DETAIL
+        if password_hash is not None and pwd_context.identify(password_hash) is None:
+            return row, "Unsupported password hash"
+
+        return {
+            "username": user.username,
+            "email": user.email,
+            "password": password,
+            "password_hash": password_hash,
+        }, None
+
+    @staticmethod
+    def _reject(report: dict, line_number: int, row: Optional[dict], detail: str) -> None:
+        username = (row or {}).get("username")
+        report["failed"] += 1
+        report["errors"].append({
+            "line": line_number,
+            "username": str(username) if username is not None else None,
+            "detail": detail,
+        })
+
+    async def _import_batch(self, db: AsyncSession, batch: List[Tuple[int, dict]], report: dict) -> None:
+        # Drop rows whose username or email is already registered before hashing anything
+        taken_usernames, taken_emails = await self._taken(db, batch)
+        # Hand the connection back to the pool while passwords are hashed
+        await db.rollback()
+        pending = []
+        for line_number, row in batch:
+            if row["username"] in taken_usernames:
+                self._reject(report, line_number, row, "Username already registered")
+            elif row["email"] in taken_emails:
+                self._reject(report, line_number, row, "Email already registered")
+            else:
+                pending.append((line_number, row))
+        if not pending:
+            return
+
+        hashes = await asyncio.gather(*[self._hash(row) for _, row in pending])
+        values = [
+            {"username": row["username"], "email": row["email"], "hashed_password": hashed_password}
+            for (_, row), hashed_password in zip(pending, hashes)
+        ]
+
+        # Rows registered since the check above are skipped by the conflict clause
+        result = await db.execute(self._insert(db, values).returning(User.username))
+        inserted = set(result.scalars())
+        await db.commit()
+
+        report["imported"] += len(inserted)
+        for line_number, row in pending:
+            if row["username"] not in inserted:
+                self._reject(report, line_number, row, "Username or email already registered")
+
+    @staticmethod
+    async def _taken(db: AsyncSession, batch: List[Tuple[int, dict]]) -> Tuple[set, set]:
+        usernames = [row["username"] for _, row in batch]
+        emails = [row["email"] for _, row in batch]
+        result = await db.execute(
+            select(User.username, User.email)
+            .where(or_(User.username.in_(usernames), User.email.in_(emails)))
+        )
+        taken_usernames, taken_emails = set(), set()
+        for username, email in result:
+            taken_usernames.add(username)
+            taken_emails.add(email)
+        return taken_usernames, taken_emails
+
+    async def _hash(self, row: dict) -> str:
+        if row["password_hash"] is not None:
+            return row["password_hash"]
+        async with self._hash_slots:
+            while True:
+                try:
+                    return await get_password_hash_async(row["password"])
+                except HTTPException as e:
+                    # The pool is saturated by interactive traffic; back off rather than fail the row
+                    if e.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                        raise
+                    await asyncio.sleep(0.1)
+
+    @staticmethod
+    def _insert(db: AsyncSession, values: List[Dict[str, str]]):
+        if db.bind.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        return insert(User).values(values).on_conflict_do_nothing()
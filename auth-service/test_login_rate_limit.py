@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test the login throttling token buckets
+"""
+
+import asyncio
+import os
+import sys
+
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.rate_limit import LoginRateLimiter, MemoryRateLimitStore, SharedRateLimitStore
+from services.shared_cache import SharedHashTable
+
+async def expect_throttled(check, message: str) -> HTTPException:
+    try:
+        await check
+        raise AssertionError(message)
+    except HTTPException as e:
+        assert e.status_code == 429
+        return e
+
+async def check_limits():
+    store = MemoryRateLimitStore(max_buckets=32, shards=4)
+    limiter = LoginRateLimiter(store, ip_capacity=5, ip_per_minute=60, username_capacity=3, username_per_minute=6)
+
+    # An account gets its burst, then is told when to come back
+    for _ in range(3):
+        await limiter.check_account(1, "alice")
+    e = await expect_throttled(limiter.check_account(1, "alice"), "fourth attempt for alice was allowed")
+    assert e.headers["Retry-After"] == "10"
+
+    # Logging in by email spends the same account's attempts; unknown logins share one per spelling
+    await expect_throttled(limiter.check_account(1, "alice@example.com"), "attempt by email was allowed")
+    for _ in range(3):
+        await limiter.check_account(None, "Nobody@example.com")
+    await expect_throttled(limiter.check_account(None, "nobody@example.com "), "fourth attempt for nobody was allowed")
+
+    # The client address is limited across accounts
+    for _ in range(5):
+        await limiter.check_client("10.0.0.1")
+    await expect_throttled(limiter.check_client("10.0.0.1"), "sixth attempt from 10.0.0.1 was allowed")
+
+    # Buckets are evicted once the store is full
+    limiter.ip_capacity = limiter.username_capacity = 1000
+    for i in range(200):
+        await limiter.check_client(f"10.1.0.{i}")
+    assert len(store) <= 32
+    assert store.evictions > 0
+
+def take_in_child(store: SharedRateLimitStore, attempts: int) -> int:
+    """Fork a worker that spends `attempts` and reports how many were granted."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        granted = sum(
+            asyncio.run(store.take("ip:10.0.0.1", 10, 1 / 60)) == 0
+            for _ in range(attempts)
+        )
+        os.write(write_fd, bytes([granted]))
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    granted = os.read(read_fd, 1)[0]
+    os.close(read_fd)
+    return granted
+
+def check_shared_store():
+    table = SharedHashTable()
+    table.open(slots=64, slot_size=64)
+    store = SharedRateLimitStore(table)
+    try:
+        # Workers draw from one bucket, so together they get a single burst
+        granted = [take_in_child(store, 8) for _ in range(3)]
+        assert sum(granted) == 10, granted
+        assert asyncio.run(store.take("ip:10.0.0.1", 10, 1 / 60)) > 0
+    finally:
+        table.close()
+
+    # Without the table, buckets stay in this process
+    unopened = SharedRateLimitStore(SharedHashTable())
+    assert [asyncio.run(unopened.take("ip:10.0.0.1", 1, 1)) == 0 for _ in range(2)] == [True, False]
+
+def test_login_rate_limit():
+    """Attempts beyond a bucket's burst are rejected with a Retry-After"""
+    asyncio.run(check_limits())
+    check_shared_store()
+
+if __name__ == "__main__":
+    test_login_rate_limit()
+    print("Test completed!")
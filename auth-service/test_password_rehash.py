@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test bcrypt cost calibration and that logging in with an outdated cost upgrades the stored hash
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import utils.auth as auth
+from models.user import User, _pending_rehashes
+from services.hashing import hashing_executor
+from utils.auth import (
+    BCRYPT_MIN_ROUNDS,
+    BCRYPT_ROUNDS,
+    bcrypt_rounds,
+    calibrate_bcrypt_rounds,
+    get_password_hash,
+    password_needs_rehash,
+    pwd_context,
+    set_bcrypt_rounds,
+)
+
+async def check_rehash(databases):
+    async with databases.open() as (engine, SessionLocal):
+        old_hash = get_password_hash("Testpass123$", rounds=4)
+        assert password_needs_rehash(old_hash)
+        async with SessionLocal() as db:
+            db.add(User(username="alice", email="alice@example.com", hashed_password=old_hash))
+            await db.commit()
+
+        # Login succeeds straight away; the upgrade happens in the background
+        async with SessionLocal() as db:
+            user = await User.authenticate(db, "alice", "Testpass123$")
+            assert user is not None
+        await asyncio.gather(*_pending_rehashes.values())
+
+        async with SessionLocal() as db:
+            user = await User.get_by_username(db, "alice")
+            assert user.hashed_password != old_hash
+            assert not password_needs_rehash(user.hashed_password)
+            assert pwd_context.verify("Testpass123$", user.hashed_password)
+            assert f"${bcrypt_rounds():02d}$" in user.hashed_password
+
+        # A password changed since the login is not overwritten
+        assert not await User.rehash_password(engine, user.id, "Testpass123$", old_hash)
+
+def test_login_upgrades_outdated_hash(databases):
+    """Logging in with a low-cost hash stores one at the current cost"""
+    asyncio.run(check_rehash(databases))
+
+async def check_calibration(directory: str):
+    calibration_file = os.path.join(directory, "bcrypt_calibration.json")
+
+    # No cost fits a 1ms budget, so the floor is picked and saved without leftovers
+    assert await calibrate_bcrypt_rounds(1, calibration_file) == BCRYPT_MIN_ROUNDS
+    assert bcrypt_rounds() == BCRYPT_MIN_ROUNDS
+    with open(calibration_file) as f:
+        assert json.load(f)["rounds"] == BCRYPT_MIN_ROUNDS
+    assert os.listdir(directory) == ["bcrypt_calibration.json"]
+
+    # A process that has calibrated, like a worker forked by serve.py, keeps the cost
+    os.remove(calibration_file)
+    assert await calibrate_bcrypt_rounds(1, calibration_file) == BCRYPT_MIN_ROUNDS
+    assert not os.path.exists(calibration_file)
+
+def test_calibration_is_kept(tmp_path):
+    """The calibrated cost is saved atomically and not measured again in the same process"""
+    try:
+        asyncio.run(check_calibration(str(tmp_path)))
+    finally:
+        hashing_executor.shutdown()
+        set_bcrypt_rounds(BCRYPT_ROUNDS)
+        auth._calibrated_budget_ms = None
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
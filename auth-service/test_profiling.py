@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test the on-demand request profiler and its file retention
+"""
+
+import asyncio
+import os
+import pstats
+import sys
+import tempfile
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import services.profiling as profiling
+from services.profiling import ProfilingMiddleware, RequestProfiler, require_profiling_token
+
+def busy(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+async def check_profiler(directory: str):
+    profiler = RequestProfiler(token="profile-me", sample_rate=0, directory=directory, max_files=2)
+    app = FastAPI()
+
+    @app.get("/work/{n}")
+    async def work(n: int):
+        return {"result": busy(n)}
+
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        # Only requests with the right token are profiled
+        await client.get("/work/1000")
+        await client.get("/work/1000", headers={"X-Profile": "wrong"})
+        assert profiler.profiled == 0 and os.listdir(directory) == []
+
+        for n in (1000, 200000, 5000):
+            response = await client.get(f"/work/{n}", headers={"X-Profile": "profile-me"})
+            assert response.status_code == 200
+
+        # The newest profiles are kept, readable by pstats, and summarized slowest first
+        files = sorted(os.listdir(directory))
+        assert len(files) == 2 and profiler.profiled == 3
+        pstats.Stats(os.path.join(directory, files[-1]))
+        summary = profiler.summary()
+        assert [entry["path"] for entry in summary["profiles"]] == ["/work/{n}"] * 2
+        slowest = summary["profiles"][0]
+        assert slowest["duration_ms"] >= summary["profiles"][1]["duration_ms"]
+        assert slowest["file"] in files
+        assert any("busy" in row["function"] for row in slowest["top"])
+
+        # Sampling profiles requests without the header
+        profiler.sample_rate = 1.0
+        await client.get("/work/10")
+        assert profiler.profiled == 4 and profiler.summary()["profiles"][-1]["trigger"] == "sample"
+
+def check_summary_access():
+    shared = profiling.request_profiler
+    try:
+        # Without a token the summary is never served, even while sampling
+        for token, sample_rate, presented, expected in [
+            (None, 0, None, 403),
+            (None, 1.0, None, 403),
+            (None, 1.0, "anything", 403),
+            ("profile-me", 0, None, 401),
+            ("profile-me", 0.5, "wrong", 401),
+        ]:
+            profiling.request_profiler = RequestProfiler(token=token, sample_rate=sample_rate)
+            try:
+                require_profiling_token(presented)
+                raise AssertionError("profile summary was served")
+            except HTTPException as e:
+                assert e.status_code == expected
+
+        profiling.request_profiler = RequestProfiler(token="profile-me", sample_rate=0.5)
+        require_profiling_token("profile-me")
+    finally:
+        profiling.request_profiler = shared
+
+def test_profiling():
+    """Requests are profiled on demand and only the newest profiles are kept"""
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(check_profiler(tmp))
+    check_summary_access()
+
+if __name__ == "__main__":
+    test_profiling()
+    print("Test completed!")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test read replica routing with a primary and two replicas as SQLite files
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from sqlalchemy import select, update
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.user import User
+from services.database import ReplicaSet, read_sessionmaker
+
+async def create_database(databases, name: str):
+    """A database holding one user named after it, so reads show which copy served them."""
+    engine = await databases.create(name)
+    async with engine.begin() as conn:
+        await conn.execute(User.__table__.insert().values(
+            id=1, username=name, email=f"{name}@example.com", hashed_password="x"
+        ))
+    return engine
+
+async def read_username(sessions) -> str:
+    async with sessions() as db:
+        return await db.scalar(select(User.username).where(User.id == 1))
+
+async def check_routing(databases):
+    primary = await create_database(databases, "primary")
+    replica_urls = []
+    for i in range(2):
+        await (await create_database(databases, f"replica{i}")).dispose()
+        replica_urls.append(databases.url(f"replica{i}"))
+
+    replicas = ReplicaSet(replica_urls)
+    sessions = read_sessionmaker(primary, replicas)
+    try:
+        # Reads take turns across the replicas
+        assert [await read_username(sessions) for _ in range(4)] == ["replica0", "replica1"] * 2
+
+        # Writes go to the primary, and the session then reads from the primary too
+        async with sessions() as db:
+            assert (await User.get_by_id(db, 1)).username in ("replica0", "replica1")
+            user = await User.create_user(db, "alice", "alice@example.com", "Testpass123$")
+            assert await db.scalar(select(User.username).where(User.id == 1)) == "primary"
+        async with primary.connect() as conn:
+            assert await conn.scalar(select(User.username).where(User.id == user.id)) == "alice"
+
+        # So do ORM flushes in a session that has been reading from a replica
+        async with sessions() as db:
+            assert await db.scalar(select(User.username).where(User.id == 1)) != "primary"
+            db.add(User(username="bob", email="bob@example.com", hashed_password="x"))
+            await db.commit()
+        async with primary.connect() as conn:
+            assert await conn.scalar(select(User.email).where(User.username == "bob")) == "bob@example.com"
+
+        # A user the replica has not caught up with yet is found on the primary
+        async with sessions() as db:
+            assert (await User.get_by_login(db, "alice")).id == user.id
+
+        # Token versions come from the primary even when the replicas have the user at an older one
+        async with primary.begin() as conn:
+            await conn.execute(update(User).where(User.id == 1).values(token_version=5))
+        async with sessions() as db:
+            assert await User.get_token_version(db, 1) == 5
+
+        # With every replica idle, least connections still spreads sessions
+        least = ReplicaSet(replica_urls, strategy="least_connections")
+        least_sessions = read_sessionmaker(primary, least)
+        assert sorted([await read_username(least_sessions) for _ in range(2)]) == ["replica0", "replica1"]
+        await least.dispose()
+    finally:
+        await replicas.dispose()
+        await primary.dispose()
+
+async def check_ejection(databases):
+    primary = await create_database(databases, "primary")
+    await (await create_database(databases, "replica")).dispose()
+
+    # The first replica cannot be opened; the read that finds out is answered by the primary
+    replicas = ReplicaSet([databases.url("missing/replica"), databases.url("replica")], eject_seconds=60)
+    sessions = read_sessionmaker(primary, replicas)
+    try:
+        assert await read_username(sessions) == "primary"
+        assert replicas.available() == [1] and replicas.ejections == 1
+
+        # Reads skip the ejected replica, and fall back to the primary without any
+        assert [await read_username(sessions) for _ in range(2)] == ["replica", "replica"]
+        replicas.eject(1)
+        assert await read_username(sessions) == "primary"
+        assert not any(replica["available"] for replica in replicas.status())
+    finally:
+        await replicas.dispose()
+        await primary.dispose()
+
+async def check_failover(databases):
+    primary = await create_database(databases, "failover")
+    query = select(User.username).where(User.id == 1)
+
+    async def by_scalar(db):
+        return await db.scalar(query)
+
+    async def by_scalars(db):
+        return (await db.scalars(query)).one()
+
+    async def by_execute(db):
+        return (await db.execute(query)).scalar_one()
+
+    async def by_get(db):
+        return (await db.get(User, 1)).username
+
+    try:
+        # Whichever way a session reads, an unreachable replica is ejected and the primary answers
+        for read in (by_scalar, by_scalars, by_execute, by_get):
+            replicas = ReplicaSet([databases.url("missing/replica")], eject_seconds=60)
+            try:
+                async with read_sessionmaker(primary, replicas)() as db:
+                    assert await read(db) == "failover", read.__name__
+                assert replicas.available() == [] and replicas.ejections == 1
+            finally:
+                await replicas.dispose()
+    finally:
+        await primary.dispose()
+
+def test_read_replicas(databases):
+    """Reads are spread over replicas, writes and replica misses go to the primary"""
+    asyncio.run(check_routing(databases))
+
+def test_replica_ejection(databases):
+    """A failing replica is left out until every replica is, then reads use the primary"""
+    asyncio.run(check_ejection(databases))
+    asyncio.run(check_failover(databases))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
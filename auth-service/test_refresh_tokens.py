@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test refresh token rotation, reuse detection and expiry cleanup
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, func, select, update
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from controllers.auth_controller import refresh_access_token
+from models import RefreshTokenFamily, User
+from schemas import RefreshRequest
+from services.refresh_tokens import RefreshTokenStore, refresh_tokens
+from services.session_activity import session_activity
+from services.token_versions import token_versions
+from services.user_cache import user_cache
+from utils.auth import verify_token
+
+async def refresh(SessionLocal, refresh_token: str):
+    async with SessionLocal() as db:
+        return await refresh_access_token(RefreshRequest(refresh_token=refresh_token), db)
+
+async def expect_rejected(SessionLocal, refresh_token: str, detail: str):
+    try:
+        await refresh(SessionLocal, refresh_token)
+        raise AssertionError(f"refresh token was accepted, expected: {detail}")
+    except HTTPException as e:
+        assert e.status_code == 401 and e.detail == detail, e.detail
+
+async def check_rotation(databases):
+    async with databases.open() as (engine, SessionLocal):
+        queries = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+        async with SessionLocal() as db:
+            user = await User.create_user(db, "alice", "alice@example.com", "Testpass123$")
+            session_id = session_activity.start_session(user.id)
+            first = await refresh_tokens.issue(db, user.id, session_id, user.token_version)
+            # As a login and a verified request would leave them
+            token_versions.set(user.id, user.token_version)
+            await user_cache.get(user.id, lambda: User.get_by_id(db, user.id))
+
+        # With the user cached, a refresh is a read and one update, and hands out the next token of the family
+        queries.clear()
+        token = await refresh(SessionLocal, first)
+        assert [q.lstrip().split()[0].upper() for q in queries] == ["SELECT", "UPDATE"], queries
+        claims = verify_token(token.access_token)
+        assert claims["sid"] == session_id and claims["user_id"] == user.id
+        second = token.refresh_token
+        assert second != first
+        third = (await refresh(SessionLocal, second)).refresh_token
+
+        # Forged tokens are refused without writing to the family
+        queries.clear()
+        await expect_rejected(SessionLocal, third[:-4] + "AAAA", "Invalid refresh token")
+        await expect_rejected(SessionLocal, "garbage", "Invalid refresh token")
+        assert not any(q.lstrip().upper().startswith(("UPDATE", "DELETE")) for q in queries), queries
+
+        # Replaying a rotated token revokes the family, so the current token stops working too
+        await expect_rejected(SessionLocal, second, "Refresh token reuse detected")
+        await expect_rejected(SessionLocal, third, "Invalid refresh token")
+
+        # A new login's family is outdated when the user is deactivated
+        async with SessionLocal() as db:
+            token = await refresh_tokens.issue(db, user.id, session_activity.start_session(user.id), user.token_version)
+            user = await User.get_by_id(db, user.id)
+            await user.update_activity_status(db, False)
+        await expect_rejected(SessionLocal, token, "Session is no longer valid")
+
+async def check_purge(databases):
+    async with databases.open("purge") as (engine, SessionLocal):
+        store = RefreshTokenStore(secret="test", purge_batch_size=4)
+
+        async with SessionLocal() as db:
+            tokens = [await store.issue(db, 1, f"session-{i}", 0) for i in range(10)]
+            await db.execute(
+                update(RefreshTokenFamily)
+                .where(RefreshTokenFamily.session_id.in_([f"session-{i}" for i in range(7)]))
+                .values(expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+            )
+            await db.commit()
+
+            # Expired tokens are refused, then removed over several batches
+            try:
+                await store.rotate(db, tokens[0])
+                raise AssertionError("expired refresh token was accepted")
+            except HTTPException as e:
+                assert e.detail == "Refresh token expired"
+            assert await store.purge_expired(db) == 7
+            assert await db.scalar(select(func.count()).select_from(RefreshTokenFamily)) == 3
+            assert (await store.rotate(db, tokens[9])).session_id == "session-9"
+
+def test_refresh_tokens(databases):
+    """Refresh tokens rotate on use, and a replayed one revokes its family"""
+    asyncio.run(check_rotation(databases))
+    asyncio.run(check_purge(databases))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
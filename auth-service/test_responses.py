@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test ETag revalidation of /users/me
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import Request
+from fastapi.security import HTTPAuthorizationCredentials
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from controllers.user_controller import get_current_user
+from models.user import User
+from services.token_versions import token_versions
+from services.user_cache import user_cache
+from utils.auth import create_access_token, user_claims
+from utils.responses import etag_matches
+
+def request(if_none_match: str = None) -> Request:
+    headers = [] if if_none_match is None else [(b"if-none-match", if_none_match.encode())]
+    return Request({"type": "http", "headers": headers})
+
+def check_etag_matching():
+    etag = '"abc"'
+    assert not etag_matches(request(), etag)
+    assert etag_matches(request('"abc"'), etag)
+    # Compared weakly, from a list, and * matches any current representation
+    assert etag_matches(request('W/"abc"'), etag)
+    assert etag_matches(request('"xyz", W/"abc"'), etag)
+    assert etag_matches(request(" * "), etag)
+    assert not etag_matches(request('"xyz", "abcd"'), etag)
+    assert not etag_matches(request(""), etag)
+
+async def check_users_me(databases):
+    async with databases.open() as (engine, SessionLocal):
+        # User ids restart in the new database, so forget what earlier tests cached
+        token_versions.clear()
+        user_cache.clear()
+        async with SessionLocal() as db:
+            user = await User.create_user(db, "alice", "alice@example.com", "Testpass123$")
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(user_claims(user)))
+
+        async def me(if_none_match: str = None):
+            async with SessionLocal() as db:
+                return await get_current_user(request(if_none_match), credentials, db)
+
+        # The first read sends the body, revalidating with its ETag gets an empty 304
+        first = await me()
+        etag = first.headers["ETag"]
+        assert first.status_code == 200 and b'"alice"' in first.body
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        assert first.headers["Vary"] == "Authorization"
+        for if_none_match in (etag, f"W/{etag}", f'"stale", {etag}'):
+            cached = await me(if_none_match)
+            assert cached.status_code == 304 and cached.body == b""
+            assert cached.headers["ETag"] == etag and cached.headers["Vary"] == "Authorization"
+        assert (await me('"stale"')).status_code == 200
+
+        # Once the user changes, the old ETag no longer matches and the new body has a new one
+        async with SessionLocal() as db:
+            user = await User.get_by_id(db, user.id)
+            await user.change_password(db, "Newpass123$")
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(user_claims(user)))
+        changed = await me(etag)
+        assert changed.status_code == 200 and changed.headers["ETag"] != etag
+        assert (await me(changed.headers["ETag"])).status_code == 304
+
+def test_responses(databases):
+    """/users/me answers 304 while the client's copy is current"""
+    check_etag_matching()
+    asyncio.run(check_users_me(databases))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test that session activity reports need the service key and that ended sessions are purged
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import controllers.session_controller as session_controller
+from models import SessionActivity
+from services.session_activity import SessionActivityStore, _to_datetime
+from utils.auth import SESSION_MAX_LIFETIME_MINUTES
+
+def check_service_key():
+    configured = session_controller.SERVICE_API_KEY
+    try:
+        for key, presented, expected in [(None, "anything", 403), ("service-key", None, 401), ("service-key", "wrong", 401)]:
+            session_controller.SERVICE_API_KEY = key
+            try:
+                session_controller.require_service(presented)
+                raise AssertionError("activity report was accepted without the service key")
+            except HTTPException as e:
+                assert e.status_code == expected
+        session_controller.require_service("service-key")
+    finally:
+        session_controller.SERVICE_API_KEY = configured
+
+async def check_purge(databases):
+    async with databases.open("sessions") as (engine, SessionLocal):
+        store = SessionActivityStore(purge_batch_size=4)
+
+        ended = time.time() - SESSION_MAX_LIFETIME_MINUTES * 60 - 60
+        async with SessionLocal() as db:
+            await db.execute(insert(SessionActivity).values(
+                [{"session_id": f"ended-{i}", "user_id": 1, "last_activity": _to_datetime(ended)} for i in range(9)]
+                + [{"session_id": "current", "user_id": 1, "last_activity": _to_datetime(time.time())}]
+            ))
+            await db.commit()
+
+            # Rows of ended sessions are removed over several batches, current ones are kept
+            assert await store.purge_expired(db) == 9
+            remaining = await db.scalars(select(SessionActivity.session_id))
+            assert list(remaining) == ["current"]
+            assert await store.purge_expired(db) == 0
+
+def test_session_activity(databases):
+    """Only services with the key report activity, and ended sessions do not pile up"""
+    check_service_key()
+    asyncio.run(check_purge(databases))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test the shared-memory hash table used by the serve.py workers
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.shared_cache import SET_WAYS, SharedHashTable
+
+def test_shared_table():
+    """Values written by one process are read by another; sets evict and values expire"""
+    table = SharedHashTable()
+    assert table.get(b"key") is None
+    assert not table.set(b"key", b"value", 60)
+
+    table.open(slots=64, slot_size=128)
+    try:
+        # A forked child writes, the parent reads
+        pid = os.fork()
+        if pid == 0:
+            table.set(b"from-child", b"hello", 60)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert table.get(b"from-child") == b"hello"
+
+        # Overwrite, delete and expiry
+        table.set(b"key", b"first", 60)
+        table.set(b"key", b"second", 60)
+        assert table.get(b"key") == b"second"
+        table.delete(b"key")
+        assert table.get(b"key") is None
+        table.set(b"expired", b"value", 0.000001)
+        assert table.get(b"expired") is None
+
+        # Values that do not fit a slot are not stored
+        assert not table.set(b"large", b"x" * 128, 60)
+
+        # The table never holds more than its slots
+        for i in range(1000):
+            table.set(b"key%d" % i, b"value%d" % i, 60 + i)
+        assert table.stats()["live"] == table.slot_count == 64
+        assert table.get(b"key999") == b"value999"
+        assert sum(table.get(b"key%d" % i) is not None for i in range(1000)) == 64 // SET_WAYS * SET_WAYS
+    finally:
+        table.close()
+
+def test_rewrite_keeps_one_copy():
+    """Rewriting a key reuses its slot, so an older copy cannot resurface after an eviction"""
+    table = SharedHashTable()
+    table.open(slots=SET_WAYS, slot_size=128)
+    try:
+        # One set: an expired slot ahead of the key's own slot, the rest long-lived
+        table.set(b"expired", b"value", 0.05)
+        table.set(b"key", b"old", 60)
+        for i in range(SET_WAYS - 2):
+            table.set(b"filler%d" % i, b"value", 100 + i)
+        time.sleep(0.1)
+
+        table.set(b"key", b"new", 30)
+        table.set(b"other", b"value", 200)
+        assert table.get(b"key") == b"new"
+    finally:
+        table.close()
+
+def test_backend_copy_matches():
+    """The backend's copy of the table is the same file, so fixes cannot reach only one service"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    backend_copy = os.path.join(here, os.pardir, "backend", "utils", "shared_cache.py")
+    if not os.path.exists(backend_copy):
+        pytest.skip("backend sources are not next to the auth service")
+    with open(os.path.join(here, "services", "shared_cache.py"), "rb") as f, open(backend_copy, "rb") as g:
+        assert f.read() == g.read(), "auth-service/services/shared_cache.py and backend/utils/shared_cache.py differ"
+
+if __name__ == "__main__":
+    test_shared_table()
+    test_rewrite_keeps_one_copy()
+    test_backend_copy_matches()
+    print("Test completed!")
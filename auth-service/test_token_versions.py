@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test that the verify endpoints answer versioned tokens from memory and reject outdated ones
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from controllers.auth_controller import verify_token_batch, verify_token_endpoint
+from controllers.user_controller import get_current_user
+from models.user import User
+from schemas import TokenBatch, user_response
+from services.shared_cache import shared_table
+from services.token_versions import TokenVersionMap, token_versions
+from utils.auth import create_access_token, user_claims
+
+def bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+async def verify(db, token: str) -> dict:
+    response = await verify_token_endpoint(bearer(token), db)
+    return json.loads(response.body)
+
+async def check_versions(databases):
+    async with databases.open() as (engine, SessionLocal):
+        queries = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+        token_versions.clear()
+
+        async with SessionLocal() as db:
+            user = await User.create_user(db, "alice", "alice@example.com", "Testpass123$")
+        assert user.token_version == 0
+        token = create_access_token(user_claims(user))
+
+        # The first check loads the version, later ones need no query at all
+        async with SessionLocal() as db:
+            queries.clear()
+            assert await verify(db, token) == json.loads(user_response(user).model_dump_json())
+            assert len(queries) == 1
+            queries.clear()
+            await verify(db, token)
+            assert queries == []
+
+        # Deactivating the user bumps the version and outdates the token
+        async with SessionLocal() as db:
+            user = await User.get_by_id(db, user.id)
+            await user.update_activity_status(db, False)
+            assert user.token_version == 1
+        async with SessionLocal() as db:
+            try:
+                await verify(db, token)
+                raise AssertionError("token issued before deactivation was accepted")
+            except HTTPException as e:
+                assert e.status_code == 401
+
+        # So does a password change
+        async with SessionLocal() as db:
+            user = await User.get_by_id(db, user.id)
+            await user.update_activity_status(db, True)
+            token = create_access_token(user_claims(user))
+            await verify(db, token)
+            await user.change_password(db, "Newpass123$")
+            assert user.token_version == 3
+            try:
+                await verify(db, token)
+                raise AssertionError("token issued before the password change was accepted")
+            except HTTPException as e:
+                assert e.status_code == 401
+
+        # The batch endpoint, which the backend uses by default, and /users/me refuse it as well
+        current = create_access_token(user_claims(user))
+        async with SessionLocal() as db:
+            batch = await verify_token_batch(TokenBatch(tokens=[token, current]), db)
+            assert [result.valid for result in batch.results] == [False, True]
+            assert batch.results[0].detail == "Token is no longer valid"
+            assert batch.results[1].user.id == user.id
+        async with SessionLocal() as db:
+            try:
+                await get_current_user(Request({"type": "http", "headers": []}), bearer(token), db)
+                raise AssertionError("/users/me accepted a token issued before the password change")
+            except HTTPException as e:
+                assert e.status_code == 401
+
+def check_map():
+    versions = TokenVersionMap(ttl=30, max_user_id=100000)
+    assert versions.peek(7) is None
+    versions.set(7, 2)
+    assert versions.peek(7) == 2
+
+    # Eight bytes per user id, and ids past the limit are not held locally
+    versions.set(5000, 1)
+    assert versions.stats()["bytes"] == 8 * versions.stats()["capacity"]
+    versions.set(200000, 1)
+    assert versions.stats()["capacity"] <= 100001
+    assert versions.peek(200000) is None
+
+    # Expired versions are loaded again
+    versions.ttl = 0
+    versions.set(7, 3)
+    assert versions.peek(7) is None
+
+def check_shared_versions():
+    shared_table.open(slots=64, slot_size=64)
+    try:
+        # Under serve.py a change made by one worker is seen by the others straight away
+        worker, other_worker = TokenVersionMap(ttl=30), TokenVersionMap(ttl=30)
+        worker.set(7, 2)
+        assert other_worker.peek(7) == 2
+        other_worker.set(7, 3)
+        assert worker.peek(7) == 3
+    finally:
+        shared_table.close()
+
+def test_token_versions(databases):
+    """Versioned tokens verify without the database until the user's version changes"""
+    check_map()
+    check_shared_versions()
+    asyncio.run(check_versions(databases))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
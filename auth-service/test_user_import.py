@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test bulk user import: per-row error reporting and batched inserts
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.user import User
+from services.user_import import UserImporter, parse_rows
+from utils.auth import WEAK_PASSWORD_DETAIL, get_password_hash, verify_password
+from test_user_queries import QueryCounter
+
+async def lines_of(text: str):
+    for line in text.splitlines():
+        yield line
+
+async def check_import(databases):
+    async with databases.open("import") as (engine, SessionLocal):
+        prehashed = get_password_hash("Imported123$")
+        csv_data = "\n".join([
+            "username,email,password,password_hash",
+            "alice,alice@example.com,Testpass123$,",
+            f"bob,bob@example.com,,{prehashed}",
+            "alice,other@example.com,Testpass123$,",
+            "carol,carol@example.com,,not-a-hash",
+            "dave,dave@example.com,,",
+            "x,x@example.com,Testpass123$,",
+            "erin,erin@example.com,Testpass123$",
+            "grace,grace@example.com,password,",
+        ])
+
+        async with SessionLocal() as db:
+            await User.create_user(db, "existing", "erin@example.com", "Testpass123$")
+
+        queries = QueryCounter(engine)
+        async with SessionLocal() as db:
+            report = await UserImporter(batch_size=100).run(db, parse_rows(lines_of(csv_data), "csv"))
+
+        assert report["total"] == 8
+        assert report["imported"] == 2
+        errors = {error["line"]: error["detail"] for error in report["errors"]}
+        assert errors[4] == "Duplicate username in import"
+        assert errors[5] == "Unsupported password hash"
+        assert errors[6] == "Exactly one of password or password_hash is required"
+        assert errors[7].startswith("username:")
+        assert errors[8] == "Expected 4 fields, got 3"
+        assert errors[9] == WEAK_PASSWORD_DETAIL
+        assert report["failed"] == 6
+
+        # One lookup of taken names and one multi-row INSERT for the batch
+        assert queries.count == 2
+
+        async with SessionLocal() as db:
+            bob = await User.get_by_username(db, "bob")
+            assert bob.hashed_password == prehashed
+            assert verify_password("Imported123$", bob.hashed_password)
+
+        # Re-importing reports every row as already registered
+        ndjson = '{"username": "alice", "email": "new@example.com", "password": "Testpass123$"}\n' \
+                 '{"username": "frank", "email": "bob@example.com", "password": "Testpass123$"}'
+        async with SessionLocal() as db:
+            report = await UserImporter().run(db, parse_rows(lines_of(ndjson), "ndjson"))
+        assert report["imported"] == 0
+        assert [error["detail"] for error in report["errors"]] == [
+            "Username already registered",
+            "Email already registered",
+        ]
+
+def test_bulk_import(databases):
+    """Bulk import inserts valid rows in one statement and reports each rejected row"""
+    asyncio.run(check_import(databases))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
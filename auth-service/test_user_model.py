@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 """
-Test script to demonstrate User.get_by_username() without database dependency
+Test script to demonstrate User.get_by_username() with a per-call database session
 """
 
+import asyncio
 import sys
 import os
 
@@ -10,32 +11,40 @@ import os
 sys.path.append('/app')
 
 from models.user import User
+from services.database import SessionLocal, dispose_engine
+
+async def check_get_by_username():
+    """Look up users through an async session from SessionLocal"""
+
+    async with SessionLocal() as db:
+        # Test getting an existing user (should work if data exists)
+        try:
+            user = await User.get_by_username(db, "postgres_user")
+            if user:
+                print(f"✅ Found user: {user.username} ({user.email})")
+                print(f"   ID: {user.id}, Active: {user.is_active}")
+            else:
+                print("❌ User 'postgres_user' not found")
+        except Exception as e:
+            print(f"❌ Error finding user: {e}")
+
+        # Test getting a non-existent user
+        try:
+            user = await User.get_by_username(db, "nonexistent_user")
+            if user is None:
+                print("✅ Non-existent user correctly returned None")
+            else:
+                print(f"❌ Unexpected user found: {user.username}")
+        except Exception as e:
+            print(f"❌ Error with non-existent user: {e}")
+
+    await dispose_engine()
 
 def test_get_by_username():
-    """Test the new get_by_username method without database parameter"""
-
-    # Test getting an existing user (should work if data exists)
-    try:
-        user = User.get_by_username("postgres_user")
-        if user:
-            print(f"✅ Found user: {user.username} ({user.email})")
-            print(f"   ID: {user.id}, Active: {user.is_active}")
-        else:
-            print("❌ User 'postgres_user' not found")
-    except Exception as e:
-        print(f"❌ Error finding user: {e}")
-
-    # Test getting a non-existent user
-    try:
-        user = User.get_by_username("nonexistent_user")
-        if user is None:
-            print("✅ Non-existent user correctly returned None")
-        else:
-            print(f"❌ Unexpected user found: {user.username}")
-    except Exception as e:
-        print(f"❌ Error with non-existent user: {e}")
+    """Test the get_by_username method with a per-call database session"""
+    asyncio.run(check_get_by_username())
 
 if __name__ == "__main__":
-    print("Testing User.get_by_username() without database dependency...")
+    print("Testing User.get_by_username() with a per-call database session...")
     test_get_by_username()
     print("Test completed!")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test that login and registration each cost a single database round trip
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.user import User
+
+class QueryCounter:
+    """Count statements sent to the database through an engine."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def reset(self):
+        self.count = 0
+
+async def check_round_trips(databases):
+    async with databases.open() as (engine, SessionLocal):
+        queries = QueryCounter(engine)
+
+        # Registration is a single INSERT ... RETURNING
+        async with SessionLocal() as db:
+            queries.reset()
+            user = await User.create_user(db, "alice", "alice@example.com", "Testpass123$")
+            assert queries.count == 1
+            assert user.id is not None and user.is_active
+
+        # Duplicates are reported from the unique constraint, still one statement
+        for username, email, detail in [
+            ("alice", "other@example.com", "Username already registered"),
+            ("bob", "alice@example.com", "Email already registered"),
+        ]:
+            async with SessionLocal() as db:
+                queries.reset()
+                try:
+                    await User.create_user(db, username, email, "Testpass123$")
+                    raise AssertionError("duplicate registration was accepted")
+                except HTTPException as e:
+                    assert e.status_code == 400
+                    assert e.detail == detail
+                assert queries.count == 1
+
+        # Login by username or by email resolves the user in one query
+        for login in ("alice", "alice@example.com"):
+            async with SessionLocal() as db:
+                queries.reset()
+                user = await User.authenticate(db, login, "Testpass123$")
+                assert user is not None and user.username == "alice"
+                assert queries.count == 1
+
+        async with SessionLocal() as db:
+            queries.reset()
+            assert await User.authenticate(db, "nobody@example.com", "Testpass123$") is None
+            assert queries.count == 1
+
+        # Batch verification resolves all referenced users in one query
+        async with SessionLocal() as db:
+            queries.reset()
+            users = await User.get_by_ids(db, [user.id, user.id + 1000])
+            assert [u.username for u in users] == ["alice"]
+            assert queries.count == 1
+
+def test_login_and_registration_round_trips(databases):
+    """Each login and registration issues exactly one statement"""
+    asyncio.run(check_round_trips(databases))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -1,45 +1,228 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+import hashlib
+import json
+import logging
 import os
+import secrets
+import time
 from dotenv import load_dotenv
+from services.hashing import hashing_executor
+from services.metrics import JWT_DURATION, PASSWORD_HASH_DURATION, registry, timed
+from services.shared_cache import shared_table
+from services.signing_keys import SigningKeyRing
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Security configurations
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+# Access tokens are short-lived; clients renew them with their rotating refresh token
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "5"))
+# How long a decoded token stays in the cache shared by `serve.py` workers
+SHARED_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("SHARED_TOKEN_CACHE_TTL_SECONDS", "60"))
+
+# Session configurations - sessions end after INACTIVITY_TIMEOUT_MINUTES without
+# activity, or SESSION_MAX_LIFETIME_MINUTES after login at the latest
+INACTIVITY_TIMEOUT_MINUTES = int(os.getenv("INACTIVITY_TIMEOUT_MINUTES", "30"))
+SESSION_MAX_LIFETIME_MINUTES = int(os.getenv("SESSION_MAX_LIFETIME_MINUTES", "1440"))
+
+# Asymmetric algorithms sign with a private key and publish the public half as a JWKS
+signing_keys = None if ALGORITHM.startswith("HS") else SigningKeyRing(ALGORITHM)
+
+# bcrypt cost - BCRYPT_ROUNDS, or with BCRYPT_CALIBRATE the highest cost whose
+# hash takes at most BCRYPT_LATENCY_BUDGET_MS on this host, never below the floor
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_CALIBRATE = os.getenv("BCRYPT_CALIBRATE", "false").lower() == "true"
+BCRYPT_LATENCY_BUDGET_MS = float(os.getenv("BCRYPT_LATENCY_BUDGET_MS", "250"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "16"))
+# Calibrated costs are saved here and reused, so every worker and restart agrees
+BCRYPT_CALIBRATION_FILE = os.getenv("BCRYPT_CALIBRATION_FILE", "bcrypt_calibration.json")
+
+# Budget the cost in use was calibrated for; inherited by workers forked after calibrating
+_calibrated_budget_ms: Optional[float] = None
+
+# Password hashing context; hashes below the current cost are flagged for rehashing
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+def bcrypt_rounds() -> int:
+    """The bcrypt cost new hashes are made with."""
+    return pwd_context.handler("bcrypt").default_rounds
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def set_bcrypt_rounds(rounds: int) -> None:
+    """Hash new passwords at `rounds` and treat cheaper hashes as outdated."""
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+registry.gauge("password_hash_rounds", "bcrypt cost used for new password hashes", function=bcrypt_rounds)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password."""
     return pwd_context.verify(plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    """Hash a password."""
-    return pwd_context.hash(password)
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    """Hash a password, at the given bcrypt cost or the configured one."""
+    if rounds is None:
+        return pwd_context.hash(password)
+    return pwd_context.handler("bcrypt").using(rounds=rounds).hash(password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash was made with an outdated scheme or cost."""
+    return pwd_context.needs_update(hashed_password)
+
+def time_password_hash(rounds: int) -> float:
+    """Seconds taken by one bcrypt hash at the given cost."""
+    handler = pwd_context.handler("bcrypt").using(rounds=rounds)
+    started = time.perf_counter()
+    handler.hash("calibration-password")
+    return time.perf_counter() - started
+
+@timed(PASSWORD_HASH_DURATION.labels("verify"))
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the hashing pool without blocking the event loop."""
+    return await hashing_executor.run(verify_password, plain_password, hashed_password)
+
+@timed(PASSWORD_HASH_DURATION.labels("hash"))
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the hashing pool without blocking the event loop."""
+    # Workers are separate processes, so the cost is passed along explicitly
+    return await hashing_executor.run(get_password_hash, password, bcrypt_rounds())
+
+async def calibrate_bcrypt_rounds(
+    budget_ms: float = BCRYPT_LATENCY_BUDGET_MS,
+    calibration_file: Optional[str] = BCRYPT_CALIBRATION_FILE,
+) -> int:
+    """
+    Pick and apply the highest bcrypt cost whose hash fits the latency budget.
+
+    Hashes are timed in the hashing pool, where logins run them. Each extra
+    round doubles the cost, so the cheapest allowed cost is timed and scaled
+    up, then the pick is confirmed with a hash at that cost. The result is
+    saved to `calibration_file` and reused while the budget is unchanged.
+    `serve.py` calibrates once before forking, so its workers, which would
+    otherwise time hashes against each other, keep the launcher's pick.
+    """
+    global _calibrated_budget_ms
+    if _calibrated_budget_ms == budget_ms:
+        return bcrypt_rounds()
 
+    if calibration_file and os.path.exists(calibration_file):
+        with open(calibration_file) as f:
+            saved = json.load(f)
+        if saved.get("budget_ms") == budget_ms:
+            set_bcrypt_rounds(saved["rounds"])
+            _calibrated_budget_ms = budget_ms
+            return saved["rounds"]
+
+    budget = budget_ms / 1000
+    rounds = BCRYPT_MIN_ROUNDS
+    elapsed = min([await hashing_executor.run(time_password_hash, rounds) for _ in range(3)])
+    while rounds < BCRYPT_MAX_ROUNDS and elapsed * 2 <= budget:
+        rounds += 1
+        elapsed *= 2
+
+    measured = await hashing_executor.run(time_password_hash, rounds)
+    if measured > budget and rounds > BCRYPT_MIN_ROUNDS:
+        rounds -= 1
+        measured /= 2
+
+    logger.info("Calibrated bcrypt cost %d (%.0fms per hash, budget %.0fms)", rounds, measured * 1000, budget_ms)
+    if calibration_file:
+        # Per process, so concurrent writers never share a half-written file
+        temporary_file = f"{calibration_file}.{os.getpid()}.tmp"
+        with open(temporary_file, "w") as f:
+            json.dump({
+                "rounds": rounds,
+                "budget_ms": budget_ms,
+                "measured_ms": measured * 1000,
+                "calibrated_at": datetime.now(timezone.utc).isoformat(),
+            }, f)
+        os.replace(temporary_file, calibration_file)
+
+    set_bcrypt_rounds(rounds)
+    _calibrated_budget_ms = budget_ms
+    return rounds
+
+def user_claims(user, token_version: Optional[int] = None) -> dict:
+    """
+    Claims that let a token answer for its user without a database read,
+    for as long as `ver` matches the user's current token version. Pass
+    `token_version` for user records that do not carry it.
+    """
+    return {
+        "sub": user.username,
+        "user_id": user.id,
+        "email": user.email,
+        "active": user.is_active,
+        "ver": user.token_version if token_version is None else token_version,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "updated_at": user.updated_at.isoformat() if user.updated_at else None,
+    }
+
+@timed(JWT_DURATION.labels("encode"))
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
+    issued_at = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = issued_at + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = issued_at + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+
+    to_encode.update({"exp": expire, "iat": issued_at, "jti": secrets.token_urlsafe(16)})
+    if signing_keys is None:
+        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    kid, private_key = signing_keys.active_key()
+    return jwt.encode(to_encode, private_key, algorithm=ALGORITHM, headers={"kid": kid})
+
+def get_verification_key(token: str):
+    """Select the key that verifies a token, by its kid for asymmetric algorithms."""
+    if signing_keys is None:
+        return SECRET_KEY
+
+    key = signing_keys.verification_key(jwt.get_unverified_header(token).get("kid"))
+    if key is None:
+        raise JWTError("Unknown signing key")
+    return key
 
 def verify_token(token: str) -> dict:
-    """Verify and decode a JWT token."""
+    """
+    Verify and decode a JWT token.
+
+    When running under `serve.py`, decoded tokens are kept in the cache
+    shared by the workers, so a token is decoded once for all of them.
+    """
+    if not shared_table.enabled:
+        return decode_token(token)
+
+    key = b"token:" + hashlib.sha256(token.encode()).digest()
+    cached = shared_table.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    token_data = decode_token(token)
+    ttl = SHARED_TOKEN_CACHE_TTL_SECONDS
+    if token_data["exp"] is not None:
+        ttl = min(ttl, token_data["exp"] - time.time())
+    shared_table.set(key, json.dumps(token_data).encode(), ttl)
+    return token_data
+
+@timed(JWT_DURATION.labels("decode"))
+def decode_token(token: str) -> dict:
+    """Verify and decode a JWT token, without the shared cache."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, get_verification_key(token), algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         user_id: int = payload.get("user_id")
 
@@ -50,7 +233,19 @@ def verify_token(token: str) -> dict:
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        return {"username": username, "user_id": user_id}
+        return {
+            "username": username,
+            "user_id": user_id,
+            "sid": payload.get("sid"),
+            "jti": payload.get("jti"),
+            "iat": payload.get("iat"),
+            "exp": payload.get("exp"),
+            "email": payload.get("email"),
+            "active": payload.get("active"),
+            "ver": payload.get("ver"),
+            "created_at": payload.get("created_at"),
+            "updated_at": payload.get("updated_at"),
+        }
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -58,6 +253,8 @@ def verify_token(token: str) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+WEAK_PASSWORD_DETAIL = "Password must be at least 8 characters long and contain uppercase, lowercase, digit, and special character"
+
 def validate_password_strength(password: str) -> bool:
     """Validate password strength."""
     if len(password) < 8:
@@ -1,12 +1,17 @@
+import os
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from middlewares import JWTMiddleware
-from controllers import auth_router, products_router, health_router
+from middlewares import JWTMiddleware, MetricsMiddleware, ProfilingMiddleware
+from controllers import auth_router, products_router, health_router, metrics_router
+from utils import catalog_store, jwks_cache, remote_validator, revocation_list, session_tracker
+from utils.jwt_utils import USE_JWKS
 
 app = FastAPI(
     title="App Security Interview API",
     description="A FastAPI application for app security interview",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -22,13 +27,38 @@ app.add_middleware(
 app.add_middleware(
     JWTMiddleware,
     protected_paths=["/products", "/api/auth"],
-    use_remote_validation=False  # Set to True to use remote auth-service validation
+    # Set USE_REMOTE_VALIDATION=true to use remote auth-service validation
+    use_remote_validation=os.getenv("USE_REMOTE_VALIDATION", "false").lower() == "true"
 )
 
+# Record request latency and in-flight requests, outside the JWT middleware so rejected requests are counted too
+app.add_middleware(MetricsMiddleware)
+
+# Profile requests carrying the profiling token or picked by sampling; outermost so all middleware is profiled
+app.add_middleware(ProfilingMiddleware)
+
+# Start reporting session activity, following revocations and refreshing signing keys on startup
+@app.on_event("startup")
+async def startup_event():
+    session_tracker.start()
+    revocation_list.start()
+    if USE_JWKS:
+        jwks_cache.start()
+
+# Report pending session activity and close pooled auth-service and catalog connections on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    await session_tracker.stop()
+    await revocation_list.stop()
+    await jwks_cache.stop()
+    await remote_validator.close()
+    await catalog_store.close()
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(products_router)
 app.include_router(health_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
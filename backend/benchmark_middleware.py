@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the per-request overhead added by JWTMiddleware.
+
+Compares the pure ASGI JWTMiddleware against the previous
+BaseHTTPMiddleware-based implementation on an unprotected path and on a
+protected path with a valid token, calling the ASGI stack directly so only
+middleware overhead is measured.
+
+Usage: python benchmark_middleware.py [requests]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi import Request, HTTPException, status
+from jose import jwt
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from middlewares import JWTMiddleware
+from utils import jwt_utils
+
+PROTECTED_PATHS = ["/products", "/api/auth"]
+
+class BaseHTTPJWTMiddleware(BaseHTTPMiddleware):
+    """The previous BaseHTTPMiddleware implementation, kept as the baseline."""
+
+    def __init__(self, app, protected_paths: list = None, use_remote_validation: bool = False):
+        super().__init__(app)
+        self.protected_paths = protected_paths or ["/api/protected"]
+        self.use_remote_validation = use_remote_validation
+
+    def is_protected_path(self, path: str) -> bool:
+        return any(path.startswith(protected_path) for protected_path in self.protected_paths)
+
+    async def dispatch(self, request: Request, call_next):
+        if not self.is_protected_path(request.url.path):
+            return await call_next(request)
+
+        authorization = request.headers.get("Authorization")
+        if not authorization:
+            return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Authorization header missing"})
+
+        try:
+            scheme, token = authorization.split()
+            if scheme.lower() != "bearer":
+                raise ValueError("Invalid authorization scheme")
+            request.state.user = await jwt_utils.verify_token(token, use_remote=self.use_remote_validation)
+            return await call_next(request)
+        except ValueError:
+            return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid authorization header format"})
+        except HTTPException as e:
+            return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+
+async def endpoint(scope, receive, send):
+    """Bare ASGI endpoint so the measurement is dominated by the middleware."""
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+def make_scope(path: str, token: str = None) -> dict:
+    headers = [(b"host", b"localhost")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 12345),
+        "server": ("localhost", 8000),
+    }
+
+async def measure(app, scope: dict, requests: int) -> float:
+    """Return the mean time per request in microseconds."""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Warm up caches before timing
+    for _ in range(min(requests, 1000)):
+        await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+async def run(requests: int) -> dict:
+    token = jwt.encode(
+        {"sub": "benchmark", "user_id": 1, "exp": datetime.utcnow() + timedelta(minutes=30)},
+        jwt_utils.SECRET_KEY,
+        algorithm=jwt_utils.ALGORITHM,
+    )
+    scenarios = {
+        "unprotected": make_scope("/health/"),
+        "protected": make_scope("/products/", token),
+    }
+    stacks = {
+        "none": endpoint,
+        "base_http_middleware": BaseHTTPJWTMiddleware(endpoint, protected_paths=PROTECTED_PATHS),
+        "asgi_middleware": JWTMiddleware(endpoint, protected_paths=PROTECTED_PATHS),
+    }
+
+    results = {}
+    for scenario, scope in scenarios.items():
+        results[scenario] = {name: await measure(app, scope, requests) for name, app in stacks.items()}
+    return results
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    results = asyncio.run(run(requests))
+
+    print(f"Mean per-request time over {requests} requests (microseconds)")
+    for scenario, timings in results.items():
+        baseline = timings["none"]
+        print(f"\n{scenario}:")
+        for name, elapsed in timings.items():
+            print(f"  {name:<22} {elapsed:8.2f}  (+{elapsed - baseline:.2f} overhead)")
+
+if __name__ == "__main__":
+    main()
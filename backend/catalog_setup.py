@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Create the product catalog schema, optionally filling it with synthetic products.
+
+Run once per deploy, before the backend's workers start. Waits for the
+database to accept connections, so it can be started alongside a database
+that is still booting.
+
+Usage: python catalog_setup.py [--seed COUNT] [--wait SECONDS]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+from utils.catalog import catalog_store
+
+async def wait_for_database(timeout_seconds: float) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    delay = 0.25
+    while True:
+        try:
+            async with catalog_store.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return
+        except Exception as e:
+            if time.monotonic() + delay > deadline:
+                raise
+            print(f"Waiting for the database: {e}", file=sys.stderr)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5)
+
+async def run(seed: int, wait: float) -> None:
+    try:
+        await wait_for_database(wait)
+        await catalog_store.create_schema()
+        if seed:
+            started = time.perf_counter()
+            await catalog_store.seed(seed)
+            print(f"Seeded {seed} products in {time.perf_counter() - started:.1f} s")
+    finally:
+        await catalog_store.close()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Create the product catalog schema")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic products to insert")
+    parser.add_argument("--wait", type=float, default=60, help="Seconds to wait for the database to accept connections")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.seed, args.wait))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,10 +6,12 @@ This package contains API route controllers organized by functionality:
 - user_controller: User-specific endpoints (dashboard, profile, settings)
 - protected_controller: Protected data and analytics endpoints
 - health_controller: Health check and system status endpoints
+- metrics_controller: Prometheus metrics
 """
 
 from .auth_controller import router as auth_router
 from .products_controller import router as products_router
 from .health_controller import router as health_router
+from .metrics_controller import router as metrics_router
 
-__all__ = ["auth_router", "products_router", "health_router"]
+__all__ = ["auth_router", "products_router", "health_router", "metrics_router"]
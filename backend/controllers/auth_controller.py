@@ -24,7 +24,7 @@ async def validate_token_endpoint(request: Request):
             raise ValueError("Invalid authorization scheme")
 
         # Verify token (you can switch between local and remote validation)
-        user_data = jwt_utils.verify_token(token, use_remote=False)
+        user_data = await jwt_utils.verify_token(token, use_remote=False)
 
         return {
             "valid": True,
@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from utils import shared_table, token_cache
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -12,3 +13,17 @@ async def health_check():
         "service": "app-sec-interview-backend",
         "version": "1.0.0",
     }
+
+@router.get("/token-cache")
+async def token_cache_stats():
+    """
+    Hit, miss and eviction counters for the verified token cache.
+    """
+    return token_cache.stats()
+
+@router.get("/shared-cache")
+async def shared_cache_stats():
+    """
+    Occupancy of the cache shared by the workers, with this worker's hit and miss counters.
+    """
+    return shared_table.stats()
@@ -1,17 +1,48 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from middlewares import get_current_user
+from utils import json_response
+from utils.catalog import InvalidCursor, PRODUCTS_MAX_PAGE_SIZE, PRODUCTS_PAGE_SIZE, catalog_store
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 @router.get("/")
-async def get_all_products(user: dict = Depends(get_current_user)):
+async def get_all_products(
+    request: Request,
+    limit: int = Query(PRODUCTS_PAGE_SIZE, ge=1, le=PRODUCTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    user: dict = Depends(get_current_user),
+):
+    """
+    Get a page of products for the authenticated user, in id order.
+    Pass `next_cursor` back as `cursor` for the following page; it is null on the last one.
+    Answers 304 when If-None-Match carries the current ETag.
+    """
+    try:
+        rows, next_cursor = await catalog_store.page(limit, cursor, category, min_price, max_price)
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    return json_response(request, orjson.dumps({"products": rows, "next_cursor": next_cursor}))
+
+@router.get("/export")
+async def export_products(
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    user: dict = Depends(get_current_user),
+):
     """
-    Get all products for the authenticated user.
+    Stream every matching product as NDJSON, one object per line.
     """
-    return {
-        "products": [
-            {"id": 1, "name": "Product 1", "price": 100.0},
-            {"id": 2, "name": "Product 2", "price": 150.0},
-            {"id": 3, "name": "Product 3", "price": 200.0}
-        ]
-    }
+    return StreamingResponse(
+        catalog_store.export(category, min_price, max_price),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="products.ndjson"'},
+    )
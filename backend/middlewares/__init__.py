@@ -6,5 +6,7 @@ logging, and other request processing functionality.
 """
 
 from .jwt_middleware import JWTMiddleware, get_current_user
+from .metrics_middleware import MetricsMiddleware
+from .profiling_middleware import ProfilingMiddleware
 
-__all__ = ["JWTMiddleware", "get_current_user"]
+__all__ = ["JWTMiddleware", "get_current_user", "MetricsMiddleware", "ProfilingMiddleware"]
@@ -1,41 +1,83 @@
-from fastapi import Request, Response, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
+from bisect import bisect_right
+from fastapi import Request, HTTPException, status
 from starlette.responses import JSONResponse
-from typing import Optional
-from utils import jwt_utils
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import List, Optional
+from utils import jwt_utils, revocation_list, session_tracker
+from utils.metrics import ERRORS
 
-class JWTMiddleware(BaseHTTPMiddleware):
+class JWTMiddleware:
     """
-    Middleware to validate JWT tokens for protected routes.
+    Pure ASGI middleware to validate JWT tokens for protected routes.
+
+    Unprotected paths are handed straight to the app, without the task and
+    body-stream wrapping that BaseHTTPMiddleware adds to every request.
     """
 
-    def __init__(self, app, protected_paths: list = None, use_remote_validation: bool = False):
+    def __init__(self, app: ASGIApp, protected_paths: list = None, use_remote_validation: bool = False):
         """
         Initialize JWT middleware.
 
         Args:
-            app: FastAPI application instance
+            app: ASGI application to wrap
             protected_paths: List of path prefixes that require authentication
             use_remote_validation: Whether to use remote auth-service validation
         """
-        super().__init__(app)
+        self.app = app
         self.protected_paths = protected_paths or ["/api/protected"]
         self.use_remote_validation = use_remote_validation
+        self._prefixes = self.compile_prefixes(self.protected_paths)
+
+    @staticmethod
+    def compile_prefixes(prefixes: List[str]) -> List[str]:
+        """
+        Sort the prefixes and drop any that extend a shorter one.
+
+        In the resulting prefix-free sorted list, the only candidate prefix of a
+        path is the greatest entry that sorts at or before it, so a lookup is a
+        single bisect instead of a scan over every prefix.
+        """
+        compiled: List[str] = []
+        for prefix in sorted(set(prefixes)):
+            if not compiled or not prefix.startswith(compiled[-1]):
+                compiled.append(prefix)
+        return compiled
 
     def is_protected_path(self, path: str) -> bool:
         """Check if the path requires authentication."""
-        return any(path.startswith(protected_path) for protected_path in self.protected_paths)
+        index = bisect_right(self._prefixes, path) - 1
+        return index >= 0 and path.startswith(self._prefixes[index])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Skip authentication for non-HTTP traffic and non-protected paths
+        if scope["type"] != "http" or not self.is_protected_path(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        await self.dispatch(scope, receive, send)
 
-    async def dispatch(self, request: Request, call_next):
-        """Process the request and validate JWT if needed."""
+    async def dispatch(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Validate the JWT of a protected request before passing it on."""
+        error = await self.authenticate(scope)
+        if error is not None:
+            await error(scope, receive, send)
+            return
 
-        # Skip authentication for non-protected paths
-        if not self.is_protected_path(request.url.path):
-            return await call_next(request)
+        # Continue to the endpoint
+        await self.app(scope, receive, send)
 
+    async def authenticate(self, scope: Scope) -> Optional[JSONResponse]:
+        """
+        Authenticate the request, storing user data in the request state.
+        Returns the error response to send if authentication fails.
+        """
         # Extract token from Authorization header
-        authorization = request.headers.get("Authorization")
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+
         if not authorization:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -50,14 +92,17 @@ class JWTMiddleware(BaseHTTPMiddleware):
                 raise ValueError("Invalid authorization scheme")
 
             # Verify token
-            user_data = jwt_utils.verify_token(token, use_remote=self.use_remote_validation)
+            user_data = await jwt_utils.verify_token(token, use_remote=self.use_remote_validation)
 
-            # Add user data to request state for use in endpoints
-            request.state.user = user_data
+            # Reject revoked tokens with a local denylist lookup
+            revocation_list.check(user_data)
+
+            # Reject idle sessions and extend the inactivity deadline of active ones
+            await session_tracker.check(user_data)
 
-            # Continue to the endpoint
-            response = await call_next(request)
-            return response
+            # Add user data to request state for use in endpoints
+            scope.setdefault("state", {})["user"] = user_data
+            return None
 
         except ValueError:
             return JSONResponse(
@@ -72,6 +117,7 @@ class JWTMiddleware(BaseHTTPMiddleware):
                 headers=getattr(e, 'headers', {})
             )
         except Exception as e:
+            ERRORS.labels("authentication").inc()
             return JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={"detail": "Authentication error"}
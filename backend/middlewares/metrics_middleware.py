@@ -0,0 +1,43 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.metrics import ERRORS, REQUEST_DURATION, REQUESTS_IN_FLIGHT
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency by route template and
+    the number of requests in flight.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            ERRORS.labels("unhandled").inc()
+            raise
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The router records the matched route; templates keep label cardinality bounded.
+            # Requests rejected by the JWT middleware never reach a route.
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                scope["method"],
+                route.path if route is not None else "unrouted",
+                status_code,
+            ).observe(time.perf_counter() - started)
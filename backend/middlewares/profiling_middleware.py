@@ -0,0 +1,48 @@
+import time
+from typing import Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.profiling import RequestProfiler, request_profiler
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling the requests the profiler selects.
+    Added outermost, so the other middleware is part of the profile.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: Optional[RequestProfiler] = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trigger = self.profiler.trigger(scope)
+        profile = self.profiler.begin() if trigger is not None else None
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            route = scope.get("route")
+            await self.profiler.finish(profile, {
+                "method": scope["method"],
+                "path": route.path if route is not None else scope["path"],
+                "status": status_code,
+                "duration_ms": duration * 1000,
+                "trigger": trigger,
+                "profiled_at": time.time(),
+            })
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test keyset pagination and streaming export of the product catalog
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import orjson
+from sqlalchemy import event, func, select
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.catalog import CatalogStore, InvalidCursor, decode_cursor, encode_cursor, products
+
+async def pages(store: CatalogStore, **filters) -> list:
+    cursor, result = None, []
+    while True:
+        rows, cursor = await store.page(cursor=cursor, **filters)
+        result.append(rows)
+        if cursor is None:
+            return result
+
+async def check_catalog(directory: str):
+    store = CatalogStore(f"sqlite+aiosqlite:///{os.path.join(directory, 'catalog.db')}")
+    try:
+        await store.create_schema()
+        await store.seed(250, batch_size=100)
+
+        # Walking the cursors visits every product once, in id order, with no empty last page
+        walked = await pages(store, limit=100)
+        assert [len(rows) for rows in walked] == [100, 100, 50]
+        ids = [row["id"] for rows in walked for row in rows]
+        assert ids == list(range(1, 251))
+        assert set(walked[0][0]) == {"id", "sku", "name", "category", "price"}
+
+        # Each page is one statement seeking past the cursor, however deep it is
+        queries = []
+        event.listen(store.engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[3]))
+        rows, cursor = await store.page(limit=10, cursor=encode_cursor(200))
+        assert [row["id"] for row in rows] == list(range(201, 211)) and decode_cursor(cursor) == 210
+        assert len(queries) == 1 and 200 in queries[0]
+
+        # Filters hold across pages
+        category = walked[0][0]["category"]
+        async with store.engine.connect() as conn:
+            expected = await conn.scalar(select(func.count()).where(products.c.category == category))
+        filtered = [row for rows in await pages(store, limit=3, category=category) for row in rows]
+        assert len(filtered) == expected and all(row["category"] == category for row in filtered)
+        priced = [row for rows in await pages(store, limit=40, min_price=100, max_price=200) for row in rows]
+        assert priced and all(100 <= row["price"] <= 200 for row in priced)
+
+        try:
+            await store.page(cursor="not a cursor")
+            raise AssertionError("invalid cursor was accepted")
+        except InvalidCursor:
+            pass
+
+        # The export streams the same rows as NDJSON, one chunk per batch
+        chunks = [chunk async for chunk in store.export(batch_size=100)]
+        exported = [orjson.loads(line) for chunk in chunks for line in chunk.splitlines()]
+        assert [row["id"] for row in exported] == ids
+        assert len(chunks) == 3
+    finally:
+        await store.close()
+
+def test_catalog():
+    """Products are paged by id cursor and exported in batches"""
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(check_catalog(tmp))
+
+if __name__ == "__main__":
+    test_catalog()
+    print("Test completed!")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test selecting the JWKS key that verifies an asymmetric token
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from jose import jwk, jwt
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import utils.jwt_utils as jwt_utils
+from utils.jwks import JWKSCache
+
+def private_key() -> bytes:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+
+def public_jwk(private_pem: bytes, kid: str) -> dict:
+    return {**jwk.construct(private_pem, "RS256").public_key().to_dict(), "kid": kid, "use": "sig"}
+
+def sign(private_pem: bytes, kid: str) -> str:
+    claims = {"sub": "alice", "user_id": 1, "exp": time.time() + 60}
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": kid})
+
+async def check_key_selection():
+    first, second = private_key(), private_key()
+    published = [public_jwk(first, "key-1")]
+    fetches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        fetches.append(str(request.url))
+        return httpx.Response(200, json={"keys": published})
+
+    cache = JWKSCache(url="http://auth/.well-known/jwks.json", min_refresh_interval=60, transport=httpx.MockTransport(handler))
+    settings = (jwt_utils.USE_JWKS, jwt_utils.ALGORITHM, jwt_utils.jwks_cache)
+    jwt_utils.USE_JWKS, jwt_utils.ALGORITHM, jwt_utils.jwks_cache = True, "RS256", cache
+    try:
+        # Keys without a kid cannot be selected and are skipped
+        published.append({k: v for k, v in public_jwk(second, "unused").items() if k != "kid"})
+        await cache.refresh()
+        assert cache.get("key-1") is not None and cache.get(None) is None
+
+        # A token is verified with the key its kid names
+        token = sign(first, "key-1")
+        await cache.ensure_key(token)
+        assert jwt_utils.verify_token_local(token)["user_id"] == 1
+        assert len(fetches) == 1
+
+        # Signed by another key under a known kid, or under an unknown kid, it is refused
+        for forged in (sign(second, "key-1"), sign(second, "key-2")):
+            try:
+                jwt_utils.verify_token_local(forged)
+                raise AssertionError("token signed by the wrong key was accepted")
+            except HTTPException as e:
+                assert e.status_code == 401
+
+        # An unknown kid refreshes early, but no more often than the minimum interval
+        published[:] = [public_jwk(first, "key-1"), public_jwk(second, "key-2")]
+        cache._last_refresh -= 60
+        rotated = sign(second, "key-2")
+        await cache.ensure_key(rotated)
+        assert len(fetches) == 2 and jwt_utils.verify_token_local(rotated)["username"] == "alice"
+        await cache.ensure_key(sign(second, "key-3"))
+        assert len(fetches) == 2
+
+        # Concurrent refreshes share one fetch
+        await asyncio.gather(*(cache.refresh() for _ in range(5)))
+        assert len(fetches) == 3
+    finally:
+        jwt_utils.USE_JWKS, jwt_utils.ALGORITHM, jwt_utils.jwks_cache = settings
+        await cache.stop()
+
+def test_jwks():
+    """Asymmetric tokens are verified with the published key matching their kid"""
+    asyncio.run(check_key_selection())
+
+if __name__ == "__main__":
+    test_jwks()
+    print("Test completed!")
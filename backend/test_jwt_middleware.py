@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test which paths the JWT middleware protects and how it answers unauthenticated requests
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from jose import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from middlewares.jwt_middleware import JWTMiddleware
+from utils.jwt_utils import ALGORITHM, SECRET_KEY
+
+def check_path_matching():
+    # Prefixes extending a shorter one are dropped, the rest kept sorted
+    assert JWTMiddleware.compile_prefixes(
+        ["/api/protected", "/api/admin", "/api/protected/deep", "/api/admin"]
+    ) == ["/api/admin", "/api/protected"]
+
+    middleware = JWTMiddleware(None, protected_paths=["/api/protected", "/api/admin", "/api/protected/deep"])
+    for path, protected in [
+        ("/api/protected", True),
+        ("/api/protected/items/1", True),
+        ("/api/protected/deep/x", True),
+        ("/api/admin", True),
+        ("/api/adminx", True),
+        ("/api/public", False),
+        ("/api/b", False),
+        ("/api", False),
+        ("/", False),
+        ("/zzz", False),
+    ]:
+        assert middleware.is_protected_path(path) == protected, path
+
+    # Without configured paths the default prefix is protected
+    assert JWTMiddleware(None).is_protected_path("/api/protected/profile")
+    assert not JWTMiddleware(None).is_protected_path("/health")
+
+async def check_requests():
+    app = FastAPI()
+
+    @app.get("/api/public")
+    async def public():
+        return {"public": True}
+
+    @app.get("/api/protected/me")
+    async def me(request: Request):
+        return request.state.user
+
+    app.add_middleware(JWTMiddleware, protected_paths=["/api/protected"])
+    token = jwt.encode({"sub": "alice", "user_id": 1, "exp": time.time() + 60}, SECRET_KEY, algorithm=ALGORITHM)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/api/public")).status_code == 200
+
+        response = await client.get("/api/protected/me")
+        assert response.status_code == 401 and response.json() == {"detail": "Authorization header missing"}
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+        response = await client.get("/api/protected/me", headers={"Authorization": f"Basic {token}"})
+        assert response.json() == {"detail": "Invalid authorization header format"}
+        response = await client.get("/api/protected/me", headers={"Authorization": "Bearer not-a-jwt"})
+        assert response.status_code == 401 and response.json() == {"detail": "Could not validate credentials"}
+
+        response = await client.get("/api/protected/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json()["username"] == "alice" and response.json()["user_id"] == 1
+
+def test_jwt_middleware():
+    """Only paths under a protected prefix need a valid bearer token"""
+    check_path_matching()
+    asyncio.run(check_requests())
+
+if __name__ == "__main__":
+    test_jwt_middleware()
+    print("Test completed!")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test remote token validation: single-flight calls, batching and auth-service outages
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.remote_validator import RemoteTokenValidator
+
+def user(user_id: int) -> dict:
+    return {"id": user_id, "username": f"user{user_id}", "email": f"user{user_id}@example.com", "is_active": True}
+
+async def expect_status(call, expected: int):
+    try:
+        await call
+        raise AssertionError(f"token was accepted, expected {expected}")
+    except HTTPException as e:
+        assert e.status_code == expected, e.status_code
+
+async def check_single_flight():
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["Authorization"])
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=user(1))
+
+    validator = RemoteTokenValidator(batch_window_ms=0, transport=httpx.MockTransport(handler))
+    try:
+        # Concurrent checks of one token share a request; the next check makes its own
+        results = await asyncio.gather(*(validator.verify("token-1") for _ in range(5)))
+        assert calls == ["Bearer token-1"]
+        assert all(result["user_id"] == 1 and result["username"] == "user1" for result in results)
+        await validator.verify("token-1")
+        assert len(calls) == 2
+    finally:
+        await validator.close()
+
+async def check_batching():
+    batches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/auth/verify/batch"
+        tokens = json.loads(request.content)["tokens"]
+        batches.append(tokens)
+        # Answers "good-*" tokens, rejects "bad-*" ones and leaves the rest out of the reply
+        results = []
+        for token in tokens:
+            if token.startswith("good-"):
+                results.append({"valid": True, "user": user(int(token[5:]))})
+            elif token.startswith("bad-"):
+                results.append({"valid": False})
+        return httpx.Response(200, json={"results": results})
+
+    validator = RemoteTokenValidator(batch_window_ms=5, batch_max_size=3, transport=httpx.MockTransport(handler))
+    try:
+        # Distinct tokens in one window go out together, duplicates once
+        good, again = await asyncio.gather(validator.verify("good-1"), validator.verify("good-1"))
+        assert good == again and batches == [["good-1"]]
+
+        batches.clear()
+        results = await asyncio.gather(
+            validator.verify("good-2"),
+            validator.verify("bad-1"),
+            validator.verify("good-3"),
+            validator.verify("good-4"),
+            return_exceptions=True,
+        )
+        # A full batch is sent at once; the token after it starts the next one
+        assert batches == [["good-2", "bad-1", "good-3"], ["good-4"]]
+        assert results[0]["user_id"] == 2 and results[2]["user_id"] == 3 and results[3]["user_id"] == 4
+        assert isinstance(results[1], HTTPException) and results[1].status_code == 401
+
+        # A token missing from a short reply is unanswered, not rejected
+        await expect_status(validator.verify("unknown-1"), 503)
+    finally:
+        await validator.close()
+
+    # Batches never exceed what the auth service accepts in one call
+    assert RemoteTokenValidator(batch_max_size=500).batch_max_size == 100
+
+async def check_outages():
+    replies = {"token-400": 400, "token-401": 401, "token-403": 403, "token-429": 429, "token-500": 500, "token-503": 503}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        token = request.headers["Authorization"].split()[1]
+        if token == "token-down":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(replies[token], json={"detail": "error"})
+
+    validator = RemoteTokenValidator(batch_window_ms=0, transport=httpx.MockTransport(handler))
+    try:
+        # Only replies about the token, such as an inactive user, reject it; overload and failures are outages
+        for token, expected in [("token-400", 401), ("token-401", 401), ("token-403", 401), ("token-429", 503),
+                                ("token-500", 503), ("token-503", 503), ("token-down", 503)]:
+            await expect_status(validator.verify(token), expected)
+    finally:
+        await validator.close()
+
+    def failing_batch(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(502)
+
+    validator = RemoteTokenValidator(batch_window_ms=1, transport=httpx.MockTransport(failing_batch))
+    try:
+        results = await asyncio.gather(validator.verify("a"), validator.verify("b"), return_exceptions=True)
+        assert [e.status_code for e in results] == [503, 503]
+    finally:
+        await validator.close()
+
+def test_remote_validator():
+    """Concurrent checks share calls, batches are answered per token, and outages are not rejections"""
+    asyncio.run(check_single_flight())
+    asyncio.run(check_batching())
+    asyncio.run(check_outages())
+
+if __name__ == "__main__":
+    test_remote_validator()
+    print("Test completed!")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test ETag revalidation of the /products pages
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import update
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import controllers.products_controller as products_controller
+from middlewares import get_current_user
+from utils.catalog import CatalogStore, products
+
+async def check_products(directory: str):
+    store = CatalogStore(f"sqlite+aiosqlite:///{os.path.join(directory, 'catalog.db')}")
+    shared = products_controller.catalog_store
+    products_controller.catalog_store = store
+    app = FastAPI()
+    app.include_router(products_controller.router)
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": 1, "username": "alice"}
+    try:
+        await store.create_schema()
+        await store.seed(30)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            # The first read sends the page, revalidating with its ETag gets an empty 304
+            first = await client.get("/products/", params={"limit": 10})
+            etag = first.headers["ETag"]
+            assert first.status_code == 200 and len(first.json()["products"]) == 10
+            assert first.headers["Cache-Control"] == "private, no-cache"
+            assert first.headers["Vary"] == "Authorization"
+            for if_none_match in (etag, f"W/{etag}", f'"stale", {etag}', "*"):
+                cached = await client.get("/products/", params={"limit": 10}, headers={"If-None-Match": if_none_match})
+                assert cached.status_code == 304 and cached.content == b""
+                assert cached.headers["ETag"] == etag and cached.headers["Vary"] == "Authorization"
+
+            # Another page is another representation
+            second = await client.get("/products/", params={"limit": 10, "cursor": first.json()["next_cursor"]},
+                                      headers={"If-None-Match": etag})
+            assert second.status_code == 200 and second.headers["ETag"] != etag
+
+            # Once a product on the page changes, the old ETag no longer matches
+            async with store.engine.begin() as conn:
+                await conn.execute(update(products).where(products.c.id == 1).values(price=1.5))
+            changed = await client.get("/products/", params={"limit": 10}, headers={"If-None-Match": etag})
+            assert changed.status_code == 200 and changed.json()["products"][0]["price"] == 1.5
+            assert changed.headers["ETag"] != etag
+            revalidated = await client.get("/products/", params={"limit": 10}, headers={"If-None-Match": changed.headers["ETag"]})
+            assert revalidated.status_code == 304
+    finally:
+        products_controller.catalog_store = shared
+        await store.close()
+
+def test_responses():
+    """/products answers 304 while the client's copy of the page is current"""
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(check_products(tmp))
+
+if __name__ == "__main__":
+    test_responses()
+    print("Test completed!")
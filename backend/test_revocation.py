@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test following the auth-service revocation feed from a cursor
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.revocation import RevocationList
+
+class RevocationFeed:
+    """Serves a growing list of revocations in pages, like `/auth/revocations`."""
+
+    def __init__(self, page_size: int = 2):
+        self.page_size = page_size
+        self.entries = []
+        self.requested = []
+        self.failing = False
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        since = int(request.url.params["since"])
+        self.requested.append(since)
+        if self.failing:
+            return httpx.Response(503)
+        page = self.entries[since:since + self.page_size]
+        return httpx.Response(200, json={
+            "revocations": page,
+            "cursor": since + len(page),
+            "has_more": since + len(page) < len(self.entries),
+        })
+
+async def check_feed():
+    feed = RevocationFeed()
+    revocations = RevocationList(base_url="http://auth", transport=httpx.MockTransport(feed.handle))
+    later = time.time() + 600
+    feed.entries = [
+        {"jti": "jti-1", "expires_at": later},
+        {"jti": "jti-2", "expires_at": later},
+        {"user_id": 7, "issued_before": 1000.0, "expires_at": later},
+        {"jti": "jti-old", "expires_at": time.time() - 1},
+        {"user_id": 7, "issued_before": 500.0, "expires_at": later},
+    ]
+    try:
+        # Every page is pulled, and the cursor ends past the last entry
+        await revocations.refresh()
+        assert feed.requested == [0, 2, 4] and revocations.cursor == 5
+
+        assert revocations.is_revoked({"jti": "jti-2", "user_id": 1})
+        assert not revocations.is_revoked({"jti": "jti-3", "user_id": 1})
+        # Entries that already expired are pruned
+        assert not revocations.is_revoked({"jti": "jti-old", "user_id": 1})
+        # The later, lower cutoff for a user does not undo the earlier one
+        assert revocations.is_revoked({"jti": "jti-3", "user_id": 7, "iat": 900})
+        assert not revocations.is_revoked({"jti": "jti-3", "user_id": 7, "iat": 1000})
+        try:
+            revocations.check({"jti": "jti-1", "user_id": 1})
+            raise AssertionError("revoked token was accepted")
+        except HTTPException as e:
+            assert e.status_code == 401 and e.detail == "Token has been revoked"
+
+        # Later polls only ask for what is new
+        feed.requested.clear()
+        await revocations.refresh()
+        assert feed.requested == [5]
+        feed.entries.append({"jti": "jti-4", "expires_at": later})
+        await revocations.refresh()
+        assert feed.requested == [5, 5] and revocations.cursor == 6
+        assert revocations.is_revoked({"jti": "jti-4"})
+
+        # A failed poll keeps the cursor and what is already known
+        feed.failing = True
+        try:
+            await revocations.refresh()
+            raise AssertionError("failed poll was not reported")
+        except httpx.HTTPStatusError:
+            pass
+        assert revocations.cursor == 6 and revocations.is_revoked({"jti": "jti-4"})
+    finally:
+        await revocations.stop()
+
+def test_revocation():
+    """The denylist follows the feed from its cursor and survives failed polls"""
+    asyncio.run(check_feed())
+
+if __name__ == "__main__":
+    test_revocation()
+    print("Test completed!")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test the verified token cache: accepted and rejected entries, expiry and eviction
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from fastapi import HTTPException
+from jose import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import utils.jwt_utils as jwt_utils
+from utils.jwt_utils import ALGORITHM, SECRET_KEY, TokenCache
+
+def expect_rejected(cache: TokenCache, key: bytes):
+    try:
+        cache.get(key)
+        raise AssertionError("rejected token was served from the cache as valid")
+    except HTTPException as e:
+        assert e.status_code == 401 and e.headers == {"WWW-Authenticate": "Bearer"}
+
+def check_entries():
+    cache = TokenCache(max_entries=2, ttl=60, negative_ttl=60)
+    valid, rejected, other = (TokenCache.key(token) for token in ("valid", "rejected", "other"))
+    assert cache.get(valid) is None
+
+    # Accepted tokens return a copy of their user data
+    cache.set_valid(valid, {"user_id": 1, "username": "alice"})
+    user_data = cache.get(valid)
+    assert user_data == {"user_id": 1, "username": "alice"}
+    user_data["user_id"] = 2
+    assert cache.get(valid)["user_id"] == 1
+
+    # Rejected tokens raise the error they were refused with
+    cache.set_invalid(rejected, HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"}))
+    expect_rejected(cache, rejected)
+
+    # The least recently used entry is evicted first
+    cache.get(valid)
+    cache.set_valid(other, {"user_id": 3})
+    assert cache.get(rejected) is None and cache.get(valid) is not None
+    assert cache.evictions == 1
+
+    # Entries never outlive the token, and expire after their TTL
+    expired = TokenCache.key("expired")
+    cache.set_valid(expired, {"user_id": 4}, exp=time.time() - 1)
+    assert cache.get(expired) is None
+    short = TokenCache(ttl=0.05, negative_ttl=0)
+    short.set_valid(valid, {"user_id": 1})
+    short.set_invalid(rejected, HTTPException(status_code=401, detail="Invalid token"))
+    assert short.get(rejected) is None
+    time.sleep(0.1)
+    assert short.get(valid) is None and short.expirations == 1
+
+async def check_verify_token():
+    shared = jwt_utils.token_cache
+    jwt_utils.token_cache = cache = TokenCache()
+    try:
+        token = jwt.encode({"sub": "alice", "user_id": 1, "exp": time.time() + 60}, SECRET_KEY, algorithm=ALGORITHM)
+        assert (await jwt_utils.verify_token(token))["user_id"] == 1
+        assert (await jwt_utils.verify_token(token))["username"] == "alice"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # A replayed bad token is refused from the cache without another decode
+        for _ in range(2):
+            try:
+                await jwt_utils.verify_token("garbage")
+                raise AssertionError("garbage token was accepted")
+            except HTTPException as e:
+                assert e.status_code == 401
+        assert (cache.hits, cache.misses) == (2, 2)
+    finally:
+        jwt_utils.token_cache = shared
+
+def test_token_cache():
+    """Accepted and rejected tokens are cached until they expire or are evicted"""
+    check_entries()
+    asyncio.run(check_verify_token())
+
+if __name__ == "__main__":
+    test_token_cache()
+    print("Test completed!")
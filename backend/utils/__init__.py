@@ -5,6 +5,36 @@ This package contains utility modules for JWT validation,
 data processing, and other common functionality.
 """
 
-from .jwt_utils import verify_token, verify_token_local, verify_token_remote
+from .jwt_utils import verify_token, verify_token_local, verify_token_remote, TokenCache, token_cache
+from .shared_cache import SharedHashTable, shared_table
+from .remote_validator import RemoteTokenValidator, remote_validator
+from .session_activity import SessionActivityTracker, session_tracker
+from .jwks import JWKSCache, jwks_cache
+from .revocation import RevocationList, revocation_list
+from .responses import json_response, make_etag
+from .catalog import CatalogStore, catalog_store
+from .profiling import RequestProfiler, request_profiler
 
-__all__ = ["verify_token", "verify_token_local", "verify_token_remote"]
+__all__ = [
+    "verify_token",
+    "verify_token_local",
+    "verify_token_remote",
+    "TokenCache",
+    "token_cache",
+    "RemoteTokenValidator",
+    "remote_validator",
+    "SessionActivityTracker",
+    "session_tracker",
+    "JWKSCache",
+    "jwks_cache",
+    "RevocationList",
+    "revocation_list",
+    "SharedHashTable",
+    "shared_table",
+    "json_response",
+    "make_etag",
+    "CatalogStore",
+    "catalog_store",
+    "RequestProfiler",
+    "request_profiler",
+]
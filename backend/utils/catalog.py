@@ -0,0 +1,167 @@
+import base64
+import os
+import random
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+import orjson
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Numeric, String, Table, func, insert, select
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Catalog database; the URL names an asyncio driver, such as postgresql+asyncpg or sqlite+aiosqlite
+CATALOG_DATABASE_URL = os.getenv("CATALOG_DATABASE_URL", "sqlite+aiosqlite:///./catalog.db")
+CATALOG_POOL_SIZE = int(os.getenv("CATALOG_POOL_SIZE", "10"))
+CATALOG_MAX_OVERFLOW = int(os.getenv("CATALOG_MAX_OVERFLOW", "20"))
+
+# Pagination and export configuration
+PRODUCTS_PAGE_SIZE = int(os.getenv("PRODUCTS_PAGE_SIZE", "50"))
+PRODUCTS_MAX_PAGE_SIZE = int(os.getenv("PRODUCTS_MAX_PAGE_SIZE", "200"))
+PRODUCTS_EXPORT_BATCH_SIZE = int(os.getenv("PRODUCTS_EXPORT_BATCH_SIZE", "1000"))
+
+metadata = MetaData()
+
+products = Table(
+    "products",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("sku", String(64), nullable=False, unique=True),
+    Column("name", String(255), nullable=False),
+    Column("category", String(64), nullable=False),
+    Column("price", Numeric(12, 2, asdecimal=False), nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    # A category's products in id order, so a filtered page is one index range scan
+    Index("ix_products_category_id", "category", "id"),
+    Index("ix_products_price", "price"),
+)
+
+# Columns returned by the API, in response order
+PRODUCT_COLUMNS = (products.c.id, products.c.sku, products.c.name, products.c.category, products.c.price)
+# Plain str names; orjson rejects the str subclass SQLAlchemy uses for column keys
+PRODUCT_FIELDS = tuple(str(column.name) for column in PRODUCT_COLUMNS)
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque cursor pointing just past a product id."""
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise InvalidCursor("Invalid cursor")
+
+class CatalogStore:
+    """
+    Product catalog backed by the `products` table.
+
+    Pages use keyset pagination: a page is the products with an id after the
+    cursor, in id order. Unfiltered and category-filtered pages cost one index
+    seek however deep they are, through the primary key or a (category, id)
+    index that keeps that order. Price bounds are only filters on that id
+    scan, so a deep page with a selective price range reads past every
+    non-matching id before it; the price index serves narrow ranges, where
+    the database may prefer it and sort the few matches. Exports stream rows
+    from a server-side cursor in batches, so memory stays flat whatever the
+    size of the catalog.
+
+    The engine is created on first use.
+    """
+
+    def __init__(self, database_url: Union[str, URL] = CATALOG_DATABASE_URL):
+        self.database_url = database_url
+        self._engine: Optional[AsyncEngine] = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            url = make_url(self.database_url)
+            options = {"pool_pre_ping": True}
+            if url.get_backend_name() != "sqlite":
+                options.update(pool_size=CATALOG_POOL_SIZE, max_overflow=CATALOG_MAX_OVERFLOW)
+            self._engine = create_async_engine(url, **options)
+        return self._engine
+
+    @staticmethod
+    def _filtered(query, category: Optional[str], min_price: Optional[float], max_price: Optional[float]):
+        if category is not None:
+            query = query.where(products.c.category == category)
+        if min_price is not None:
+            query = query.where(products.c.price >= min_price)
+        if max_price is not None:
+            query = query.where(products.c.price <= max_price)
+        return query
+
+    async def page(
+        self,
+        limit: int = PRODUCTS_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Return up to `limit` products after the cursor, and the cursor of the next page if there is one."""
+        query = self._filtered(select(*PRODUCT_COLUMNS), category, min_price, max_price)
+        if cursor is not None:
+            query = query.where(products.c.id > decode_cursor(cursor))
+        # One extra row tells whether another page follows
+        query = query.order_by(products.c.id).limit(limit + 1)
+
+        async with self.engine.connect() as conn:
+            rows = [dict(zip(PRODUCT_FIELDS, row)) for row in await conn.execute(query)]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["id"])
+        return rows, next_cursor
+
+    async def export(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        batch_size: int = PRODUCTS_EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Yield matching products as NDJSON, one chunk per batch of rows."""
+        query = self._filtered(select(*PRODUCT_COLUMNS), category, min_price, max_price).order_by(products.c.id)
+        async with self.engine.connect() as conn:
+            result = await conn.stream(query.execution_options(yield_per=batch_size))
+            async for rows in result.partitions():
+                yield b"".join(orjson.dumps(dict(zip(PRODUCT_FIELDS, row))) + b"\n" for row in rows)
+
+    async def create_schema(self) -> None:
+        """Create the products table and its indexes if they do not exist."""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+
+    async def seed(self, count: int, batch_size: int = 5000) -> None:
+        """Insert `count` synthetic products, for development and load tests."""
+        rng = random.Random(count)
+        async with self.engine.connect() as conn:
+            start = await conn.scalar(select(func.coalesce(func.max(products.c.id), 0)))
+        for offset in range(0, count, batch_size):
+            rows = [
+                {
+                    "sku": f"SKU-{start + i + 1:08d}",
+                    "name": f"Product {start + i + 1}",
+                    "category": f"category-{rng.randrange(50):02d}",
+                    "price": round(rng.uniform(1, 1000), 2),
+                }
+                for i in range(offset, min(offset + batch_size, count))
+            ]
+            async with self.engine.begin() as conn:
+                await conn.execute(insert(products), rows)
+
+    async def close(self) -> None:
+        """Close pooled connections, if any were opened."""
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+# Shared catalog used by the products endpoints
+catalog_store = CatalogStore()
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+import httpx
+from jose import JWTError, jwk, jwt
+from dotenv import load_dotenv
+from .metrics import ERRORS
+from .remote_validator import AUTH_SERVICE_URL, AUTH_SERVICE_TIMEOUT
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Public key set published by the auth service
+JWKS_URL = os.getenv("JWKS_URL", f"{AUTH_SERVICE_URL}/.well-known/jwks.json")
+JWKS_REFRESH_INTERVAL_SECONDS = float(os.getenv("JWKS_REFRESH_INTERVAL_SECONDS", "300"))
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL_SECONDS", "30"))
+
+class JWKSCache:
+    """
+    Cache of the auth-service's public signing keys, addressed by kid.
+
+    Keys are parsed once per fetch and refreshed in the background, so
+    asymmetric tokens are verified locally without a call per request. A
+    token carrying an unknown kid (a rotation that happened since the last
+    refresh) triggers an early refresh, rate limited so forged kids cannot
+    be used to hammer the auth service.
+    """
+
+    def __init__(
+        self,
+        url: str = JWKS_URL,
+        refresh_interval: float = JWKS_REFRESH_INTERVAL_SECONDS,
+        min_refresh_interval: float = JWKS_MIN_REFRESH_INTERVAL_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._keys: Dict[str, jwk.Key] = {}
+        self._last_refresh = 0.0
+        self._refreshing: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, kid: Optional[str]) -> Optional[jwk.Key]:
+        """Return the public key for a kid, if known."""
+        return self._keys.get(kid)
+
+    async def ensure_key(self, token: str) -> None:
+        """Refresh the key set if the token was signed with a key not seen yet."""
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except JWTError:
+            # Malformed tokens are rejected by the decode that follows
+            return
+        if kid in self._keys:
+            return
+        if time.monotonic() - self._last_refresh >= self.min_refresh_interval:
+            await self.refresh()
+
+    async def refresh(self) -> None:
+        """Fetch the key set, sharing an in-flight fetch if there is one."""
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._fetch())
+            self._refreshing.add_done_callback(self._clear_refreshing)
+        await asyncio.shield(self._refreshing)
+
+    def _clear_refreshing(self, _) -> None:
+        self._refreshing = None
+
+    async def _fetch(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=AUTH_SERVICE_TIMEOUT, transport=self._transport)
+
+        self._last_refresh = time.monotonic()
+        try:
+            response = await self._client.get(self.url)
+            response.raise_for_status()
+            keys = {}
+            for key_data in response.json()["keys"]:
+                if "kid" in key_data:
+                    keys[key_data["kid"]] = jwk.construct(key_data)
+        except Exception:
+            ERRORS.labels("jwks_refresh").inc()
+            # Keep verifying with the keys we have until the next attempt
+            logger.exception("Failed to refresh JWKS from %s", self.url)
+            return
+        self._keys = keys
+
+    def start(self) -> None:
+        """Start refreshing the key set in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    async def stop(self) -> None:
+        """Stop background refreshes and close the client."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Shared key cache used for local verification of asymmetric tokens
+jwks_cache = JWKSCache()
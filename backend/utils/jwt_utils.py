@@ -1,26 +1,161 @@
+import hashlib
+import json
 import os
-import requests
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from fastapi import HTTPException, status
 from dotenv import load_dotenv
+from .remote_validator import remote_validator
+from .jwks import jwks_cache
+from .shared_cache import shared_table
+from .metrics import JWT_DURATION, REMOTE_VERIFY_DURATION, timed
 
 load_dotenv()
 
 # JWT Configuration - should match auth-service
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
-ALGORITHM = "HS256"
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
-# Auth service URL
-AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001")
+# Asymmetric tokens are verified with public keys from the auth-service JWKS
+USE_JWKS = not ALGORITHM.startswith("HS")
 
+# Verified token cache configuration
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+TOKEN_CACHE_NEGATIVE_TTL = float(os.getenv("TOKEN_CACHE_NEGATIVE_TTL", "5"))
+
+class TokenCache:
+    """
+    Bounded LRU cache of token verification results keyed by token digest.
+
+    Accepted tokens are cached for at most `ttl` seconds and never past their
+    own `exp`. Rejected tokens are remembered for `negative_ttl` seconds so a
+    client replaying garbage is refused without another decode or remote call.
+    Under `serve.py` the workers' shared cache is a second tier, so a token
+    verified by one worker is accepted by the others without verifying it again.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = TOKEN_CACHE_MAX_ENTRIES,
+        ttl: float = TOKEN_CACHE_TTL,
+        negative_ttl: float = TOKEN_CACHE_NEGATIVE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, Optional[dict], Optional[tuple]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        """Digest used as the cache key so raw tokens are never held as keys."""
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        """
+        Return the cached user data for a key, or None on a miss.
+        Raises the cached HTTPException for a negatively cached token.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            entry = self._get_shared(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._store_local(key, entry)
+        else:
+            self._entries.move_to_end(key)
+
+        self.hits += 1
+        _, user_data, error = entry
+        if error is not None:
+            status_code, detail, headers = error
+            raise HTTPException(status_code=status_code, detail=detail, headers=headers)
+        return dict(user_data)
+
+    def set_valid(self, key: bytes, user_data: dict, exp: Optional[float] = None) -> None:
+        """Cache an accepted token, capped at the token's expiry."""
+        ttl = self.ttl
+        if exp is not None:
+            ttl = min(ttl, exp - time.time())
+        if ttl > 0:
+            self._store(key, ttl, dict(user_data), None)
+
+    def set_invalid(self, key: bytes, error: HTTPException) -> None:
+        """Cache a rejected token for the negative TTL."""
+        if self.negative_ttl > 0:
+            error_data = (error.status_code, error.detail, getattr(error, "headers", None))
+            self._store(key, self.negative_ttl, None, error_data)
+
+    def _get_shared(self, key: bytes) -> Optional[tuple]:
+        value = shared_table.get(key)
+        if value is None:
+            return None
+        expires_at, user_data, error = json.loads(value)
+        # Keep the expiry the entry was stored with rather than restarting the TTL
+        ttl = expires_at - time.time()
+        return (time.monotonic() + ttl, user_data, tuple(error) if error is not None else None)
+
+    def _store(self, key: bytes, ttl: float, user_data: Optional[dict], error: Optional[tuple]) -> None:
+        self._store_local(key, (time.monotonic() + ttl, user_data, error))
+        if shared_table.enabled:
+            shared_table.set(key, json.dumps([time.time() + ttl, user_data, error]).encode(), ttl)
+
+    def _store_local(self, key: bytes, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Counters for monitoring the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# Shared cache of verified tokens
+token_cache = TokenCache()
+
+def get_verification_key(token: str):
+    """Select the key that verifies a token: the shared secret, or a JWKS key by kid."""
+    if not USE_JWKS:
+        return SECRET_KEY
+
+    key = jwks_cache.get(jwt.get_unverified_header(token).get("kid"))
+    if key is None:
+        raise JWTError("Unknown signing key")
+    return key
+
+@timed(JWT_DURATION.labels("decode"))
 def verify_token_local(token: str) -> dict:
     """
-    Verify JWT token locally using the same secret key as auth-service.
-    This is faster but requires sharing the secret key.
+    Verify JWT token locally. HS256 tokens need the secret key shared with
+    the auth-service; RS256/ES256 tokens only need its cached public keys.
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, get_verification_key(token), algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         user_id: int = payload.get("user_id")
 
@@ -34,6 +169,9 @@ def verify_token_local(token: str) -> dict:
         return {
             "username": username,
             "user_id": user_id,
+            "sid": payload.get("sid"),
+            "jti": payload.get("jti"),
+            "iat": payload.get("iat"),
             "exp": payload.get("exp")
         }
 
@@ -44,44 +182,30 @@ def verify_token_local(token: str) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def verify_token_remote(token: str) -> dict:
+@timed(REMOTE_VERIFY_DURATION)
+async def verify_token_remote(token: str) -> dict:
     """
     Verify JWT token by calling the auth-service verify endpoint.
     This is more secure as it doesn't require sharing secrets,
-    but adds network latency.
+    but adds network latency. Calls go through a pooled async client
+    and concurrent checks of the same token share one request.
     """
-    try:
-        headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(
-            f"{AUTH_SERVICE_URL}/auth/verify",
-            headers=headers,
-            timeout=5
-        )
-
-        if response.status_code == 200:
-            user_data = response.json()
-            return {
-                "username": user_data["username"],
-                "user_id": user_data["id"],
-                "email": user_data["email"],
-                "is_active": user_data["is_active"]
-            }
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+    user_data = await remote_validator.verify(token)
 
-    except requests.RequestException:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Auth service unavailable",
-        )
+    # The auth service vouched for the token, so its session claims can be trusted
+    claims = jwt.get_unverified_claims(token)
+    return {
+        **user_data,
+        "sid": claims.get("sid"),
+        "jti": claims.get("jti"),
+        "iat": claims.get("iat"),
+        "exp": claims.get("exp")
+    }
 
-def verify_token(token: str, use_remote: bool = False) -> dict:
+async def verify_token(token: str, use_remote: bool = False) -> dict:
     """
     Verify JWT token using either local or remote verification.
+    Results, including rejections, are served from the token cache when possible.
 
     Args:
         token: The JWT token to verify
@@ -91,7 +215,23 @@ def verify_token(token: str, use_remote: bool = False) -> dict:
     Returns:
         dict: User information from the token
     """
-    if use_remote:
-        return verify_token_remote(token)
-    else:
-        return verify_token_local(token)
+    key = token_cache.key(token)
+    user_data = token_cache.get(key)
+    if user_data is not None:
+        return user_data
+
+    try:
+        if use_remote:
+            user_data = await verify_token_remote(token)
+        else:
+            if USE_JWKS:
+                await jwks_cache.ensure_key(token)
+            user_data = verify_token_local(token)
+    except HTTPException as e:
+        # Only definite rejections are cached; outages must not stick
+        if e.status_code == status.HTTP_401_UNAUTHORIZED:
+            token_cache.set_invalid(key, e)
+        raise
+
+    token_cache.set_valid(key, user_data, user_data.get("exp"))
+    return user_data
@@ -0,0 +1,189 @@
+import asyncio
+import os
+from typing import Dict, Optional, Set
+import httpx
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+from .metrics import ERRORS
+
+load_dotenv()
+
+# Auth service URL
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001")
+
+# Connection pool configuration for calls to the auth service
+AUTH_SERVICE_TIMEOUT = float(os.getenv("AUTH_SERVICE_TIMEOUT", "5"))
+AUTH_SERVICE_MAX_CONNECTIONS = int(os.getenv("AUTH_SERVICE_MAX_CONNECTIONS", "100"))
+AUTH_SERVICE_MAX_KEEPALIVE = int(os.getenv("AUTH_SERVICE_MAX_KEEPALIVE", "20"))
+
+# Micro-batching of validations into `/auth/verify/batch` calls; a window of 0 disables it
+AUTH_SERVICE_BATCH_WINDOW_MS = float(os.getenv("AUTH_SERVICE_BATCH_WINDOW_MS", "2"))
+AUTH_SERVICE_BATCH_MAX_SIZE = int(os.getenv("AUTH_SERVICE_BATCH_MAX_SIZE", "100"))
+# Tokens per batch call the auth-service accepts; larger batch sizes are clamped to it
+AUTH_SERVICE_BATCH_LIMIT = 100
+
+# Replies that reject the token itself, including 400 for an inactive user;
+# anything else from the auth service is an outage
+REJECTION_STATUSES = {400, 401, 403, 404}
+
+class RemoteTokenValidator:
+    """
+    Validates tokens against the auth service.
+
+    All calls share one keep-alive connection pool, and concurrent validations
+    of the same token are coalesced into a single in-flight request whose
+    result is handed to every waiter. Distinct tokens arriving within
+    `batch_window_ms` of each other are sent together to `/auth/verify/batch`,
+    up to `batch_max_size` (at most 100) per call; with a zero window each token is sent
+    to `/auth/verify` on its own.
+    """
+
+    def __init__(
+        self,
+        base_url: str = AUTH_SERVICE_URL,
+        timeout: float = AUTH_SERVICE_TIMEOUT,
+        max_connections: int = AUTH_SERVICE_MAX_CONNECTIONS,
+        max_keepalive: int = AUTH_SERVICE_MAX_KEEPALIVE,
+        batch_window_ms: float = AUTH_SERVICE_BATCH_WINDOW_MS,
+        batch_max_size: int = AUTH_SERVICE_BATCH_MAX_SIZE,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        )
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.batch_window = batch_window_ms / 1000
+        # A larger batch would be refused whole with 422 and fail every token in it
+        self.batch_max_size = max(1, min(batch_max_size, AUTH_SERVICE_BATCH_LIMIT))
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._pending_timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self._transport,
+            )
+        return self._client
+
+    async def verify(self, token: str) -> dict:
+        """Validate a token, joining an in-flight call for the same token if any."""
+        call = self._inflight.get(token)
+        if call is None:
+            call = self._submit(token)
+            self._inflight[token] = call
+            call.add_done_callback(lambda _: self._inflight.pop(token, None))
+
+        # A cancelled waiter must not cancel the call shared with the others
+        return await asyncio.shield(call)
+
+    def _submit(self, token: str) -> asyncio.Future:
+        if self.batch_window <= 0:
+            return asyncio.ensure_future(self._fetch(token))
+
+        # Join the batch being collected, sending it once it is full or the window closes
+        future = asyncio.get_running_loop().create_future()
+        self._pending[token] = future
+        if len(self._pending) >= self.batch_max_size:
+            self._send_pending()
+        elif self._pending_timer is None:
+            self._pending_timer = asyncio.get_running_loop().call_later(self.batch_window, self._send_pending)
+        return future
+
+    def _send_pending(self) -> None:
+        if self._pending_timer is not None:
+            self._pending_timer.cancel()
+            self._pending_timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._fetch_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _fetch_batch(self, batch: Dict[str, asyncio.Future]) -> None:
+        tokens = list(batch)
+        try:
+            response = await self._get_client().post("/auth/verify/batch", json={"tokens": tokens})
+            response.raise_for_status()
+            results = response.json()["results"]
+        except Exception:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(self._unavailable())
+            return
+
+        for token, result in zip(tokens, results):
+            future = batch[token]
+            if future.done():
+                continue
+            if result["valid"]:
+                future.set_result(self._user_data(result["user"]))
+            else:
+                future.set_exception(self._invalid_token())
+
+        # A short reply leaves the remaining tokens unanswered, not rejected
+        for future in batch.values():
+            if not future.done():
+                future.set_exception(self._unavailable())
+
+    async def _fetch(self, token: str) -> dict:
+        try:
+            response = await self._get_client().get(
+                "/auth/verify",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        except httpx.HTTPError:
+            raise self._unavailable()
+
+        if response.status_code == 200:
+            return self._user_data(response.json())
+        if response.status_code in REJECTION_STATUSES:
+            raise self._invalid_token()
+
+        # 5xx, 429 and the like say nothing about the token, so they must not be cached as a rejection
+        raise self._unavailable()
+
+    @staticmethod
+    def _user_data(user: dict) -> dict:
+        return {
+            "username": user["username"],
+            "user_id": user["id"],
+            "email": user["email"],
+            "is_active": user["is_active"]
+        }
+
+    @staticmethod
+    def _invalid_token() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    @staticmethod
+    def _unavailable() -> HTTPException:
+        ERRORS.labels("auth_service_unavailable").inc()
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Auth service unavailable",
+        )
+
+    async def close(self) -> None:
+        """Send any batch still being collected and close pooled connections to the auth service."""
+        self._send_pending()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Shared validator used by the JWT utilities
+remote_validator = RemoteTokenValidator()
@@ -0,0 +1,31 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Authenticated reads may only be stored by the client, which must revalidate them
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match names this ETag, compared weakly as RFC 9110 requires."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+def json_response(request: Request, body: bytes, etag: Optional[str] = None) -> Response:
+    """
+    Send an already serialized JSON body with its ETag, or an empty 304 when
+    the client's copy is current.
+    """
+    etag = etag or make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
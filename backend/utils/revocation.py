@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+import httpx
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+from .metrics import ERRORS
+from .remote_validator import AUTH_SERVICE_URL, AUTH_SERVICE_TIMEOUT
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Revocation feed polling configuration
+REVOCATION_POLL_INTERVAL_SECONDS = float(os.getenv("REVOCATION_POLL_INTERVAL_SECONDS", "5"))
+
+class RevocationList:
+    """
+    Local copy of the auth-service token denylist.
+
+    Revoked jtis and per-user "issued before" cutoffs are kept in dicts that
+    expire alongside the tokens they cover, and are kept current by polling
+    the auth-service's incremental `/auth/revocations` feed from a cursor,
+    so each check is an O(1) lookup with no network call.
+    """
+
+    def __init__(
+        self,
+        base_url: str = AUTH_SERVICE_URL,
+        poll_interval: float = REVOCATION_POLL_INTERVAL_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.poll_interval = poll_interval
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._jtis: Dict[str, float] = {}
+        self._users: Dict[int, Tuple[float, float]] = {}
+        self.cursor = 0
+
+    def is_revoked(self, user_data: dict) -> bool:
+        """Check a verified token against the denylist."""
+        jti = user_data.get("jti")
+        if jti is not None and jti in self._jtis:
+            return True
+        user_revocation = self._users.get(user_data.get("user_id"))
+        if user_revocation is not None:
+            issued_before, _ = user_revocation
+            return (user_data.get("iat") or 0) < issued_before
+        return False
+
+    def check(self, user_data: dict) -> None:
+        """Reject a token that has been revoked."""
+        if self.is_revoked(user_data):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+    async def refresh(self) -> None:
+        """Pull every revocation recorded since the current cursor."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=AUTH_SERVICE_TIMEOUT,
+                transport=self._transport,
+            )
+
+        has_more = True
+        while has_more:
+            response = await self._client.get("/auth/revocations", params={"since": self.cursor})
+            response.raise_for_status()
+            feed = response.json()
+            for entry in feed["revocations"]:
+                self._apply(entry)
+            self.cursor = feed["cursor"]
+            has_more = feed["has_more"]
+        self._prune()
+
+    def _apply(self, entry: dict) -> None:
+        if entry.get("jti") is not None:
+            self._jtis[entry["jti"]] = entry["expires_at"]
+        elif entry.get("user_id") is not None:
+            current = self._users.get(entry["user_id"])
+            if current is None or current[0] < entry["issued_before"]:
+                self._users[entry["user_id"]] = (entry["issued_before"], entry["expires_at"])
+
+    def _prune(self) -> None:
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._jtis.items() if expires_at <= now]:
+            del self._jtis[jti]
+        for user_id in [user_id for user_id, (_, expires_at) in self._users.items() if expires_at <= now]:
+            del self._users[user_id]
+
+    def start(self) -> None:
+        """Start polling the revocation feed in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll_loop())
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                ERRORS.labels("revocation_refresh").inc()
+                # Keep enforcing what we have; the cursor resumes on the next poll
+                logger.warning("Failed to refresh token revocations: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self) -> None:
+        """Stop polling and close the client."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Shared denylist used by the JWT middleware
+revocation_list = RevocationList()
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import httpx
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+from .metrics import ERRORS
+from .remote_validator import AUTH_SERVICE_URL, AUTH_SERVICE_TIMEOUT
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Inactivity configuration - should match auth-service
+INACTIVITY_TIMEOUT_MINUTES = int(os.getenv("INACTIVITY_TIMEOUT_MINUTES", "30"))
+SESSION_ACTIVITY_GRANULARITY_SECONDS = float(os.getenv("SESSION_ACTIVITY_GRANULARITY_SECONDS", "60"))
+SESSION_ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.getenv("SESSION_ACTIVITY_FLUSH_INTERVAL_SECONDS", "15"))
+SESSION_ACTIVITY_MAX_EXPIRED = int(os.getenv("SESSION_ACTIVITY_MAX_EXPIRED", "100000"))
+
+# Key sent to the auth-service to report activity - should match auth-service
+SERVICE_API_KEY = os.getenv("SERVICE_API_KEY", "")
+# Sessions per report; the auth-service accepts at most 1000
+SESSION_ACTIVITY_REPORT_BATCH_SIZE = 1000
+
+def _expired_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Session expired due to inactivity",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+class SessionActivityTracker:
+    """
+    Enforces the inactivity timeout for requests handled by the backend.
+
+    Activity is recorded in memory and reported to the auth-service in
+    periodic batches, so requests never wait on a write. A session seen
+    recently is accepted locally; one that looks idle here is confirmed with
+    the auth-service before being rejected, since the user may have been
+    active on another worker in the meantime.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = INACTIVITY_TIMEOUT_MINUTES * 60,
+        granularity_seconds: float = SESSION_ACTIVITY_GRANULARITY_SECONDS,
+        flush_interval_seconds: float = SESSION_ACTIVITY_FLUSH_INTERVAL_SECONDS,
+        max_expired: int = SESSION_ACTIVITY_MAX_EXPIRED,
+        base_url: str = AUTH_SERVICE_URL,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.granularity_seconds = granularity_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_expired = max_expired
+        self.base_url = base_url
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_seen: Dict[str, float] = {}
+        self._pending: Dict[str, Tuple[int, Optional[float], float]] = {}
+        self._expired: "OrderedDict[str, None]" = OrderedDict()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=AUTH_SERVICE_TIMEOUT,
+                headers={"X-Service-Key": SERVICE_API_KEY},
+                transport=self._transport,
+            )
+        return self._client
+
+    def start(self) -> None:
+        """Start the background task that reports activity."""
+        if not SERVICE_API_KEY:
+            # Reports would be refused, so sessions used only here would expire at the auth-service
+            logger.warning(
+                "SERVICE_API_KEY is not set; session activity cannot be reported to the auth service, "
+                "so sessions used only through the backend will expire there after inactivity"
+            )
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop reporting, send any pending activity and close the client."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def check(self, user_data: dict) -> None:
+        """
+        Reject the request if its session expired through inactivity,
+        otherwise record the activity. Tokens without a session id pass.
+        """
+        session_id = user_data.get("sid")
+        if not session_id:
+            return
+        if session_id in self._expired:
+            raise _expired_error()
+
+        now = time.time()
+        issued_at = user_data.get("iat")
+        last_seen = self._last_seen.get(session_id)
+        if last_seen is None:
+            last_seen = issued_at or 0.0
+
+        if now - last_seen > self.timeout_seconds:
+            expired = await self._report([(session_id, user_data["user_id"], issued_at, now)])
+            if session_id in expired:
+                raise _expired_error()
+            # The auth-service has recorded this activity already
+            self._last_seen[session_id] = now
+            return
+
+        if now - last_seen >= self.granularity_seconds:
+            self._last_seen[session_id] = now
+            self._pending[session_id] = (user_data["user_id"], issued_at, now)
+        elif session_id not in self._last_seen:
+            self._last_seen[session_id] = last_seen
+
+    async def _report(self, activity: List[Tuple[str, int, Optional[float], float]]) -> List[str]:
+        """Send activity to the auth-service and remember the sessions it reports expired."""
+        try:
+            response = await self._get_client().post(
+                "/sessions/activity",
+                json={"sessions": [
+                    {"session_id": session_id, "user_id": user_id, "issued_at": issued_at, "last_seen": seen_at}
+                    for session_id, user_id, issued_at, seen_at in activity
+                ]},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError:
+            ERRORS.labels("session_report").inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Auth service unavailable",
+            )
+
+        expired = response.json()["expired"]
+        for session_id in expired:
+            self._mark_expired(session_id)
+        return expired
+
+    def _mark_expired(self, session_id: str) -> None:
+        self._last_seen.pop(session_id, None)
+        self._pending.pop(session_id, None)
+        self._expired[session_id] = None
+        self._expired.move_to_end(session_id)
+        while len(self._expired) > self.max_expired:
+            # Forgotten sessions are simply confirmed with the auth-service again
+            self._expired.popitem(last=False)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Report pending activity in batches and forget idle sessions."""
+        if self._pending:
+            pending, self._pending = self._pending, {}
+            activity = [
+                (session_id, user_id, issued_at, seen_at)
+                for session_id, (user_id, issued_at, seen_at) in pending.items()
+            ]
+            for start in range(0, len(activity), SESSION_ACTIVITY_REPORT_BATCH_SIZE):
+                batch = activity[start:start + SESSION_ACTIVITY_REPORT_BATCH_SIZE]
+                try:
+                    await self._report(batch)
+                except HTTPException:
+                    logger.warning("Failed to report session activity, will retry")
+                    for session_id, user_id, issued_at, seen_at in batch:
+                        self._pending.setdefault(session_id, (user_id, issued_at, seen_at))
+
+        cutoff = time.time() - self.timeout_seconds
+        stale = [
+            session_id for session_id, seen_at in self._last_seen.items()
+            if seen_at < cutoff and session_id not in self._pending
+        ]
+        for session_id in stale:
+            del self._last_seen[session_id]
+
+# Shared tracker used by the JWT middleware
+session_tracker = SessionActivityTracker()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Load-test and micro-benchmark suite for the auth-service and backend.
+
+Both applications run in this process against a throwaway SQLite database,
+driven through httpx's ASGI transport so no sockets or containers are needed.
+The backend reaches the auth-service the same way, so remote validation,
+session activity reporting and the revocation feed all work as deployed.
+
+Scenarios (register, login, verify, products) are run at each concurrency
+level and report throughput and p50/p95/p99 latency. Micro-benchmarks time
+create_access_token, verify_token_local, JWTMiddleware.dispatch and password
+hashing on their own. Results are written as JSON; pass an earlier results
+file as --baseline to flag regressions against it.
+
+Usage:
+    python benchmarks/benchmark_suite.py [--concurrency 1,10,50] [--requests 1000]
+        [--hash-requests 20] [--remote-validation] [--output results.json]
+        [--baseline previous.json] [--threshold 0.2]
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUTH_SERVICE_DIR = os.path.join(ROOT_DIR, "auth-service")
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+# Top-level module names the two services both use for their own code
+SHARED_MODULE_NAMES = ("app", "utils", "controllers")
+
+PASSWORD = "Benchpass123$"
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: List[float]) -> dict:
+    """Latency summary in milliseconds."""
+    latencies = sorted(latencies)
+    return {
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "max": latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+def load_services(remote_validation: bool):
+    """
+    Import both applications into this process.
+
+    The services each have top-level `app`, `utils` and `controllers` modules,
+    so the auth-service's are set aside while the backend is imported and put
+    back wherever the names do not collide. The auth-service directory stays
+    on sys.path because its hashing workers import `utils.auth` by name.
+    """
+    database_path = os.path.join(tempfile.mkdtemp(prefix="benchmark-"), "auth.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ["CATALOG_DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(os.path.dirname(database_path), 'catalog.db')}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ.setdefault("SERVICE_API_KEY", "benchmark-service-key")
+    os.environ["USE_REMOTE_VALIDATION"] = "true" if remote_validation else "false"
+    # Every simulated client shares one address; throttling would cap the login scenario
+    os.environ.setdefault("LOGIN_RATE_LIMIT_ENABLED", "false")
+
+    sys.path.insert(0, AUTH_SERVICE_DIR)
+    auth_app = importlib.import_module("app")
+    auth_modules = {
+        name: module for name, module in sys.modules.items()
+        if name.split(".")[0] in SHARED_MODULE_NAMES
+    }
+    for name in auth_modules:
+        del sys.modules[name]
+
+    sys.path.insert(0, BACKEND_DIR)
+    try:
+        backend_app = importlib.import_module("app")
+    finally:
+        sys.path.remove(BACKEND_DIR)
+    for name, module in auth_modules.items():
+        sys.modules.setdefault(name, module)
+
+    return auth_app, backend_app, database_path
+
+class ScenarioRunner:
+    """Drives requests against an ASGI app at a fixed concurrency."""
+
+    async def run(self, name: str, request: Callable[[int], Awaitable], total: int, concurrency: int) -> dict:
+        latencies: List[float] = []
+        statuses: Dict[int, int] = {}
+        indexes = iter(range(total))
+
+        async def worker():
+            for index in indexes:
+                started = time.perf_counter()
+                response = await request(index)
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(min(concurrency, total))])
+        elapsed = time.perf_counter() - started
+
+        errors = sum(count for status_code, count in statuses.items() if status_code >= 400)
+        result = {
+            "name": name,
+            "concurrency": concurrency,
+            "requests": total,
+            "errors": errors,
+            "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "latency_ms": summarize(latencies),
+        }
+        print(
+            f"{name:<10} c={concurrency:<4} {result['throughput_rps']:>9.1f} req/s  "
+            f"p50={result['latency_ms']['p50']:.2f}ms p95={result['latency_ms']['p95']:.2f}ms "
+            f"p99={result['latency_ms']['p99']:.2f}ms errors={errors}"
+        )
+        return result
+
+def micro_result(name: str, iterations: int, runs: List[float]) -> dict:
+    """Summarize per-operation timings from repeated runs, reporting the best."""
+    best = min(runs)
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "repeat": len(runs),
+        "us_per_op": best * 1e6,
+        "median_us_per_op": statistics.median(runs) * 1e6,
+        "ops_per_sec": 1 / best if best else 0.0,
+    }
+    print(f"{name:<28} {result['us_per_op']:>10.2f} us/op  {result['ops_per_sec']:>10.0f} ops/s")
+    return result
+
+def micro_benchmark(name: str, fn: Callable[[], None], iterations: int, repeat: int = 5) -> dict:
+    """Time a synchronous callable, keeping the best of several runs."""
+    fn()  # Warm up caches and lazy initialisation
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        runs.append((time.perf_counter() - started) / iterations)
+    return micro_result(name, iterations, runs)
+
+async def async_micro_benchmark(name: str, fn: Callable[[], Awaitable], iterations: int, repeat: int = 5) -> dict:
+    """Time a coroutine function, keeping the best of several runs."""
+    await fn()
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await fn()
+        runs.append((time.perf_counter() - started) / iterations)
+    return micro_result(name, iterations, runs)
+
+async def run_suite(args, auth_module, backend_module) -> dict:
+    auth_app, backend_app = auth_module.app, backend_module.app
+    auth_transport = httpx.ASGITransport(app=auth_app)
+
+    # Route the backend's calls to the auth-service through the in-process transport
+    backend_utils = sys.modules["utils"]
+    for client in (backend_utils.remote_validator, backend_utils.session_tracker, backend_utils.revocation_list, backend_utils.jwks_cache):
+        client._transport = auth_transport
+
+    # Workers no longer create tables, so the schema is migrated first as a deploy would
+    migrations = importlib.import_module("services.migrations")
+    database = importlib.import_module("services.database")
+    await migrations.migrate(database.get_engine())
+    await backend_utils.catalog_store.create_schema()
+    await backend_utils.catalog_store.seed(args.products)
+
+    results = {"scenarios": [], "micro": []}
+    runner = ScenarioRunner()
+    run_id = datetime.now(timezone.utc).strftime("%H%M%S")
+
+    async with auth_app.router.lifespan_context(auth_app), backend_app.router.lifespan_context(backend_app):
+        auth = httpx.AsyncClient(transport=auth_transport, base_url="http://auth-service")
+        backend = httpx.AsyncClient(transport=httpx.ASGITransport(app=backend_app), base_url="http://backend")
+
+        # A fixed pool of users for the login, verify and products scenarios
+        users = [f"bench{run_id}_user{i}" for i in range(args.users)]
+        tokens = []
+        for username in users:
+            await auth.post("/auth/register", json={"username": username, "email": f"{username}@example.com", "password": PASSWORD})
+            response = await auth.post("/auth/login", json={"username": username, "password": PASSWORD})
+            response.raise_for_status()
+            tokens.append(response.json()["access_token"])
+
+        for concurrency in args.concurrency:
+            prefix = f"bench{run_id}_c{concurrency}_"
+
+            async def register(i, prefix=prefix):
+                return await auth.post("/auth/register", json={"username": f"{prefix}{i}", "email": f"{prefix}{i}@example.com", "password": PASSWORD})
+
+            async def login(i):
+                return await auth.post("/auth/login", json={"username": users[i % len(users)], "password": PASSWORD})
+
+            async def verify(i):
+                return await auth.get("/auth/verify", headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+
+            async def products(i):
+                return await backend.get("/products/", headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+
+            results["scenarios"].append(await runner.run("register", register, args.hash_requests, concurrency))
+            results["scenarios"].append(await runner.run("login", login, args.hash_requests, concurrency))
+            results["scenarios"].append(await runner.run("verify", verify, args.requests, concurrency))
+            results["scenarios"].append(await runner.run("products", products, args.requests, concurrency))
+
+        # Micro-benchmarks of the hot paths on their own
+        auth_utils = sys.modules["utils.auth"]
+        claims = {"sub": users[0], "user_id": 1, "sid": "benchmark-session"}
+        token = tokens[0]
+        results["micro"].append(micro_benchmark(
+            "create_access_token",
+            lambda: auth_utils.create_access_token(claims, timedelta(minutes=30)),
+            args.micro_iterations,
+        ))
+        results["micro"].append(micro_benchmark(
+            "verify_token_local",
+            lambda: backend_utils.verify_token_local(token),
+            args.micro_iterations,
+        ))
+
+        async def endpoint(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        # The middleware around a bare endpoint, so only its own work is timed
+        middleware = sys.modules["middlewares.jwt_middleware"].JWTMiddleware(
+            endpoint, protected_paths=["/products"], use_remote_validation=args.remote_validation
+        )
+        headers = [(b"host", b"backend"), (b"authorization", f"Bearer {token}".encode())]
+
+        async def dispatch():
+            scope = {"type": "http", "method": "GET", "path": "/products/", "headers": headers, "query_string": b""}
+            await middleware.dispatch(scope, receive, send)
+
+        results["micro"].append(await async_micro_benchmark("JWTMiddleware.dispatch", dispatch, args.micro_iterations))
+
+        hashed = auth_utils.get_password_hash(PASSWORD)
+        results["micro"].append(micro_benchmark(
+            "get_password_hash", lambda: auth_utils.get_password_hash(PASSWORD), args.hash_iterations, repeat=3
+        ))
+        results["micro"].append(micro_benchmark(
+            "verify_password", lambda: auth_utils.verify_password(PASSWORD, hashed), args.hash_iterations, repeat=3
+        ))
+
+        await auth.aclose()
+        await backend.aclose()
+
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """List scenarios and micro-benchmarks that are more than `threshold` slower than the baseline."""
+    regressions = []
+    previous = {(s["name"], s["concurrency"]): s for s in baseline.get("scenarios", [])}
+    for scenario in results["scenarios"]:
+        before = previous.get((scenario["name"], scenario["concurrency"]))
+        if before is None:
+            continue
+        if scenario["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + threshold):
+            regressions.append(
+                f"{scenario['name']} c={scenario['concurrency']}: p95 {before['latency_ms']['p95']:.2f}ms -> {scenario['latency_ms']['p95']:.2f}ms"
+            )
+        if scenario["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{scenario['name']} c={scenario['concurrency']}: throughput {before['throughput_rps']:.1f} -> {scenario['throughput_rps']:.1f} req/s"
+            )
+
+    previous_micro = {m["name"]: m for m in baseline.get("micro", [])}
+    for micro in results["micro"]:
+        before = previous_micro.get(micro["name"])
+        if before is not None and micro["us_per_op"] > before["us_per_op"] * (1 + threshold):
+            regressions.append(f"{micro['name']}: {before['us_per_op']:.2f} -> {micro['us_per_op']:.2f} us/op")
+    return regressions
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", default="1,10,50", type=lambda value: [int(v) for v in value.split(",")],
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per verify/products run")
+    parser.add_argument("--hash-requests", type=int, default=20, help="Requests per register/login run, which hash passwords")
+    parser.add_argument("--users", type=int, default=10, help="Users whose tokens are cycled through")
+    parser.add_argument("--micro-iterations", type=int, default=2000, help="Iterations per micro-benchmark run")
+    parser.add_argument("--hash-iterations", type=int, default=3, help="Iterations per password hashing run")
+    parser.add_argument("--products", type=int, default=10000, help="Products seeded into the catalog")
+    parser.add_argument("--remote-validation", action="store_true", help="Validate backend tokens through the auth-service")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown reported as a regression")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    auth_module, backend_module, database_path = load_services(args.remote_validation)
+    try:
+        results = asyncio.run(run_suite(args, auth_module, backend_module))
+    finally:
+        sys.modules["services.hashing"].hashing_executor.shutdown()
+        shutil.rmtree(os.path.dirname(database_path), ignore_errors=True)
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "hash_requests": args.hash_requests,
+            "users": args.users,
+            "products": args.products,
+            "remote_validation": args.remote_validation,
+        },
+        **results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())